@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8
+#
+# Benchmark of the delivery of the files to the receivers
+#
+# Measures the time needed by process_files to encrypt M files for N PGP
+# enabled receivers with a single worker (i.e. the sequential behaviour)
+# and with the delivery thread pool, and the amount of data AES decrypted
+# from the uploads for an increasing number of receivers. The storage of
+# the results on the database is skipped so that the measure is focused
+# on the encryption.
+#
+# Usage: bench_delivery.py [receivers] [files] [file size in KB]
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from twisted.python.threadpool import ThreadPool
+
+from globaleaks.settings import GLSettings
+
+GLSettings.working_path = tempfile.mkdtemp()
+GLSettings.eval_paths()
+GLSettings.ramdisk_path = os.path.join(GLSettings.working_path, 'ramdisk')
+GLSettings.pgproot = os.path.join(GLSettings.ramdisk_path, 'gnupg')
+GLSettings.create_directories()
+GLSettings.memory_copy.allow_unencrypted = False
+
+from globaleaks.jobs import delivery_sched
+from globaleaks.security import GLPGPKeyrings, GLSecureFile, GLSecureTemporaryFile
+
+delivery_sched.update_internalfile_and_store_receiverfiles = lambda receiverfiles_maps: None
+
+KEYS_DIR = os.path.join(os.path.dirname(__file__), '..', 'globaleaks', 'tests', 'data', 'gpg')
+
+RECEIVERS = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+FILES = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+FILE_SIZE = (int(sys.argv[3]) if len(sys.argv) > 3 else 256) * 1024
+
+
+def load_receivers():
+    receivers = []
+
+    for i in range(RECEIVERS):
+        with open(os.path.join(KEYS_DIR, 'VALID_PGP_KEY%d_PUB' % (i % 2 + 1))) as f:
+            pgp_key_public = unicode(f.read())
+
+        receivers.append({
+            'name': 'receiver%d' % i,
+            'pgp_key_public': pgp_key_public,
+            'pgp_key_fingerprint': GLPGPKeyrings.get(pgp_key_public).key['fingerprint']
+        })
+
+    return receivers
+
+
+def create_receiverfiles_maps(receivers):
+    receiverfiles_maps = {}
+
+    for i in range(FILES):
+        f = GLSecureTemporaryFile(GLSettings.submission_path)
+        f.avoid_delete()
+        f.write(os.urandom(FILE_SIZE))
+        f.close()
+
+        receiverfiles_maps[i] = {
+            'ifile_path': f.filepath,
+            'ifile_size': FILE_SIZE,
+            'rfiles': [{
+                'id': '%d-%d' % (i, j),
+                'status': u'processing',
+                'path': f.filepath,
+                'size': FILE_SIZE,
+                'receiver': receiver
+            } for j, receiver in enumerate(receivers)]
+        }
+
+    return receiverfiles_maps
+
+
+decrypted_bytes = [0]
+secure_file_read = GLSecureFile.read
+
+
+def counting_read(self, c=None):
+    data = secure_file_read(self, c)
+    decrypted_bytes[0] += len(data)
+    return data
+
+GLSecureFile.read = counting_read
+
+
+def run(threads, receivers):
+    receiverfiles_maps = create_receiverfiles_maps(receivers)
+    decrypted_bytes[0] = 0
+
+    GLSettings.delivery_tp = ThreadPool(0, threads)
+    GLSettings.delivery_tp.start()
+
+    start = time.time()
+    delivery_sched.process_files(receiverfiles_maps)
+    elapsed = time.time() - start
+
+    GLSettings.delivery_tp.stop()
+
+    for receiverfiles_map in receiverfiles_maps.values():
+        for rfileinfo in receiverfiles_map['rfiles']:
+            assert rfileinfo['status'] == u'encrypted'
+            os.remove(rfileinfo['path'])
+
+    print("%2d receiver(s) %2d worker(s): %7.2fs  %6.1f files/sec  %6.1fMB decrypted" %
+          (len(receivers), threads, elapsed, len(receivers) * FILES / elapsed, decrypted_bytes[0] / 1048576.0))
+
+
+if __name__ == '__main__':
+    print("%d receivers x %d files of %dKB" % (RECEIVERS, FILES, FILE_SIZE / 1024))
+
+    try:
+        receivers = load_receivers()
+        run(1, receivers)
+
+        for n in [1, 2, 5, 10, 20]:
+            if n <= RECEIVERS:
+                run(GLSettings.delivery_threads, receivers[:n])
+    finally:
+        GLPGPKeyrings.clear()
+        shutil.rmtree(GLSettings.working_path)
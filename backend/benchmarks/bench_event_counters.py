@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8
+#
+# Benchmark of the event counters
+#
+# Emulates a flood of N monitored requests spread over an hour and measures
+# the time needed to track them and to compute the views read by the
+# anomaly detection, by the /admin/activities handler and by the hourly
+# statistics; the memory of the counters is fixed regardless of N.
+#
+# Usage: bench_event_counters.py [events]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from globaleaks.anomaly import ANOMALY_WINDOW
+from globaleaks.event import EventCountersClass, events_monitored
+
+EVENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+
+def measure(label, function, n=1):
+    start = time.time()
+    for _ in range(n):
+        function()
+
+    elapsed = (time.time() - start) / n
+
+    print("%-24s %9.3fms" % (label, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    print("%d events" % EVENTS)
+
+    counters = EventCountersClass()
+    names = [event['name'] for event in events_monitored]
+    now = time.time()
+
+    def track():
+        for i in range(EVENTS):
+            counters.add(names[i % len(names)], 0.1, now=now - 3600 + 3600.0 * i / EVENTS)
+
+    measure('track all the events', track)
+    measure('anomaly event matrix', lambda: counters.get_event_matrix(ANOMALY_WINDOW, now=now), 100)
+    measure('anomaly request timing', lambda: counters.get_request_timing(ANOMALY_WINDOW, now=now), 100)
+    measure('hourly event matrix', lambda: counters.get_event_matrix(3600, now=now), 10)
+    measure('activities details', lambda: counters.take_snapshot(3600, now=now), 10)
+
+    slots = sum(len(counter.counts) for counter in counters.counters.values())
+    print("%d slots, %d events counted" % (slots, sum(counters.get_event_matrix(3600, now=now).values())))
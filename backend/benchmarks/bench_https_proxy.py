@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8
+#
+# Benchmark of the https worker proxy
+#
+# Measures the requests/sec served by the HTTPStreamFactory used by
+# worker_https.py proxying to a minimal backend, with and without the pool
+# of persistent connections to the backend. TLS is not involved so that
+# the measure is focused on the connection handling of the proxy.
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from twisted.internet import defer, reactor
+from twisted.web.client import Agent, HTTPConnectionPool, readBody
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+
+from globaleaks.utils.httpsproxy import HTTPStreamFactory
+
+CONCURRENCY = 16
+REQUESTS = 4000
+
+
+class BackendResource(Resource):
+    isLeaf = True
+    keep_alive = True
+
+    def render(self, request):
+        if not self.keep_alive:
+            request.setHeader('Connection', 'close')
+
+        return 'x' * 1024
+
+
+@defer.inlineCallbacks
+def run(keep_alive):
+    resource = BackendResource()
+    resource.keep_alive = keep_alive
+    backend_port = reactor.listenTCP(0, Site(resource), interface='127.0.0.1')
+
+    proxy_factory = HTTPStreamFactory('http://127.0.0.1:%d' % backend_port.getHost().port)
+    if not keep_alive:
+        # behaviour preceding the introduction of the pool
+        proxy_factory.pool.persistent = False
+
+    proxy_port = reactor.listenTCP(0, proxy_factory, interface='127.0.0.1')
+
+    url = 'http://127.0.0.1:%d/' % proxy_port.getHost().port
+    client_pool = HTTPConnectionPool(reactor, persistent=True)
+    client_pool.maxPersistentPerHost = CONCURRENCY
+    client = Agent(reactor, pool=client_pool)
+
+    @defer.inlineCallbacks
+    def worker(n):
+        for _ in range(n):
+            response = yield client.request('GET', url)
+            yield readBody(response)
+
+    start = time.time()
+    yield defer.gatherResults([worker(REQUESTS / CONCURRENCY) for _ in range(CONCURRENCY)])
+    elapsed = time.time() - start
+
+    print("%-20s %8.0f requests/sec  %s" % ('keep-alive' if keep_alive else 'connection: close',
+                                            REQUESTS / elapsed,
+                                            proxy_factory.pool.get_stats()))
+
+    yield client_pool.closeCachedConnections()
+    yield proxy_port.stopListening()
+    yield backend_port.stopListening()
+
+
+@defer.inlineCallbacks
+def main():
+    try:
+        yield run(False)
+        yield run(True)
+    finally:
+        reactor.stop()
+
+
+if __name__ == '__main__':
+    reactor.callWhenRunning(main)
+    reactor.run()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8
+#
+# Benchmark of the whistleblower logins concurrent with tip reads
+#
+# Starts N receipt logins at once and, while they are being processed,
+# issues M sequential tip reads measuring their latency. The logins are
+# performed hashing the receipt inside the transaction (i.e. the previous
+# behaviour) and on the KDF process pool before the transaction.
+#
+# The receipts used do not match any tip so that the database needs only
+# the schema; the cost of a failed login is the same of a successful one.
+#
+# Usage: bench_login.py [logins] [reads]
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from twisted.internet import defer, reactor
+
+from globaleaks.settings import GLSettings
+
+GLSettings.working_path = tempfile.mkdtemp()
+GLSettings.eval_paths()
+GLSettings.create_directories()
+
+from globaleaks import models
+from globaleaks.db import db_create_tables
+from globaleaks.handlers import authentication
+from globaleaks.orm import transact, transact_sync
+from globaleaks.security import KDFPool, generateRandomReceipt, generateRandomSalt
+from globaleaks.utils.objectdict import ObjectDict
+
+LOGINS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+READS = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+
+@transact
+def legacy_login_whistleblower(store, receipt, client_using_tor):
+    wbtip = authentication.db_get_wbtip_by_receipt(store, receipt)
+    if wbtip:
+        return wbtip.id
+
+
+@transact
+def read_tip(store):
+    return store.find(models.WhistleblowerTip).count()
+
+
+@defer.inlineCallbacks
+def run(label, login):
+    GLSettings.failed_login_attempts = 0
+
+    start = time.time()
+
+    logins = defer.DeferredList([login(generateRandomReceipt(), True) for _ in range(LOGINS)],
+                                consumeErrors=True)
+
+    latencies = []
+    for _ in range(READS):
+        t = time.time()
+        yield read_tip()
+        latencies.append(time.time() - t)
+
+    yield logins
+
+    elapsed = time.time() - start
+
+    print("%-18s %6.1f logins/sec  read latency avg %7.1fms  max %7.1fms" %
+          (label, LOGINS / elapsed, sum(latencies) / len(latencies) * 1000, max(latencies) * 1000))
+
+
+@defer.inlineCallbacks
+def main():
+    try:
+        yield run('hash in transact', legacy_login_whistleblower)
+
+        for n in [1, 2, 4]:
+            GLSettings.kdf_pool = KDFPool(n)
+            yield run('%d kdf process(es)' % n, authentication.login_whistleblower)
+            GLSettings.kdf_pool.stop()
+    finally:
+        GLSettings.orm_tp.stop()
+        shutil.rmtree(GLSettings.working_path)
+        reactor.stop()
+
+
+if __name__ == '__main__':
+    print("%d logins, %d tip reads" % (LOGINS, READS))
+
+    transact_sync(db_create_tables)()
+    GLSettings.memory_copy.private = ObjectDict({'receipt_salt': generateRandomSalt()})
+
+    GLSettings.orm_tp.start()
+
+    reactor.callWhenRunning(main)
+    reactor.run()
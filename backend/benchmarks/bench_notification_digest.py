@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8
+#
+# Benchmark of the notification digests
+#
+# Emulates a busy hour performing N full submissions (each one generating
+# tips, comments, messages and files for the receivers) and counts the
+# gpg encryptions and the mails generated notifying the events one by one
+# and with a single digest for each receiver.
+#
+# The mails are delivered by the SMTP pool opening up to mail_connections
+# sessions of at most SMTPClientPool.mails_per_session mails each; the
+# number of SMTP sessions is estimated accordingly.
+#
+# Usage: bench_notification_digest.py [submissions]
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from twisted.internet import defer, reactor
+
+from globaleaks import models
+from globaleaks.jobs.notification_sched import MailGenerator, trigger_model_map
+from globaleaks.orm import transact
+from globaleaks.security import GLBPGP
+from globaleaks.settings import GLSettings
+from globaleaks.tests import helpers
+from globaleaks.utils.mailutils import SMTPClientPool
+
+SUBMISSIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+encryptions = [0]
+
+encrypt_message = GLBPGP.encrypt_message
+
+
+def counting_encrypt_message(self, *args, **kwargs):
+    encryptions[0] += 1
+    return encrypt_message(self, *args, **kwargs)
+
+
+GLBPGP.encrypt_message = counting_encrypt_message
+
+
+class BusyHour(helpers.TestGLWithPopulatedDB):
+    def runTest(self):
+        pass
+
+
+@transact
+def reset(store):
+    # mark all the events as pending and drop the generated mails
+    for model in trigger_model_map.values():
+        store.find(model).set(new=True)
+
+    store.find(models.Mail).remove()
+
+
+@transact
+def count_mails(store):
+    return store.find(models.Mail).count()
+
+
+@defer.inlineCallbacks
+def run(label, digest):
+    yield reset()
+
+    encryptions[0] = 0
+    GLSettings.mail_counters.clear()
+
+    MailGenerator(digest=digest).generate()
+
+    mails = yield count_mails()
+    sessions = max(-(-mails // SMTPClientPool.mails_per_session), min(mails, GLSettings.mail_connections))
+
+    print("%-12s %5d gpg encryptions  %5d mails  %3d smtp sessions" % (label, encryptions[0], mails, sessions))
+
+
+@defer.inlineCallbacks
+def main():
+    busy_hour = BusyHour()
+
+    try:
+        yield busy_hour.setUp()
+
+        for _ in range(SUBMISSIONS):
+            yield busy_hour.perform_full_submission_actions()
+
+        # the threshold would hide the difference limiting the mails
+        GLSettings.memory_copy.notif.notification_threshold_per_hour = 1000000
+
+        yield run('per event', False)
+        yield run('digest', True)
+    finally:
+        yield busy_hour.tearDown()
+        reactor.stop()
+
+
+if __name__ == '__main__':
+    print("%d submissions" % SUBMISSIONS)
+
+    reactor.callWhenRunning(main)
+    reactor.run()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8
+#
+# Micro-benchmark of the generation of random values
+#
+# Compares the buffered generator of globaleaks.utils.securerandom with
+# the previous implementations reading os.urandom for each value, and
+# measures the creation of tokens and sessions that depend on it.
+import os
+import random
+import string
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from globaleaks.settings import GLSettings
+
+GLSettings.eval_paths()
+
+from globaleaks.anomaly import Alarm
+from globaleaks.handlers.base import new_session
+from globaleaks.security import generateRandomKey, generateRandomReceipt
+from globaleaks.utils import securerandom
+from globaleaks.utils.token import Token
+
+ALPHABET = string.ascii_letters + string.digits
+
+
+def legacy_randint(start, end):
+    w = end - start + 1
+    return start + int(''.join("%x" % ord(x) for x in os.urandom(w)), 16) % w
+
+
+def legacy_shuffle(x):
+    for i in reversed(xrange(1, len(x))):
+        j = legacy_randint(0, i)
+        x[i], x[j] = x[j], x[i]
+    return x
+
+
+def legacy_generateRandomKey(N):
+    return ''.join(random.SystemRandom().choice(ALPHABET) for _ in range(N)).encode('utf-8')
+
+
+def legacy_generateRandomReceipt():
+    return ''.join(random.SystemRandom().choice(string.digits) for _ in range(16)).encode('utf-8')
+
+
+benchmarks = [
+    ('randint(0, 99)', lambda: legacy_randint(0, 99), lambda: securerandom.randint(0, 99)),
+    ('shuffle(1000)', lambda: legacy_shuffle(range(1000)), lambda: securerandom.shuffle(range(1000))),
+    ('generateRandomKey(42)', lambda: legacy_generateRandomKey(42), lambda: generateRandomKey(42)),
+    ('generateRandomReceipt()', legacy_generateRandomReceipt, generateRandomReceipt),
+]
+
+
+def run(label, f, number):
+    elapsed = min(timeit.repeat(f, number=number, repeat=3))
+    print("%-28s %10.2fus" % (label, elapsed / number * 1000000))
+
+
+if __name__ == '__main__':
+    # tokens are measured with both the challenges enabled
+    GLSettings.memory_copy.enable_captcha = True
+    GLSettings.memory_copy.enable_proof_of_work = True
+    Alarm.stress_levels['activity'] = 1
+
+    for label, legacy, current in benchmarks:
+        number = 10 if 'shuffle' in label else 10000
+        run('%s [legacy]' % label, legacy, number)
+        run(label, current, number)
+
+    run('Token.__init__', Token, 10000)
+    run('new_session', lambda: new_session('user', 'receiver', 'enabled'), 10000)
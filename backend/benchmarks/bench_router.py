@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8
+#
+# Micro-benchmark of the API routing
+#
+# Replays the api_spec table against a realistic request mix comparing the
+# compiled Router with the sequential evaluation of the route regexps.
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from globaleaks.settings import GLSettings
+
+GLSettings.eval_paths()
+
+from globaleaks.rest.api import api_spec
+from globaleaks.rest.router import Router
+
+UUID = '9b0c3b2e-1a55-4f4e-9c0b-3f3a6f9b5d21'
+TOKEN = 'a' * 42
+
+# (path, weight): static assets dominate the traffic of a node followed by
+# the public resources and by the receiver/whistleblower tip interfaces.
+request_mix = [
+    ('/', 5),
+    ('/index.html', 5),
+    ('/js/scripts.min.js', 10),
+    ('/css/styles.min.css', 10),
+    ('/fonts/glyphicons-halflings-regular.woff2', 5),
+    ('/img/logo.png', 5),
+    ('/data/favicon.ico', 5),
+    ('/public', 10),
+    ('/l10n/en', 10),
+    ('/token', 3),
+    ('/token/' + TOKEN, 3),
+    ('/submission/' + TOKEN + '/file', 3),
+    ('/authentication', 2),
+    ('/receiver/tips', 5),
+    ('/rtip/' + UUID, 8),
+    ('/rtip/' + UUID + '/comments', 2),
+    ('/rtip/rfile/' + UUID, 2),
+    ('/wbtip', 3),
+    ('/wbtip/comments', 1),
+    ('/admin/node', 1),
+    ('/admin/users/' + UUID + '/img', 1),
+    ('/s/antani', 1),
+]
+
+requests = []
+for path, weight in request_mix:
+    requests += [path] * weight
+
+
+def sequential_router():
+    registry = []
+    for tup in api_spec:
+        pattern = tup[0]
+        if not pattern.startswith("^"):
+            pattern = "^" + pattern
+
+        if not pattern.endswith("$"):
+            pattern += "$"
+
+        registry.append(re.compile(pattern))
+
+    def match(path):
+        for regexp in registry:
+            m = regexp.match(path)
+            if m:
+                return m
+
+    return match
+
+
+def main():
+    number = 200
+    seq_match = sequential_router()
+    router = Router(api_spec)
+
+    for name, f in [('sequential regexps', seq_match),
+                    ('compiled router', router.match)]:
+        t = min(timeit.repeat(lambda: [f(p) for p in requests], repeat=5, number=number))
+        print("%-20s %8.2f us/request" % (name, t * 1000000 / (number * len(requests))))
+
+
+if __name__ == '__main__':
+    main()
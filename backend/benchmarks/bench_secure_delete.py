@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8
+#
+# Benchmark of the secure deletion of the files
+#
+# Measures the throughput of overwrite_and_remove on M files of the given
+# size for different sizes of the overwrite buffers, and the throughput of
+# the SecureFileDeleteSchedule draining the same amount of files with an
+# increasing number of workers.
+#
+# Usage: bench_secure_delete.py [files] [file size in MB]
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from twisted.python.threadpool import ThreadPool
+
+from globaleaks.settings import GLSettings
+
+GLSettings.working_path = tempfile.mkdtemp()
+GLSettings.eval_paths()
+GLSettings.create_directories()
+
+from globaleaks.jobs import secure_file_delete_sched
+from globaleaks.security import overwrite_and_remove
+
+FILES = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+FILE_SIZE = (int(sys.argv[2]) if len(sys.argv) > 2 else 16) * 1024 * 1024
+
+
+def create_files():
+    filepaths = []
+
+    for i in range(FILES):
+        filepath = os.path.join(GLSettings.submission_path, 'file-%d' % i)
+        with open(filepath, 'wb') as f:
+            f.write(os.urandom(FILE_SIZE))
+
+        filepaths.append(filepath)
+
+    return filepaths
+
+
+def report(label, elapsed):
+    print("%-24s %7.2fs  %7.1fMB/s" % (label, elapsed, FILES * FILE_SIZE / elapsed / 1048576.0))
+
+
+def run_buffer_size(buffer_size):
+    GLSettings.secure_delete_buffer_size = buffer_size
+    filepaths = create_files()
+
+    start = time.time()
+    for filepath in filepaths:
+        overwrite_and_remove(filepath)
+
+    report("buffer %7dKB" % (buffer_size / 1024), time.time() - start)
+
+
+def run_workers(threads):
+    # the queue is kept in memory so that the measure is focused on the wipe
+    queue = create_files()
+
+    def get_files_to_secure_delete(limit):
+        return queue[:limit]
+
+    def commit_files_deletion(deleted):
+        for filepath in deleted:
+            queue.remove(filepath)
+
+    secure_file_delete_sched.get_files_to_secure_delete = get_files_to_secure_delete
+    secure_file_delete_sched.commit_files_deletion = commit_files_deletion
+
+    GLSettings.secure_delete_tp = ThreadPool(0, threads)
+    GLSettings.secure_delete_tp.start()
+
+    start = time.time()
+    secure_file_delete_sched.SecureFileDeleteSchedule().operation()
+    elapsed = time.time() - start
+
+    GLSettings.secure_delete_tp.stop()
+
+    report("%2d worker(s)" % threads, elapsed)
+
+
+if __name__ == '__main__':
+    print("%d files of %dMB" % (FILES, FILE_SIZE / 1048576))
+
+    try:
+        for buffer_size in [4 * 1024, 64 * 1024, 1024 * 1024, 4 * 1024 * 1024]:
+            run_buffer_size(buffer_size)
+
+        GLSettings.secure_delete_buffer_size = 1024 * 1024
+
+        for n in [1, 2, 4]:
+            run_workers(n)
+    finally:
+        shutil.rmtree(GLSettings.working_path)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8
+#
+# Benchmark of the rendering of the notification templates
+#
+# Renders N notification bodies of the tip, comment, message and file
+# types with the default english templates, resolving the keywords with
+# the previous multi-pass replace() and with the compiled templates.
+#
+# Usage: bench_templating.py [bodies]
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from globaleaks.settings import GLSettings
+from globaleaks.utils.objectdict import ObjectDict
+from globaleaks.utils.templating import Templating, supported_template_types
+from globaleaks.utils.utility import datetime_now, datetime_to_ISO8601
+
+BODIES = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+TYPES = ['tip', 'comment', 'message', 'file']
+
+
+def legacy_format_template(raw_template, data):
+    keyword_converter = supported_template_types[data['type']](data)
+    iterations = 3
+    while iterations > 0:
+        iterations -= 1
+        count = 0
+
+        for kw in keyword_converter.keyword_list:
+            if raw_template.count(kw):
+                variable_content = getattr(keyword_converter, kw[1:-1])()
+                raw_template = raw_template.replace(kw, variable_content)
+
+                count += 1
+
+        raw_template = raw_template.replace('\n%Blank%\n', '\n')
+        raw_template = raw_template.replace('\n%Blank%\n', '')
+
+        if count == 0:
+            break
+
+    return raw_template
+
+
+def load_data():
+    with open(GLSettings.appdata_file) as f:
+        templates = json.load(f)['templates']
+
+    now = datetime_to_ISO8601(datetime_now())
+
+    event = {
+        'creation_date': now,
+        'name': u'document.pdf',
+        'size': 1024
+    }
+
+    return {
+        'notification': {k: v['en'] for k, v in templates.items()},
+        'node': {
+            'name': u'GlobaLeaks',
+            'onionservice': u'aaaaaaaaaaaaaaaa.onion',
+            'hostname': u'www.globaleaks.org'
+        },
+        'context': {'name': u'Context'},
+        'receiver': {'name': u'Recipient'},
+        'tip': {
+            'id': u'1b6a4a46-6d9e-4e8b-a2a1-6c2a3f3b2d1e',
+            'sequence_number': u'1',
+            'label': u'',
+            'creation_date': now,
+            'expiration_date': now
+        },
+        'comment': event,
+        'message': event,
+        'file': event
+    }
+
+
+def run(label, format_template):
+    data = load_data()
+
+    start = time.time()
+    for i in range(BODIES):
+        data['type'] = TYPES[i % len(TYPES)]
+        format_template(data['notification'][data['type'] + '_mail_template'], data)
+
+    elapsed = time.time() - start
+
+    print("%-10s %7.3fs  %8.0f bodies/sec" % (label, elapsed, BODIES / elapsed))
+
+
+if __name__ == '__main__':
+    GLSettings.eval_paths()
+    GLSettings.memory_copy.accept_tor2web_access = ObjectDict({'receiver': True})
+
+    print("%d notification bodies" % BODIES)
+
+    run('replace', legacy_format_template)
+    run('compiled', Templating().format_template)
@@ -15,10 +15,11 @@ import copy
 from twisted.internet import defer
 
 from globaleaks import models
-from globaleaks.event import EventTrackQueue
+from globaleaks.event import EventCounters
 from globaleaks.handlers.admin.node import db_admin_serialize_node
 from globaleaks.handlers.admin.notification import db_get_notification
 from globaleaks.handlers.admin.user import db_get_admin_users
+from globaleaks.models.config import Config
 from globaleaks.orm import transact
 from globaleaks.rest.apicache import GLApiCache
 from globaleaks.settings import GLSettings
@@ -27,6 +28,9 @@ from globaleaks.utils.singleton import Singleton
 from globaleaks.utils.templating import Templating
 from globaleaks.utils.utility import log, datetime_now, is_expired, bytes_to_pretty_str
 
+# the number of seconds of activity compared with the thresholds of ANOMALY_MAP
+ANOMALY_WINDOW = 60
+
 ANOMALY_MAP = {
     'started_submissions': 50,
     'completed_submissions': 5,
@@ -150,20 +154,15 @@ class AlarmClass(object):
         """
         self.number_of_anomalies = 0
 
-        current_event_matrix = {}
-
-        requests_timing = []
+        current_event_matrix = EventCounters.get_event_matrix(ANOMALY_WINDOW)
 
-        for _, event_obj in EventTrackQueue.iteritems():
-            current_event_matrix.setdefault(event_obj.event_type, 0)
-            current_event_matrix[event_obj.event_type] += 1
-            requests_timing.append(event_obj.request_time)
+        requests_count, best_time, worst_time = EventCounters.get_request_timing(ANOMALY_WINDOW)
 
-        if len(requests_timing) > 2:
+        if requests_count > 2:
             log.info("In latest %d seconds: worst RTT %f, best %f" %
-                     (10,
-                      round(max(requests_timing), 2),
-                      round(min(requests_timing), 2)))
+                     (ANOMALY_WINDOW,
+                      round(worst_time, 2),
+                      round(best_time, 2)))
 
         for event_name, threshold in ANOMALY_MAP.iteritems():
             if event_name in current_event_matrix:
@@ -321,7 +320,7 @@ class AlarmClass(object):
                      (old_accept_submissions, accept_submissions))
 
             # Must invalidate the cache here becuase accept_subs served in /public has changed
-            GLApiCache.invalidate()
+            GLApiCache.invalidate((Config,))
 
 # Alarm is a singleton class exported once
 Alarm = AlarmClass()
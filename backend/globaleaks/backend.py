@@ -7,15 +7,19 @@ import traceback
 from datetime import datetime
 
 from twisted.application import internet, service
-from twisted.internet import reactor, defer
+from twisted.internet import reactor, defer, threads
 from twisted.python import log as txlog, logfile as txlogfile
 from twisted.web.http import _escape
 from twisted.web.server import Site
 
 from globaleaks.db import init_db, update_db, \
     sync_refresh_memory_variables, sync_clean_untracked_files
+from globaleaks.orm import store_pool
 from globaleaks.rest.api import APIResourceWrapper
+from globaleaks.rest.apicache import GLApiCache
+from globaleaks.security import convert_legacy_secure_files, KDFPool
 from globaleaks.settings import GLSettings
+from globaleaks.utils.assets import AssetManifest
 from globaleaks.utils.utility import log, timedelta_to_milliseconds, GLLogObserver
 from globaleaks.utils.sock import listen_tcp_on_sock, reserve_port_for_ip
 from globaleaks.workers.supervisor import ProcessSupervisor
@@ -102,9 +106,27 @@ class GLService(service.Service):
         sync_clean_untracked_files()
         sync_refresh_memory_variables()
 
+        # the processes of the pool are forked before the start of the threads
+        GLSettings.kdf_pool = KDFPool(GLSettings.kdf_processes)
+
         GLSettings.orm_tp.start()
+        GLSettings.orm_ro_tp.start()
+        GLSettings.delivery_tp.start()
+        GLSettings.secure_delete_tp.start()
 
         reactor.addSystemEventTrigger('after', 'shutdown', GLSettings.orm_tp.stop)
+        reactor.addSystemEventTrigger('after', 'shutdown', GLSettings.orm_ro_tp.stop)
+        reactor.addSystemEventTrigger('after', 'shutdown', GLSettings.delivery_tp.stop)
+        reactor.addSystemEventTrigger('after', 'shutdown', GLSettings.secure_delete_tp.stop)
+        reactor.addSystemEventTrigger('after', 'shutdown', GLSettings.kdf_pool.stop)
+        reactor.addSystemEventTrigger('after', 'shutdown', store_pool.clear)
+
+        # files encrypted with the legacy AES-CTR format are converted in background
+        conversion = threads.deferToThreadPool(reactor, GLSettings.delivery_tp,
+                                               convert_legacy_secure_files, GLSettings.submission_path)
+
+        GLSettings.appstate.client_assets = AssetManifest(GLSettings.client_path,
+                                                          GLSettings.client_assets_cache_size).build()
 
         arw = APIResourceWrapper()
 
@@ -113,12 +135,28 @@ class GLService(service.Service):
         for sock in GLSettings.http_socks:
             listen_tcp_on_sock(reactor, sock.fileno(), GLSettings.api_factory)
 
+        proxy_socket = None
+        if GLSettings.proxy_transport == 'unix':
+            proxy_socket = GLSettings.proxy_socket_path
+            if os.path.exists(proxy_socket):
+                os.remove(proxy_socket)
+
+            reactor.listenUNIX(proxy_socket, GLSettings.api_factory, mode=0600)
+
         GLSettings.appstate.process_supervisor = ProcessSupervisor(GLSettings.https_socks,
                                                                 '127.0.0.1',
-                                                                8082)
+                                                                8082,
+                                                                proxy_socket)
 
         yield GLSettings.appstate.process_supervisor.maybe_launch_https_workers()
 
+        # the public resources are built before the first requests need them
+        GLApiCache.warm()
+
+        # the jobs deleting the files are started only once the conversion
+        # is completed so that a file cannot be wiped while being rewritten
+        yield conversion
+
         GLSettings.start_jobs()
         GLSettings.start_services()
 
@@ -7,7 +7,7 @@ import traceback
 
 from storm import exceptions
 
-from globaleaks import models, security, DATABASE_VERSION, FIRST_DATABASE_VERSION_SUPPORTED
+from globaleaks import models, DATABASE_VERSION, FIRST_DATABASE_VERSION_SUPPORTED
 from globaleaks.db.appdata import db_update_appdata, db_fix_fields_attrs
 from globaleaks.handlers.admin import files
 from globaleaks.handlers.base import GLSession
@@ -109,18 +109,23 @@ def db_get_tracked_files(store):
 @transact_sync
 def sync_clean_untracked_files(store):
     """
-    removes files in GLSettings.submission_path that are not
-    tracked by InternalFile/ReceiverFile.
+    marks for secure deletion the files in GLSettings.submission_path that
+    are not tracked by InternalFile/ReceiverFile; the files are then removed
+    in background by the SecureFileDeleteSchedule.
     """
     tracked_files = db_get_tracked_files(store)
+    queued_files = set(store.find(models.SecureFileDelete).values(models.SecureFileDelete.filepath))
+
     for filesystem_file in os.listdir(GLSettings.submission_path):
         if filesystem_file not in tracked_files:
             file_to_remove = os.path.join(GLSettings.submission_path, filesystem_file)
-            try:
-                log.debug("Removing untracked file: %s" % file_to_remove)
-                security.overwrite_and_remove(file_to_remove)
-            except OSError:
-                log.err("Failed to remove untracked file" % file_to_remove)
+            if file_to_remove in queued_files:
+                continue
+
+            log.debug("Marking untracked file for secure deletion: %s" % file_to_remove)
+            secure_file_delete = models.SecureFileDelete()
+            secure_file_delete.filepath = unicode(file_to_remove)
+            store.add(secure_file_delete)
 
 
 def db_refresh_exception_delivery_list(store):
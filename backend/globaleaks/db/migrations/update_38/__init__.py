@@ -0,0 +1,11 @@
+# -*- coding: UTF-8
+
+from globaleaks.db.migrations.update import MigrationBase
+
+
+class MigrationScript(MigrationBase):
+    """
+    The tables are unchanged; the migration creates the index on the
+    receipt_hash of the whistleblowertip table used by the whistleblower login.
+    """
+    pass
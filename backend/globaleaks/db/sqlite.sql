@@ -430,6 +430,7 @@ CREATE INDEX field__template_id_index ON field(template_id);
 CREATE INDEX step__questionnaire_id_index ON step(questionnaire_id);
 CREATE INDEX context_questionnaire_id_index ON context(questionnaire_id);
 CREATE INDEX fieldanswer__internaltip_id_index ON fieldanswer(internaltip_id);
+CREATE INDEX whistleblowertip__receipt_hash_index ON whistleblowertip(receipt_hash);
 CREATE INDEX config_group_index ON config(var_group);
 CREATE INDEX config_item_index ON config(var_group, var_name);
 CREATE INDEX config_l10n_group_index ON config_l10n(var_group);
@@ -1,6 +1,11 @@
+import collections
+import operator
+import time
+from array import array
+from datetime import datetime
+
 from globaleaks.settings import GLSettings
-from globaleaks.utils.tempdict import TempDict
-from globaleaks.utils.utility import log, datetime_now, datetime_to_ISO8601
+from globaleaks.utils.utility import datetime_now, datetime_to_ISO8601
 
 
 # follow the checker, they are executed from handlers/base.py
@@ -104,73 +109,141 @@ def track_handler(handler):
         if event['handler_check'](handler.request.uri) and \
            event['method'] == handler.request.method and \
            event['status_check'](handler.request.code):
-            EventTrack(event, handler.request.execution_time)
+            EventCounters.add(event['name'], handler.request.execution_time.total_seconds())
             break
 
 
-class EventTrack(object):
+class EventCounter(object):
     """
-    Every event that is kept in memory, is a temporary object.
-    Once a while, they disappear. The statistics just take
-    account of the expiration of the events collected, once a while.
+    Ring buffer of per-second counters of the events of one type
 
-    - Anomaly check is based on those elements.
-    - Real-time analysis is based on these, too.
+    Each slot keeps the second it refers to, the number of events and the
+    sum, minimum and maximum of their request time; a slot is reused by the
+    second that is size seconds later so that the memory is fixed regardless
+    of the number of events.
     """
+    def __init__(self, size):
+        self.size = size
+        self.clear()
+        self.counts = array('L', [0]) * size
+        self.durations = array('d', [0]) * size
+        self.min_durations = array('d', [0]) * size
+        self.max_durations = array('d', [0]) * size
+
+    def add(self, request_time, now):
+        second = int(now)
+        i = second % self.size
+
+        if self.seconds[i] != second:
+            self.seconds[i] = second
+            self.counts[i] = 0
+            self.durations[i] = 0
+            self.min_durations[i] = request_time
+            self.max_durations[i] = request_time
+
+        self.counts[i] += 1
+        self.durations[i] += request_time
+        self.min_durations[i] = min(self.min_durations[i], request_time)
+        self.max_durations[i] = max(self.max_durations[i], request_time)
+
+    def slots(self, seconds, now):
+        """
+        Return the indexes of the non empty slots of the latest seconds
+        """
+        now = int(now)
 
-    def serialize_event(self):
-        return {
-            # if the [:-8] I'll strip "." + $millisecond "Z"
-            'creation_date': datetime_to_ISO8601(self.creation_date)[:-8],
-            'event': self.event_type,
-            'id': self.event_id,
-            'duration': self.request_time
-        }
+        for second in xrange(now - min(seconds, self.size) + 1, now + 1):
+            i = second % self.size
+            if self.seconds[i] == second and self.counts[i]:
+                yield i
 
-    def __init__(self, event_obj, request_time, debug=False):
-        self.debug = debug
-        self.creation_date = datetime_now()
-        self.event_id = EventTrackQueue.event_number()
-        self.event_type = event_obj['name']
-        self.request_time = round(request_time.total_seconds(), 1)
+    def count(self, seconds, now):
+        return sum(self.counts[i] for i in self.slots(seconds, now))
 
-        if self.debug:
-            log.debug("Creation of Event %s" % self.serialize_event())
+    def clear(self):
+        self.seconds = array('l', [-1]) * self.size
 
-        EventTrackQueue.set(self.event_id, self)
 
-    def __repr__(self):
-        return "%s" % self.serialize_event()
+class EventCountersClass(object):
+    """
+    This class keeps the counters of the monitored events of the latest hour.
 
-    def synthesis(self):
-        return {
-            'id': self.event_id,
-            'creation_date': datetime_to_ISO8601(self.creation_date)[:-8],
-            'event': self.event_type,
-            'duration': self.request_time
-        }
+    - Anomaly check is based on those of the latest minute.
+    - Real-time analysis and the hourly statistics are based on these, too.
+    """
+    # an hour, i.e. the interval of the StatisticsSchedule
+    size = 3600
 
+    def __init__(self):
+        self.counters = collections.OrderedDict(
+            (event['name'], EventCounter(self.size)) for event in events_monitored
+        )
 
-class EventTrackQueueClass(TempDict):
-    """
-    This class has only a class variable, used to stock the queue of the
-    event happened on the latest minutes.
-    """
-    event_absolute_counter = 0
+    def get_statistics_window(self):
+        """
+        Return the number of seconds elapsed since the start of the collection of the statistics
+        """
+        return int((datetime_now() - GLSettings.stats_collection_start_time).total_seconds()) + 1
 
-    def expireCallback(self, event):
+    def add(self, event_type, request_time, now=None):
+        self.counters[event_type].add(round(request_time, 1), time.time() if now is None else now)
+
+    def get_event_matrix(self, seconds, now=None):
         """
-        On expiration of an event perform the synthesis and
-        append them to the RecentEventQueue.
+        Return the number of the events of each type happened in the latest seconds
         """
-        GLSettings.RecentEventQ.append(event.synthesis())
+        now = time.time() if now is None else now
+
+        matrix = {}
+        for event_type, counter in self.counters.iteritems():
+            count = counter.count(seconds, now)
+            if count:
+                matrix[event_type] = count
+
+        return matrix
+
+    def get_request_timing(self, seconds, now=None):
+        """
+        Return the number of the requests of the latest seconds and their best and worst time
+        """
+        now = time.time() if now is None else now
+
+        count, best, worst = 0, None, None
+        for counter in self.counters.itervalues():
+            for i in counter.slots(seconds, now):
+                count += counter.counts[i]
+                best = counter.min_durations[i] if best is None else min(best, counter.min_durations[i])
+                worst = counter.max_durations[i] if worst is None else max(worst, counter.max_durations[i])
+
+        return count, best, worst
+
+    def take_snapshot(self, seconds, now=None):
+        """
+        Return the number and the average duration of the events of each
+        type for each of the latest seconds
+        """
+        now = time.time() if now is None else now
+
+        ret = []
+        for event_type, counter in self.counters.iteritems():
+            for i in counter.slots(seconds, now):
+                ret.append({
+                    'creation_date': datetime_to_ISO8601(datetime.utcfromtimestamp(counter.seconds[i]))[:-1],
+                    'event': event_type,
+                    'count': counter.counts[i],
+                    'duration': round(counter.durations[i] / counter.counts[i], 1)
+                })
+
+        ret.sort(key=operator.itemgetter('creation_date'))
+
+        for i, entry in enumerate(ret):
+            entry['id'] = i + 1
 
-    def event_number(self):
-        self.event_absolute_counter += 1
-        return self.event_absolute_counter
+        return ret
 
-    def take_current_snapshot(self):
-        return [event_obj.serialize_event() for _, event_obj in EventTrackQueue.iteritems()]
+    def clear(self):
+        for counter in self.counters.itervalues():
+            counter.clear()
 
 
-EventTrackQueue = EventTrackQueueClass(timeout=60)
+EventCounters = EventCountersClass()
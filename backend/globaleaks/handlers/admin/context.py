@@ -232,8 +232,9 @@ def delete_context(store, context_id):
 
 class ContextsCollection(BaseHandler):
     check_roles = 'admin'
-    cache_resource = True
-    invalidate_cache = True
+    # the contexts include the ids of their receivers and their pictures
+    cache_resource = (models.Context, models.Receiver, models.File)
+    invalidate_cache = (models.Context, models.Receiver)
 
     def get(self):
         """
@@ -262,7 +263,7 @@ class ContextsCollection(BaseHandler):
 
 class ContextInstance(BaseHandler):
     check_roles = 'admin'
-    invalidate_cache = True
+    invalidate_cache = (models.Context, models.Receiver)
 
     def put(self, context_id):
         """
@@ -296,8 +296,8 @@ def get_fieldtemplate_list(store, language):
 
 class FieldTemplatesCollection(BaseHandler):
     check_roles = 'admin'
-    cache_resource = True
-    invalidate_cache = True
+    cache_resource = (models.Field,)
+    invalidate_cache = (models.Field, models.Questionnaire)
 
     def get(self):
         """
@@ -321,7 +321,7 @@ class FieldTemplatesCollection(BaseHandler):
 
 class FieldTemplateInstance(BaseHandler):
     check_roles = 'admin'
-    invalidate_cache = True
+    invalidate_cache = (models.Field, models.Questionnaire)
 
     def put(self, field_id):
         """
@@ -356,8 +356,8 @@ class FieldCollection(BaseHandler):
     /admin/fields
     """
     check_roles = 'admin'
-    cache_resource = True
-    invalidate_cache = True
+    cache_resource = (models.Field,)
+    invalidate_cache = (models.Field, models.Questionnaire)
 
     def post(self):
         """
@@ -381,7 +381,7 @@ class FieldInstance(BaseHandler):
     /admin/fields
     """
     check_roles = 'admin'
-    invalidate_cache = True
+    invalidate_cache = (models.Field, models.Questionnaire)
 
     def put(self, field_id):
         """
@@ -12,7 +12,7 @@ from globaleaks import models, utils, LANGUAGES_SUPPORTED_CODES, LANGUAGES_SUPPO
 from globaleaks.db import db_refresh_memory_variables
 from globaleaks.db.appdata import load_appdata
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.models.config import NodeFactory, PrivateFactory
+from globaleaks.models.config import Config, NodeFactory, PrivateFactory
 from globaleaks.models.l10n import EnabledLanguage, NodeL10NFactory
 from globaleaks.orm import transact
 from globaleaks.rest import errors, requests
@@ -114,8 +114,8 @@ def update_node(*args):
 
 class NodeInstance(BaseHandler):
     check_roles = 'admin'
-    cache_resource = True
-    invalidate_cache = True
+    cache_resource = (Config,)
+    invalidate_cache = (Config,)
 
     def get(self):
         """
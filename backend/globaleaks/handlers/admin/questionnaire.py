@@ -165,8 +165,8 @@ def delete_questionnaire(store, questionnaire_id):
 
 class QuestionnairesCollection(BaseHandler):
     check_roles = 'admin'
-    cache_resource = True
-    invalidate_cache = True
+    cache_resource = (models.Questionnaire,)
+    invalidate_cache = (models.Questionnaire,)
 
     def get(self):
         """
@@ -195,7 +195,7 @@ class QuestionnairesCollection(BaseHandler):
 
 class QuestionnaireInstance(BaseHandler):
     check_roles = 'admin'
-    invalidate_cache = True
+    invalidate_cache = (models.Questionnaire,)
 
     def put(self, questionnaire_id):
         """
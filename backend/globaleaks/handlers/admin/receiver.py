@@ -107,7 +107,7 @@ def update_receiver(store, receiver_id, request, language):
 
 class ReceiversCollection(BaseHandler):
     check_roles = 'admin'
-    cache_resource = True
+    cache_resource = (models.Receiver, models.File)
 
     def get(self):
         """
@@ -122,7 +122,7 @@ class ReceiversCollection(BaseHandler):
 
 class ReceiverInstance(BaseHandler):
     check_roles = 'admin'
-    invalidate_cache = True
+    invalidate_cache = (models.Receiver, models.Context)
 
     def put(self, receiver_id):
         """
@@ -43,8 +43,8 @@ def delete_shorturl(store, shorturl_id):
 
 class ShortURLCollection(BaseHandler):
     check_roles = 'admin'
-    cache_resource = True
-    invalidate_cache = True
+    cache_resource = (models.ShortURL,)
+    invalidate_cache = (models.ShortURL,)
 
     def get(self):
         """
@@ -63,6 +63,7 @@ class ShortURLCollection(BaseHandler):
 
 class ShortURLInstance(BaseHandler):
     check_roles = 'admin'
+    invalidate_cache = (models.ShortURL,)
 
     def delete(self, shorturl_id):
         """
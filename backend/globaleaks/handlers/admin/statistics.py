@@ -5,14 +5,14 @@
 #
 # Implementation of classes handling the HTTP request to /node, public
 # exposed API.
-import operator
 from datetime import timedelta
 from storm.expr import Desc, And
 
-from globaleaks.orm import transact
-from globaleaks.event import EventTrackQueue, events_monitored
+from globaleaks.orm import transact, transact_ro, get_orm_stats
+from globaleaks.event import EventCounters, events_monitored
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.models import Stats, Anomalies
+from globaleaks.rest.apicache import GLApiCache
 from globaleaks.settings import GLSettings
 from globaleaks.utils.utility import datetime_to_ISO8601, datetime_now, \
     iso_to_gregorian, log
@@ -29,7 +29,7 @@ def weekmap_to_heatmap(week_map):
 
     return retlist
 
-@transact
+@transact_ro
 def get_stats(store, week_delta):
     """
     :param week_delta: commonly is 0, mean that you're taking this
@@ -167,30 +167,23 @@ class RecentEventsCollection(BaseHandler):
     """
     check_roles = 'admin'
 
-    def get_summary(self, templist):
+    def get_summary(self, seconds):
         eventmap = dict()
         for event in events_monitored:
             eventmap.setdefault(event['name'], 0)
 
-        for e in templist:
-            eventmap[e['event']] += 1
+        eventmap.update(EventCounters.get_event_matrix(seconds))
 
         return eventmap
 
     def get(self, kind):
-        templist = []
-
-        # the current 30 seconds
-        templist += EventTrackQueue.take_current_snapshot()
-        # the already stocked by side, until Stats dump them in 1hour
-        templist += GLSettings.RecentEventQ
-
-        templist.sort(key=operator.itemgetter('id'))
+        # the events collected until Stats dump them in 1hour
+        seconds = EventCounters.get_statistics_window()
 
         if kind == 'details':
-            return templist
+            return EventCounters.take_snapshot(seconds)
         else:  # kind == 'summary':
-            return self.get_summary(templist)
+            return self.get_summary(seconds)
 
 
 class JobsTiming(BaseHandler):
@@ -209,3 +202,23 @@ class JobsTiming(BaseHandler):
             })
 
         return response
+
+
+class ORMStats(BaseHandler):
+    """
+    This handler return the queue depth of the ORM thread pools
+    """
+    check_roles = 'admin'
+
+    def get(self):
+        return get_orm_stats()
+
+
+class APICacheStats(BaseHandler):
+    """
+    This handler return the counters of the API cache
+    """
+    check_roles = 'admin'
+
+    def get(self):
+        return GLApiCache.get_stats()
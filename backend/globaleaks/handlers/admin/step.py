@@ -98,8 +98,8 @@ class StepCollection(BaseHandler):
     /admin/steps
     """
     check_roles = 'admin'
-    cache_resource = True
-    invalidate_cache = True
+    cache_resource = (models.Questionnaire,)
+    invalidate_cache = (models.Questionnaire,)
 
     def post(self):
         """
@@ -122,7 +122,7 @@ class StepInstance(BaseHandler):
     /admin/step
     """
     check_roles = 'admin'
-    invalidate_cache = True
+    invalidate_cache = (models.Questionnaire,)
 
     def put(self, step_id):
         """
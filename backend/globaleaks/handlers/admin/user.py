@@ -202,8 +202,8 @@ def get_user_list(store, language):
 
 class UsersCollection(BaseHandler):
     check_roles = 'admin'
-    cache_resource = True
-    invalidate_cache = True
+    cache_resource = (models.User, models.File)
+    invalidate_cache = (models.User, models.Receiver)
 
     def get(self):
         """
@@ -238,7 +238,7 @@ class UsersCollection(BaseHandler):
 
 class UserInstance(BaseHandler):
     check_roles = 'admin'
-    invalidate_cache = True
+    invalidate_cache = (models.User, models.Receiver)
 
     def put(self, user_id):
         """
@@ -12,7 +12,7 @@ from globaleaks import security
 from globaleaks.handlers.base import BaseHandler, GLSessions, new_session
 from globaleaks.models import User
 from globaleaks.models import WhistleblowerTip
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import errors, requests
 from globaleaks.settings import GLSettings
 from globaleaks.utils.utility import datetime_now, deferred_sleep, log, randint
@@ -47,18 +47,19 @@ def random_login_delay():
     return 0
 
 
+def db_get_wbtip_by_receipt_hash(store, receipt_hash):
+    return store.find(WhistleblowerTip,
+                      WhistleblowerTip.receipt_hash == unicode(receipt_hash)).one()
+
+
 def db_get_wbtip_by_receipt(store, receipt):
     hashed_receipt = security.hash_password(receipt, GLSettings.memory_copy.private.receipt_salt)
-    return store.find(WhistleblowerTip,
-                     WhistleblowerTip.receipt_hash == unicode(hashed_receipt)).one()
+    return db_get_wbtip_by_receipt_hash(store, hashed_receipt)
 
 
 @transact
-def login_whistleblower(store, receipt, client_using_tor):
-    """
-    login_whistleblower returns the WhistleblowerTip.id
-    """
-    wbtip = db_get_wbtip_by_receipt(store, receipt)
+def login_whistleblower_by_receipt_hash(store, receipt_hash, client_using_tor):
+    wbtip = db_get_wbtip_by_receipt_hash(store, receipt_hash)
     if not wbtip:
         log.debug("Whistleblower login: Invalid receipt")
         GLSettings.failed_login_attempts += 1
@@ -73,15 +74,42 @@ def login_whistleblower(store, receipt, client_using_tor):
     return wbtip.id
 
 
-@transact
-def login(store, username, password, client_using_tor):
+@inlineCallbacks
+def login_whistleblower(receipt, client_using_tor):
     """
-    login returns a tuple (user_id, state, pcn)
+    login_whistleblower returns the WhistleblowerTip.id
+
+    The receipt is hashed on the KDF pool before the transaction so that
+    the transaction is limited to the lookup of the tip.
+    """
+    receipt_hash = yield security.deferred_hash_password(receipt, GLSettings.memory_copy.private.receipt_salt)
+
+    wbtip_id = yield login_whistleblower_by_receipt_hash(receipt_hash, client_using_tor)
+
+    returnValue(wbtip_id)
+
+
+@transact_ro
+def get_user_credentials(store, username):
+    """
+    get_user_credentials returns a tuple (user_id, salt, password) or None
     """
     user = store.find(User, And(User.username == username,
                                 User.state != u'disabled')).one()
 
-    if not user or not security.check_password(password, user.salt, user.password):
+    if user:
+        return user.id, user.salt, user.password
+
+
+@transact
+def login_user(store, user_id, password_hash, client_using_tor):
+    user = store.find(User, And(User.id == user_id,
+                                User.password == password_hash,
+                                User.state != u'disabled')).one()
+
+    # the user could have been disabled or the password changed while
+    # the password was being checked
+    if not user:
         log.debug("Login: Invalid credentials")
         GLSettings.failed_login_attempts += 1
         raise errors.InvalidAuthentication
@@ -95,6 +123,31 @@ def login(store, username, password, client_using_tor):
     return user.id, user.state, user.role, user.password_change_needed
 
 
+@inlineCallbacks
+def login(username, password, client_using_tor):
+    """
+    login returns a tuple (user_id, state, role, pcn)
+
+    The password is verified on the KDF pool between a read-only lookup
+    of the credentials and the transaction updating the user.
+    """
+    credentials = yield get_user_credentials(username)
+
+    valid = False
+    if credentials:
+        user_id, salt, password_hash = credentials
+        valid = yield security.deferred_check_password(password, salt, password_hash)
+
+    if not valid:
+        log.debug("Login: Invalid credentials")
+        GLSettings.failed_login_attempts += 1
+        raise errors.InvalidAuthentication
+
+    ret = yield login_user(user_id, password_hash, client_using_tor)
+
+    returnValue(ret)
+
+
 class AuthenticationHandler(BaseHandler):
     """
     Login handler for admins and recipents and custodians
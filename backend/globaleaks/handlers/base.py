@@ -26,6 +26,7 @@ from globaleaks.rest import errors, requests
 from globaleaks.security import GLSecureTemporaryFile, directory_traversal_check, generateRandomKey, sha512
 from globaleaks.settings import GLSettings
 from globaleaks.transactions import schedule_email_for_all_admins
+from globaleaks.utils.assets import accepts_gzip
 from globaleaks.utils.mailutils import mail_exception_handler, schedule_exception_email
 from globaleaks.utils.tempdict import TempDict
 from globaleaks.utils.utility import log, deferred_sleep
@@ -98,20 +99,87 @@ def write_upload_encrypted_to_disk(uploaded_file, destination):
     return uploaded_file
 
 
+def parse_range_header(value, size):
+    """
+    Parses the value of an HTTP Range header for a file of the given size.
+
+    Only single byte ranges are supported; for any other request the
+    function returns None and the whole file is expected to be sent.
+
+    @param value: the value of the Range header
+    @param size: the size of the file
+    @return: a tuple (start, end) with the inclusive bounds of the range
+    """
+    unit, _, ranges = value.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in ranges:
+        return None
+
+    start, sep, end = ranges.strip().partition('-')
+    if not sep:
+        return None
+
+    try:
+        if start == '':
+            # suffix range: the last bytes of the file
+            start, end = size - int(end), size - 1
+            if start == size:
+                raise errors.RequestedRangeNotSatisfiable
+
+            start = max(start, 0)
+        else:
+            start = int(start)
+            end = int(end) if end != '' else size - 1
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise errors.RequestedRangeNotSatisfiable
+
+    if start > end:
+        return None
+
+    return start, min(end, size - 1)
+
+
+def match_etag(value, etag):
+    """
+    Returns True if the value of an If-None-Match header matches the etag
+
+    @param value: the value of the If-None-Match header or None
+    @param etag: the etag of the current representation of the resource
+    """
+    if value is None:
+        return False
+
+    for candidate in value.split(','):
+        candidate = candidate.strip()
+
+        # If-None-Match uses the weak comparison
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+
+        if candidate == '*' or candidate == etag:
+            return True
+
+    return False
+
+
 class StaticFileProducer(object):
     """
     Streaming producer for files
 
     @ivar request: The L{IRequest} to write the contents of the file to.
     @ivar fileObject: The file the contents of which to write to the request.
+    @ivar fileSize: The number of bytes to write starting from the offset.
     """
     bufferSize = GLSettings.file_chunk_size
 
-    def __init__(self, request, filePath):
+    def __init__(self, request, filePath, offset=0, size=None):
         self.finish = defer.Deferred()
         self.request = request
-        self.fileSize = os.stat(filePath).st_size
+        self.fileSize = os.stat(filePath).st_size - offset if size is None else size
         self.fileObject = open(filePath, "rb")
+        self.fileObject.seek(offset)
         self.bytesWritten = 0
 
     def start(self):
@@ -123,12 +191,12 @@ class StaticFileProducer(object):
             return
 
         try:
-            data = self.fileObject.read(self.bufferSize)
+            data = self.fileObject.read(min(self.bufferSize, self.fileSize - self.bytesWritten))
             if len(data) > 0:
                 self.bytesWritten += len(data)
                 self.request.write(data)
 
-            if self.bytesWritten == self.fileSize:
+            if len(data) == 0 or self.bytesWritten == self.fileSize:
                 self.stopProducing()
         except:
             self.stopProducing()
@@ -169,20 +237,31 @@ class BaseHandler(object):
     serialize_lists = True
     handler_exec_time_threshold = HANDLER_EXEC_TIME_THRESHOLD
     uniform_answer_time = False
+
+    # the responses to GET are cached when cache_resource is set and the
+    # other methods invalidate the cache when invalidate_cache is set;
+    # the values can be True, meaning all the models, or a tuple of the
+    # models the responses depend on / the methods change
     cache_resource = False
     invalidate_cache = False
 
+    # the etag of the response when already known, e.g. for cache hits
+    etag = None
+
     def __init__(self, request):
         self.name = type(self).__name__
         self.request = request
         self.request.start_time = datetime.now()
 
-    def write(self, chunk):
+    def serialize(self, chunk):
         if isinstance(chunk, types.DictType) or isinstance(chunk, types.ListType):
             chunk = json.dumps(chunk)
             self.request.setHeader(b'content-type', b'application/json')
 
-        self.request.write(bytes(chunk))
+        return bytes(chunk)
+
+    def write(self, chunk):
+        self.request.write(self.serialize(chunk))
 
     @staticmethod
     def authentication(f, roles):
@@ -430,15 +509,53 @@ class BaseHandler(object):
 
         return StaticFileProducer(self.request, filepath).start()
 
-    def force_file_download(self, filename, filepath):
+    def get_requested_range(self, size, etag=None):
+        """
+        Returns the byte range of a file of the given size requested by the
+        client as a tuple (start, end), or None if the whole file is to be sent.
+
+        A range conditioned by an If-Range header is honored only if the
+        condition matches the ETag of the file.
+        """
+        value = self.request.headers.get('range')
+        if value is None:
+            return None
+
+        if_range = self.request.headers.get('if-range')
+        if if_range is not None and (etag is None or if_range.strip() != etag):
+            return None
+
+        try:
+            return parse_range_header(value, size)
+        except errors.RequestedRangeNotSatisfiable:
+            self.request.setHeader('Content-Range', 'bytes */%d' % size)
+            raise
+
+    def force_file_download(self, filename, filepath, etag=None):
         if not os.path.exists(filepath) or not os.path.isfile(filepath):
           raise errors.ResourceNotFound()
 
+        size = os.stat(filepath).st_size
+        file_range = self.get_requested_range(size, etag)
+
         self.request.setHeader('X-Download-Options', 'noopen')
         self.request.setHeader('Content-Type', 'application/octet-stream')
         self.request.setHeader('Content-Disposition', 'attachment; filename=\"%s\"' % filename)
+        self.request.setHeader('Accept-Ranges', 'bytes')
 
-        return StaticFileProducer(self.request, filepath).start()
+        if etag is not None:
+            self.request.setHeader('ETag', etag)
+
+        if file_range is None:
+            offset, length = 0, size
+        else:
+            offset, length = file_range[0], file_range[1] - file_range[0] + 1
+            self.request.setResponseCode(206)
+            self.request.setHeader('Content-Range', 'bytes %d-%d/%d' % (file_range[0], file_range[1], size))
+
+        self.request.setHeader('Content-Length', str(length))
+
+        return StaticFileProducer(self.request, filepath, offset, length).start()
 
     @property
     def current_user(self):
@@ -480,17 +597,42 @@ class BaseHandler(object):
         total_file_size = int(self.request.args['flowTotalSize'][0])
         flow_identifier = self.request.args['flowIdentifier'][0]
 
-        chunk_size = len(self.request.args['file'][0])
-        if ((chunk_size / (1024 * 1024)) > GLSettings.memory_copy.maximum_filesize or
-            (total_file_size / (1024 * 1024)) > GLSettings.memory_copy.maximum_filesize):
+        # the chunk is a GLSecureTemporaryFile when the request body has been
+        # streamed by the MultipartUploadParser and a string otherwise
+        chunk = self.request.args['file'][0]
+        streamed = isinstance(chunk, GLSecureTemporaryFile)
+
+        # the limit is checked in bytes because the MultipartUploadParser
+        # stops writing the data exceeding it while still counting its size
+        max_size = GLSettings.memory_copy.maximum_filesize * 1024 * 1024
+        chunk_size = chunk.size if streamed else len(chunk)
+        if chunk_size > max_size or total_file_size > max_size:
+            if streamed:
+                chunk.close()
+
             log.err("File upload request rejected: file too big")
             raise errors.FileTooBig(GLSettings.memory_copy.maximum_filesize)
 
         if flow_identifier not in GLUploads:
-            GLUploads[flow_identifier] = GLSecureTemporaryFile(GLSettings.tmp_upload_path)
+            if streamed:
+                # the encrypted chunk is directly used as the upload file
+                GLUploads[flow_identifier] = chunk
+            else:
+                GLUploads[flow_identifier] = GLSecureTemporaryFile(GLSettings.tmp_upload_path)
+                GLUploads[flow_identifier].write(chunk)
+        else:
+            f = GLUploads[flow_identifier]
+            if streamed:
+                data = chunk.read(GLSettings.file_chunk_size)
+                while data != '':
+                    f.write(data)
+                    data = chunk.read(GLSettings.file_chunk_size)
+
+                chunk.close()
+            else:
+                f.write(chunk)
 
         f = GLUploads[flow_identifier]
-        f.write(self.request.args['file'][0])
 
         if self.request.args['flowChunkNumber'][0] != self.request.args['flowTotalChunks'][0]:
             return None
@@ -547,5 +689,53 @@ class StaticFileHandler(BaseHandler):
         return self.write_file(abspath)
 
 
+class ClientFileHandler(StaticFileHandler):
+    """
+    Serves the files of the client from the assets manifest built at startup.
+
+    The files requested with the version of their content are cached by the
+    browsers forever, the others can be cached but are revalidated by ETag.
+    """
+    def get(self, path):
+        if path == '':
+            path = 'index.html'
+
+        manifest = GLSettings.appstate.client_assets
+        asset = manifest.get(path) if manifest is not None else None
+        if asset is None:
+            return StaticFileHandler.get(self, path)
+
+        # the gzip variant of the content is identified by its own etag
+        gzip = asset.compressible and accepts_gzip(self.request)
+        etag = asset.gzip_etag if gzip else asset.etag
+
+        self.request.setHeader('Content-Type', asset.content_type)
+        self.request.setHeader('ETag', etag)
+
+        if asset.compressible:
+            self.request.setHeader('Vary', 'Accept-Encoding')
+
+        if self.request.args.get('v', [None])[0] == asset.hash:
+            self.request.setHeader('Cache-Control', 'public, max-age=31536000, immutable')
+            self.request.responseHeaders.removeHeader('Pragma')
+            self.request.responseHeaders.removeHeader('Expires')
+        else:
+            self.request.setHeader('Cache-Control', 'no-cache')
+
+        if match_etag(self.request.headers.get('if-none-match'), etag):
+            self.request.setResponseCode(304)
+            return
+
+        data, compressed = manifest.load(asset)
+
+        if gzip and compressed is not None:
+            self.request.setHeader('Content-Encoding', 'gzip')
+            data = compressed
+
+        self.request.setHeader('Content-Length', str(len(data)))
+
+        return data
+
+
 class AdminStaticFileHandler(StaticFileHandler):
     check_roles = 'admin'
@@ -132,6 +132,16 @@ class ExportHandler(BaseHandler):
         self.request.setHeader('Content-Type', 'application/octet-stream')
         self.request.setHeader('Content-Disposition', 'attachment; filename=\"%s.zip\"' % tip_export['tip']['sequence_number'])
 
-        self.zip_stream = iter(ZipStream(tip_export['files']))
+        # the archive is generated on the fly and its download can't be resumed
+        self.request.setHeader('Accept-Ranges', 'none')
+
+        zip_stream = ZipStream(tip_export['files'])
+
+        # the size of archives made only of STORED files is known in advance
+        size = zip_stream.size()
+        if size is not None:
+            self.request.setHeader('Content-Length', str(size))
+
+        self.zip_stream = iter(zip_stream)
 
         yield ZipStreamProducer(self, self.zip_stream).start()
@@ -8,7 +8,8 @@ import os
 
 from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
-from globaleaks.orm import transact
+from globaleaks.orm import transact_ro
+from globaleaks.rest.apicache import GLApiCache
 from globaleaks.security import directory_traversal_check
 from globaleaks.settings import GLSettings
 
@@ -17,7 +18,7 @@ def langfile_path(lang):
     return os.path.abspath(os.path.join(GLSettings.client_path, 'l10n', '%s.json' % lang))
 
 
-@transact
+@transact_ro
 def get_l10n(store, lang):
     path = langfile_path(lang)
     directory_traversal_check(GLSettings.client_path, path)
@@ -39,7 +40,10 @@ class L10NHandler(BaseHandler):
     if the file are not present, default translations are returned
     """
     check_roles = '*'
-    cache_resource = True
+    cache_resource = (models.CustomTexts,)
 
     def get(self, lang):
         return get_l10n(lang)
+
+
+GLApiCache.register_warmer('/l10n/{}', get_l10n, L10NHandler.cache_resource)
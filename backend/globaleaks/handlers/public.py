@@ -10,9 +10,10 @@ from globaleaks import models, LANGUAGES_SUPPORTED
 from globaleaks.handlers.admin.files import db_get_file
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.models import l10n
-from globaleaks.models.config import NodeFactory
+from globaleaks.models.config import Config, NodeFactory
 from globaleaks.models.l10n import NodeL10NFactory
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
+from globaleaks.rest.apicache import GLApiCache
 from globaleaks.settings import GLSettings
 from globaleaks.utils.sets import disjoint_union
 from globaleaks.utils.structures import get_localized_values
@@ -392,7 +393,7 @@ def db_get_public_receiver_list(store, language):
     return [serialize_receiver(store, receiver, language, data) for receiver in receivers]
 
 
-@transact
+@transact_ro
 def get_public_resources(store, language):
     return {
         'node': db_serialize_node(store, language),
@@ -404,10 +405,13 @@ def get_public_resources(store, language):
 
 class PublicResource(BaseHandler):
     check_roles = '*'
-    cache_resource = True
+    cache_resource = (Config, models.Context, models.Questionnaire, models.Receiver, models.File)
 
     def get(self):
         """
         Get all the public resources.
         """
         return get_public_resources(self.request.language)
+
+
+GLApiCache.register_warmer('/public', get_public_resources, PublicResource.cache_resource)
@@ -13,7 +13,7 @@ from globaleaks.handlers.submission import db_serialize_archived_preview_schema
 from globaleaks.handlers.user import db_user_update_user
 from globaleaks.handlers.user import user_serialize_user
 from globaleaks.models import ArchivedSchema, Comment, Context, InternalFile, InternalTip, Message, Receiver, ReceiverTip
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import requests, errors
 from globaleaks.settings import GLSettings
 from globaleaks.utils.structures import Rosetta, get_localized_values
@@ -59,7 +59,7 @@ def update_receiver_settings(store, receiver_id, request, language):
     return receiver_serialize_receiver(receiver, language)
 
 
-@transact
+@transact_ro
 def get_receivertip_list(store, receiver_id, language):
     rtip_summary_list = []
 
@@ -11,7 +11,7 @@ import string
 
 from storm.expr import In
 from twisted.internet import threads
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import inlineCallbacks, returnValue
 
 from globaleaks.handlers.base import BaseHandler, \
     directory_traversal_check, write_upload_plaintext_to_disk
@@ -24,7 +24,7 @@ from globaleaks.models import serializers, \
     ReceiverFile, ReceiverTip, \
     WhistleblowerFile, \
     SecureFileDelete, IdentityAccessRequest
-from globaleaks.orm import transact
+from globaleaks.orm import transact, transact_ro
 from globaleaks.rest import errors, requests
 from globaleaks.settings import GLSettings
 from globaleaks.utils.utility import log, get_expiration, datetime_now, \
@@ -199,7 +199,7 @@ def receiver_get_rfile_list(store, rtip_id):
     return db_receiver_get_rfile_list(store, rtip_id)
 
 
-def db_get_rtip(store, user_id, rtip_id, language):
+def db_register_rtip_access(store, user_id, rtip_id):
     rtip = db_access_rtip(store, user_id, rtip_id)
 
     rtip.access_counter += 1
@@ -208,6 +208,10 @@ def db_get_rtip(store, user_id, rtip_id, language):
     log.debug("Tip %s access granted to user %s (%d)" %
               (rtip.internaltip_id, rtip.receiver.user.name, rtip.access_counter))
 
+
+def db_get_rtip(store, user_id, rtip_id, language):
+    rtip = db_access_rtip(store, user_id, rtip_id)
+
     return serialize_rtip(store, rtip, language)
 
 
@@ -327,6 +331,11 @@ def set_receivertip_variable(store, user_id, rtip_id, key, value):
 
 
 @transact
+def register_rtip_access(store, user_id, rtip_id):
+    return db_register_rtip_access(store, user_id, rtip_id)
+
+
+@transact_ro
 def get_rtip(store, user_id, rtip_id, language):
     return db_get_rtip(store, user_id, rtip_id, language)
 
@@ -407,6 +416,7 @@ class RTipInstance(BaseHandler):
     """
     check_roles = 'receiver'
 
+    @inlineCallbacks
     def get(self, tip_id):
         """
         Parameters: None
@@ -420,7 +430,11 @@ class RTipInstance(BaseHandler):
         This method is decorated as @BaseHandler.unauthenticated because in the handler
         the various cases are managed differently.
         """
-        return get_rtip(self.current_user.user_id, tip_id, self.request.language)
+        yield register_rtip_access(self.current_user.user_id, tip_id)
+
+        rtip = yield get_rtip(self.current_user.user_id, tip_id, self.request.language)
+
+        returnValue(rtip)
 
     def put(self, tip_id):
         """
@@ -607,8 +621,7 @@ class ReceiverFileDownload(BaseHandler):
     """
     check_roles = 'receiver'
 
-    @transact
-    def download_rfile(self, store, user_id, file_id):
+    def db_get_rfile(self, store, user_id, file_id):
         rfile = store.find(ReceiverFile,
                            ReceiverFile.id == file_id,
                            ReceiverFile.receivertip_id == ReceiverTip.id,
@@ -617,22 +630,47 @@ class ReceiverFileDownload(BaseHandler):
         if not rfile:
             raise errors.FileIdNotFound
 
-        log.debug("Download of file %s by receiver %s (%d)" %
-                  (rfile.internalfile_id, rfile.receivertip.receiver_id, rfile.downloads))
+        return rfile
+
+    def serialize_rfile(self, rfile):
+        ret = serializers.serialize_rfile(rfile)
+        ret['etag'] = '"%s-%d"' % (rfile.id, rfile.size)
+
+        return ret
+
+    @transact_ro
+    def get_rfile(self, store, user_id, file_id):
+        return self.serialize_rfile(self.db_get_rfile(store, user_id, file_id))
 
-        rfile.downloads += 1
+    @transact
+    def download_rfile(self, store, user_id, file_id, count_download):
+        rfile = self.db_get_rfile(store, user_id, file_id)
+
+        if count_download:
+            log.debug("Download of file %s by receiver %s (%d)" %
+                      (rfile.internalfile_id, rfile.receivertip.receiver_id, rfile.downloads))
+
+            rfile.downloads += 1
 
-        return serializers.serialize_rfile(rfile)
+        return self.serialize_rfile(rfile)
 
     @inlineCallbacks
     def get(self, rfile_id):
-        rfile = yield self.download_rfile(self.current_user.user_id, rfile_id)
+        rfile = yield self.get_rfile(self.current_user.user_id, rfile_id)
+
+        # the range is evaluated here because the request can be accessed
+        # only by the reactor thread; the resume of an interrupted transfer
+        # is not accounted as a new download
+        file_range = self.get_requested_range(rfile['size'], rfile['etag'])
+
+        rfile = yield self.download_rfile(self.current_user.user_id, rfile_id,
+                                          file_range is None or file_range[0] == 0)
 
         filelocation = os.path.join(GLSettings.submission_path, rfile['path'])
 
         directory_traversal_check(GLSettings.submission_path, filelocation)
 
-        yield self.force_file_download(rfile['name'], filelocation)
+        yield self.force_file_download(rfile['name'], filelocation, rfile['etag'])
 
 
 class IdentityAccessRequestsCollection(BaseHandler):
@@ -8,7 +8,7 @@ from globaleaks import models
 from globaleaks.handlers.base import BaseHandler
 from globaleaks.orm import transact
 from globaleaks.rest import requests, errors
-from globaleaks.security import change_password, parse_pgp_key
+from globaleaks.security import GLPGPKeyrings, change_password, parse_pgp_key
 from globaleaks.settings import GLSettings
 from globaleaks.utils.structures import get_localized_values
 from globaleaks.utils.utility import datetime_to_ISO8601, datetime_now, datetime_null
@@ -29,6 +29,9 @@ def parse_pgp_options(user, request):
     if not remove_key and pgp_key_public != '':
         k = parse_pgp_key(pgp_key_public)
 
+    if user.pgp_key_fingerprint and (k is None or k['public'] != user.pgp_key_public):
+        GLPGPKeyrings.invalidate(user.pgp_key_fingerprint)
+
     if k is not None:
         user.pgp_key_public = k['public']
         user.pgp_key_fingerprint = k['fingerprint']
@@ -137,7 +140,7 @@ class UserInstance(BaseHandler):
         - pgp key
     """
     check_roles = {'admin', 'receiver', 'custodian'}
-    invalidate_cache = True
+    invalidate_cache = (models.User, models.Receiver)
 
     def get(self):
         """
@@ -93,4 +93,4 @@ class Wizard(BaseHandler):
 
         # Invalidation is performed at this stage only after the asserts within
         # wizard have ensured that the wizard can be executed.
-        GLApiCache.invalidate()
+        yield GLApiCache.invalidate()
@@ -5,6 +5,7 @@ from globaleaks.jobs import cleaning_sched, \
                             notification_sched, \
                             onion_service, \
                             pgp_check_sched, \
+                            secure_file_delete_sched, \
                             session_management_sched, \
                             statistics_sched, \
                             x509_cert_check_sched
@@ -18,6 +19,7 @@ jobs_list = [
     session_management_sched.SessionManagementSchedule,
     cleaning_sched.CleaningSchedule,
     pgp_check_sched.PGPCheckSchedule,
+    secure_file_delete_sched.SecureFileDeleteSchedule,
     statistics_sched.StatisticsSchedule,
     x509_cert_check_sched.X509CertCheckSchedule,
 ]
@@ -36,5 +38,6 @@ __all__ = [
     'cleaning_sched',
     'session_management_sched',
     'pgp_check_sched',
+    'secure_file_delete_sched',
     'x509_cert_check_sched',
 ]
@@ -6,13 +6,16 @@
 # Call also the FileProcess working point, in order to verify which
 # kind of file has been submitted.
 
+import Queue
 import os
+import threading
+from functools import partial
 
 from globaleaks.handlers.admin.receiver import admin_serialize_receiver
 from globaleaks.jobs.base import LoopingJob
 from globaleaks.models import InternalFile, ReceiverFile
 from globaleaks.orm import transact_sync
-from globaleaks.security import GLBPGP, GLSecureFile, generateRandomKey
+from globaleaks.security import GLPGPKeyrings, GLSecureFile, generateRandomKey
 from globaleaks.settings import GLSettings
 from globaleaks.utils.utility import log
 
@@ -50,6 +53,10 @@ def receiverfile_planning(store):
 
         ifile.processing_attempts += 1
 
+        # remove the receiverfiles planned by a previous failed attempt
+        store.find(ReceiverFile, ReceiverFile.internalfile_id == ifile.id,
+                                 ReceiverFile.status == u'processing').remove()
+
         for rtip in ifile.internaltip.receivertips:
             receiverfile = ReceiverFile()
             receiverfile.internalfile_id = ifile.id
@@ -85,113 +92,334 @@ def receiverfile_planning(store):
     return receiverfiles_maps
 
 
-def fsops_pgp_encrypt(fpath, recipient_pgp):
+def fsops_pgp_encrypt(f, recipient_pgp):
     """
     return
         path of encrypted file,
         length of the encrypted file
 
-    this function is used to encrypt a file for a specific recipient.
+    this function is used to encrypt a plaintext stream for a specific recipient.
     commonly 'receiver_desc' is expected as second argument;
     anyhow a simpler dict can be used.
 
     required keys are checked on top
     """
-    gpoj = GLBPGP()
+    gpoj = GLPGPKeyrings.get(recipient_pgp['pgp_key_public'])
+
+    encrypted_file_path = os.path.join(os.path.abspath(GLSettings.submission_path), "pgp_encrypted-%s" % generateRandomKey(16))
+    _, encrypted_file_size = gpoj.encrypt_file(recipient_pgp['pgp_key_fingerprint'], f, encrypted_file_path)
+
+    return encrypted_file_path, encrypted_file_size
+
+
+class PlaintextStream(object):
+    """
+    Bounded stream of plaintext chunks written by the delivery tee and
+    read by the gpg process encrypting the file of a receiver.
+    """
+    max_chunks = 16
+
+    def __init__(self):
+        self.queue = Queue.Queue(self.max_chunks)
+        self.chunk = b''
+        self.offset = 0
+        self.eof = False
+        self.closed = False
+
+    def write(self, chunk):
+        # the reader could have stopped reading because of an error of gpg
+        if not self.closed:
+            self.queue.put(chunk)
+
+    def read(self, size=-1):
+        if self.offset == len(self.chunk):
+            if self.eof:
+                return b''
 
+            self.chunk = self.queue.get()
+            self.offset = 0
+
+            if self.chunk == b'':
+                self.eof = True
+                return b''
+
+        if size < 0:
+            size = len(self.chunk)
+
+        data = self.chunk[self.offset:self.offset + size]
+        self.offset += len(data)
+        return data
+
+    def close(self):
+        self.closed = True
+
+        # unblock the writer
+        while True:
+            try:
+                self.queue.get_nowait()
+            except Queue.Empty:
+                break
+
+
+def encrypt_receiverfile(rcounter, rfileinfo, stream):
     try:
-        gpoj.load_key(recipient_pgp['pgp_key_public'])
+        new_path, new_size = fsops_pgp_encrypt(stream, rfileinfo['receiver'])
+
+        log.debug("%d# Switch on Receiver File for %s path %s => %s size %d => %d" %
+                  (rcounter,  rfileinfo['receiver']['name'], rfileinfo['path'],
+                   new_path, rfileinfo['size'], new_size))
+
+        rfileinfo['path'] = new_path
+        rfileinfo['size'] = new_size
+        rfileinfo['status'] = u'encrypted'
+    except Exception as excep:
+        log.err("%d# Unable to complete PGP encrypt for %s on %s: %s. marking the file as unavailable." % (
+                rcounter, rfileinfo['receiver']['name'], rfileinfo['path'], excep)
+        )
+        rfileinfo['status'] = u'unavailable'
+    finally:
+        stream.close()
+
+
+def acquire_encryption_slots(slots, n):
+    """
+    Acquire up to n of the slots bounding the concurrent gpg processes.
+
+    The first slot is waited for while the others are only taken if
+    available; since a tee never waits while holding a slot the tees of
+    different ifiles can not deadlock each other.
+    """
+    slots.acquire()
 
-        filepath = os.path.join(GLSettings.submission_path, fpath)
+    count = 1
+    while count < n and slots.acquire(False):
+        count += 1
 
-        with GLSecureFile(filepath) as f:
-            encrypted_file_path = os.path.join(os.path.abspath(GLSettings.submission_path), "pgp_encrypted-%s" % generateRandomKey(16))
-            _, encrypted_file_size = gpoj.encrypt_file(recipient_pgp['pgp_key_fingerprint'], f, encrypted_file_path)
+    return count
 
-    except:
-        raise
 
+def tee_pass(ifile_path, encryptors, plaintext_f):
+    """
+    Decrypt the ifile feeding the plaintext to the given encryptions and
+    to the optional plaintext copy; return the size of the plaintext or -1
+    """
+    streams = []
+    for rcounter, rfileinfo in encryptors:
+        stream = PlaintextStream()
+        thread = threading.Thread(target=encrypt_receiverfile, args=(rcounter, rfileinfo, stream))
+        thread.start()
+        streams.append((stream, thread))
+
+    written_size = 0
+    try:
+        with GLSecureFile(ifile_path) as encrypted_file:
+            chunk_size = 65536
+            while True:
+                chunk = encrypted_file.read(chunk_size)
+                if len(chunk) == 0:
+                    break
+
+                written_size += len(chunk)
+
+                for stream, _ in streams:
+                    stream.write(chunk)
+
+                if plaintext_f is not None:
+                    plaintext_f.write(chunk)
+    except Exception as excep:
+        log.err("Unable to read the ifile %s: %s" % (ifile_path, excep))
+        written_size = -1
     finally:
-        # the finally statement is always called also if
-        # except contains a return or a raise
-        gpoj.destroy_environment()
+        for stream, thread in streams:
+            stream.write(b'')
+            thread.join()
 
-    return encrypted_file_path, encrypted_file_size
+    return written_size
 
 
-def process_files(receiverfiles_maps):
+def tee_internalfile(ifile_id, receiverfiles_map, slots=None):
     """
-    @param receiverfiles_maps: the mapping of ifile/rfiles to be created on filesystem
-    @return: return None
+    Decrypt the ifile feeding at the same time the plaintext to the
+    encryption of each receiver file and to the optional plaintext copy.
+
+    The number of concurrent encryptions is bounded by the slots; when the
+    receivers exceed the slots acquired the ifile is decrypted once for
+    each batch of them.
     """
-    for ifile_id, receiverfiles_map in receiverfiles_maps.iteritems():
-        ifile_path = receiverfiles_map['ifile_path']
-        ifile_name = os.path.basename(ifile_path).split('.')[0]
-        plain_path = os.path.join(GLSettings.submission_path, "%s.plain" % ifile_name)
+    ifile_path = receiverfiles_map['ifile_path']
+    ifile_name = os.path.basename(ifile_path).split('.')[0]
+    plain_path = os.path.join(GLSettings.submission_path, "%s.plain" % ifile_name)
 
-        receiverfiles_map['plaintext_file_needed'] = False
-        for rcounter, rfileinfo in enumerate(receiverfiles_map['rfiles']):
-            if len(rfileinfo['receiver']['pgp_key_public']):
-                try:
-                    new_path, new_size = fsops_pgp_encrypt(rfileinfo['path'], rfileinfo['receiver'])
-
-                    log.debug("%d# Switch on Receiver File for %s path %s => %s size %d => %d" %
-                              (rcounter,  rfileinfo['receiver']['name'], rfileinfo['path'],
-                               new_path, rfileinfo['size'], new_size))
-
-                    rfileinfo['path'] = new_path
-                    rfileinfo['size'] = new_size
-                    rfileinfo['status'] = u'encrypted'
-                except Exception as excep:
-                    log.err("%d# Unable to complete PGP encrypt for %s on %s: %s. marking the file as unavailable." % (
-                            rcounter, rfileinfo['receiver']['name'], rfileinfo['path'], excep)
-                    )
-                    rfileinfo['status'] = u'unavailable'
-            elif GLSettings.memory_copy.allow_unencrypted:
-                receiverfiles_map['plaintext_file_needed'] = True
-                rfileinfo['status'] = u'reference'
-                rfileinfo['path'] = plain_path
-            else:
-                rfileinfo['status'] = u'nokey'
+    pending = [(rcounter, rfileinfo) for rcounter, rfileinfo in enumerate(receiverfiles_map['rfiles'])
+               if rfileinfo['status'] == u'processing']
 
-        if receiverfiles_map['plaintext_file_needed']:
-            log.debug(":( NOT all receivers support PGP and the system allows plaintext version of files: %s saved as plaintext file %s" %
-                      (ifile_path, plain_path))
+    plaintext_f = None
+    if receiverfiles_map['plaintext_file_needed']:
+        log.debug(":( NOT all receivers support PGP and the system allows plaintext version of files: %s saved as plaintext file %s" %
+                  (ifile_path, plain_path))
 
-            try:
-                with open(plain_path, "wb") as plaintext_f, GLSecureFile(ifile_path) as encrypted_file:
-                    chunk_size = 4096
-                    written_size = 0
-                    while True:
-                        chunk = encrypted_file.read(chunk_size)
-                        if len(chunk) == 0:
-                            if written_size != receiverfiles_map['ifile_size']:
-                                log.err("Integrity error on rfile write for ifile %s; ifile_size(%d), rfile_size(%d)" %
-                                        (ifile_id, receiverfiles_map['ifile_size'], written_size))
-                            break
-                        written_size += len(chunk)
-                        plaintext_f.write(chunk)
-
-                receiverfiles_map['ifile_path'] = plain_path
-            except Exception as excep:
-                log.err("Unable to create plaintext file %s: %s" % (plain_path, excep))
-        else:
-            log.debug("All Receivers support PGP or the system denies plaintext version of files: marking internalfile as removed")
-
-        # the original AES file should always be deleted
-        log.debug("Deleting the submission AES encrypted file: %s" % ifile_path)
-
-        # Remove the AES file
         try:
-            os.remove(ifile_path)
-        except OSError as ose:
-            log.err("Unable to remove %s: %s" % (ifile_path, ose.message))
+            plaintext_f = open(plain_path, "wb")
+        except Exception as excep:
+            log.err("Unable to create plaintext file %s: %s" % (plain_path, excep))
+    else:
+        log.debug("All Receivers support PGP or the system denies plaintext version of files: marking internalfile as removed")
 
-        # Remove the AES file key
-        try:
-            os.remove(os.path.join(GLSettings.ramdisk_path, ("%s%s" % (GLSettings.AES_keyfile_prefix, ifile_name))))
-        except OSError as ose:
-            log.err("Unable to remove keyfile associated with %s: %s" % (ifile_path, ose.message))
+    plaintext_needed = plaintext_f is not None
+
+    processed = []
+    written_size = None
+    try:
+        while written_size is None or pending:
+            acquired = 0
+            if pending and slots is not None:
+                acquired = acquire_encryption_slots(slots, len(pending))
+                batch, pending = pending[:acquired], pending[acquired:]
+            else:
+                batch, pending = pending, []
+
+            try:
+                size = tee_pass(ifile_path, batch, plaintext_f)
+            finally:
+                for _ in range(acquired):
+                    slots.release()
+
+            processed += batch
+
+            # the plaintext copy is written only by the first pass
+            if plaintext_f is not None:
+                plaintext_f.close()
+                plaintext_f = None
+
+            if size == -1 or (written_size is not None and size != written_size):
+                written_size = -1
+                break
+
+            written_size = size
+    finally:
+        if plaintext_f is not None:
+            plaintext_f.close()
+
+    if written_size == -1:
+        for _, rfileinfo in processed + pending:
+            if rfileinfo['status'] == u'encrypted':
+                os.remove(rfileinfo['path'])
+
+            rfileinfo['status'] = u'unavailable'
+
+        return
+
+    if written_size != receiverfiles_map['ifile_size']:
+        log.err("Integrity error on rfile write for ifile %s; ifile_size(%d), rfile_size(%d)" %
+                (ifile_id, receiverfiles_map['ifile_size'], written_size))
+
+    if plaintext_needed:
+        receiverfiles_map['ifile_path'] = plain_path
+
+
+def process_internalfile(ifile_id, receiverfiles_map, slots=None):
+    """
+    Handle an ifile: create the receiver files, store the result and
+    remove the original AES file.
+    """
+    ifile_path = receiverfiles_map['ifile_path']
+    ifile_name = os.path.basename(ifile_path).split('.')[0]
+
+    tee_internalfile(ifile_id, receiverfiles_map, slots)
+
+    try:
+        update_internalfile_and_store_receiverfiles({ifile_id: receiverfiles_map})
+    except Exception as excep:
+        # the ifile is kept as new and is going to be retried by the next
+        # planning up to INTERNALFILES_HANDLE_RETRY_MAX times
+        log.err("Unable to store receiverfiles of ifile %s: %s" % (ifile_id, excep))
+
+        for rfileinfo in receiverfiles_map['rfiles']:
+            if rfileinfo['status'] == u'encrypted':
+                try:
+                    os.remove(rfileinfo['path'])
+                except OSError:
+                    pass
+
+        return
+
+    # the original AES file should always be deleted
+    log.debug("Deleting the submission AES encrypted file: %s" % ifile_path)
+
+    # Remove the AES file
+    try:
+        os.remove(ifile_path)
+    except OSError as ose:
+        log.err("Unable to remove %s: %s" % (ifile_path, ose.message))
+
+    # Remove the AES file key
+    try:
+        os.remove(os.path.join(GLSettings.ramdisk_path, ("%s%s" % (GLSettings.AES_keyfile_prefix, ifile_name))))
+    except OSError as ose:
+        log.err("Unable to remove keyfile associated with %s: %s" % (ifile_path, ose.message))
+
+
+class ReceiverFilesProcessor(object):
+    """
+    Fan out the processing of the ifiles on GLSettings.delivery_tp.
+
+    Each ifile is decrypted once and its plaintext is streamed to the
+    encryption of all its receiver files; the completion is tracked for
+    each ifile so that every ifile is stored as soon as it is ready,
+    independently of the other ifiles of the same run.
+
+    The gpg processes of all the ifiles share GLSettings.delivery_threads
+    slots so that their number is bounded regardless of the receivers.
+    """
+    def __init__(self, receiverfiles_maps):
+        self.receiverfiles_maps = receiverfiles_maps
+        self.slots = threading.Semaphore(GLSettings.delivery_threads)
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.remaining = len(receiverfiles_maps)
+
+    def run(self):
+        if not self.remaining:
+            return
+
+        for ifile_id, receiverfiles_map in self.receiverfiles_maps.iteritems():
+            ifile_name = os.path.basename(receiverfiles_map['ifile_path']).split('.')[0]
+            plain_path = os.path.join(GLSettings.submission_path, "%s.plain" % ifile_name)
+
+            receiverfiles_map['plaintext_file_needed'] = False
+
+            for rfileinfo in receiverfiles_map['rfiles']:
+                if len(rfileinfo['receiver']['pgp_key_public']):
+                    rfileinfo['status'] = u'processing'
+                elif GLSettings.memory_copy.allow_unencrypted:
+                    receiverfiles_map['plaintext_file_needed'] = True
+                    rfileinfo['status'] = u'reference'
+                    rfileinfo['path'] = plain_path
+                else:
+                    rfileinfo['status'] = u'nokey'
+
+        for ifile_id, receiverfiles_map in self.receiverfiles_maps.items():
+            GLSettings.delivery_tp.callInThreadWithCallback(partial(self.ifile_completed, ifile_id),
+                                                            process_internalfile, ifile_id, receiverfiles_map, self.slots)
+
+        self.done.wait()
+
+    def ifile_completed(self, ifile_id, success, result):
+        if not success:
+            log.err("Unable to complete the processing of ifile %s: %s" % (ifile_id, result))
+
+        with self.lock:
+            self.remaining -= 1
+            if not self.remaining:
+                self.done.set()
+
+
+def process_files(receiverfiles_maps):
+    """
+    @param receiverfiles_maps: the mapping of ifile/rfiles to be created on filesystem
+    @return: return None
+    """
+    ReceiverFilesProcessor(receiverfiles_maps).run()
 
 
 @transact_sync
@@ -229,4 +457,3 @@ class DeliverySchedule(LoopingJob):
 
         if len(receiverfiles_maps):
             process_files(receiverfiles_maps)
-            update_internalfile_and_store_receiverfiles(receiverfiles_maps)
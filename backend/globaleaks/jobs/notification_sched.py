@@ -2,8 +2,10 @@
 # Implement the notification of new submissions
 
 import copy
+import time
+from collections import OrderedDict
 
-from twisted.internet import reactor, threads
+from twisted.internet import defer, reactor, threads
 
 from globaleaks import models
 from globaleaks.handlers.admin.context import admin_serialize_context
@@ -13,7 +15,7 @@ from globaleaks.handlers.admin.receiver import admin_serialize_receiver
 from globaleaks.handlers.rtip import serialize_rtip, serialize_message, serialize_comment
 from globaleaks.jobs.base import LoopingJob
 from globaleaks.orm import transact, transact_sync
-from globaleaks.security import GLBPGP
+from globaleaks.security import GLPGPKeyrings
 from globaleaks.settings import GLSettings
 from globaleaks.utils.mailutils import sendmail
 from globaleaks.utils.templating import Templating
@@ -37,9 +39,14 @@ trigger_model_map = {
 
 
 class MailGenerator(object):
-    def __init__(self):
+    def __init__(self, digest=False):
         self.cache = {}
 
+        # when enabled the events of each receiver are collected and
+        # notified with a single mail
+        self.digest = digest
+        self.digests = OrderedDict()
+
     def serialize_config(self, store, key, language):
         cache_key = key + '-' + language
         cache_obj = None
@@ -138,6 +145,22 @@ class MailGenerator(object):
           log.debug("Discarding emails for %s due to receiver's preference." % receiver_id)
           return
 
+        if self.digest:
+            self.digests.setdefault(receiver_id, []).append(data)
+            return
+
+        self.create_mail(store, [data])
+
+    def create_mail(self, store, events):
+        """
+        Create the mail notifying a list of events to their receiver
+
+        The events are rendered with their templates and concatenated; the
+        subject of the mail is the one of the first event.
+        """
+        data = events[0]
+        receiver_id = data['receiver']['id']
+
         # https://github.com/globaleaks/GlobaLeaks/issues/798
         # TODO: the current solution is global and configurable only by the admin
         sent_emails = GLSettings.get_mail_counter(receiver_id)
@@ -157,31 +180,36 @@ class MailGenerator(object):
             # simply changing the type of the notification causes
             # to send the notification_limit_reached
             data['type'] = u'receiver_notification_limit_reached'
+            events = [data]
 
-        data['notification'] = self.serialize_config(store, 'notification', data['receiver']['language'])
-        data['node'] = self.serialize_config(store, 'node', data['receiver']['language'])
+        notification = self.serialize_config(store, 'notification', data['receiver']['language'])
+        node = self.serialize_config(store, 'node', data['receiver']['language'])
 
-        if not data['node']['allow_unencrypted'] and len(data['receiver']['pgp_key_public']) == 0:
+        if not node['allow_unencrypted'] and len(data['receiver']['pgp_key_public']) == 0:
             return
 
-        subject, body = Templating().get_mail_subject_and_body(data)
+        mails = []
+        for event in events:
+            event['notification'] = notification
+            event['node'] = node
+            mails.append(Templating().get_mail_subject_and_body(event))
+
+        subject = mails[0][0]
+        if len(mails) > 1:
+            subject += ' (+%d)' % (len(mails) - 1)
+
+        body = ('\n\n' + '-' * 40 + '\n\n').join(mail[1] for mail in mails)
 
         # If the receiver has encryption enabled encrypt the mail body
         if len(data['receiver']['pgp_key_public']):
-            gpob = GLBPGP()
-
             try:
-                gpob.load_key(data['receiver']['pgp_key_public'])
+                gpob = GLPGPKeyrings.get(data['receiver']['pgp_key_public'])
                 body = gpob.encrypt_message(data['receiver']['pgp_key_fingerprint'], body)
             except Exception as excep:
                 log.err("Error in PGP interface object (for %s: %s)! (notification+encryption)" %
                         (data['receiver']['username'], str(excep)))
 
                 return
-            finally:
-                # the finally statement is always called also if
-                # except contains a return or a raise
-                gpob.destroy_environment()
 
         store.add(models.Mail({
             'address': data['receiver']['mail_address'],
@@ -189,7 +217,6 @@ class MailGenerator(object):
             'body': body
         }))
 
-
     @transact_sync
     def generate(self, store):
         for trigger in ['ReceiverTip', 'Comment', 'Message', 'ReceiverFile']:
@@ -213,6 +240,17 @@ class MailGenerator(object):
                 log.debug("Notification: generated %d notifications of type %s" %
                           (count, trigger))
 
+        for receiver_id, events in self.digests.items():
+            log.debug("Notification: generated digest of %d notifications for receiver %s" %
+                      (len(events), receiver_id))
+
+            self.create_mail(store, events)
+
+
+@transact_sync
+def count_new_notifications(store):
+    return sum(store.find(model, model.new == True).count() for model in trigger_model_map.values())
+
 
 @transact
 def delete_sent_mail(store, result, mail_id):
@@ -220,10 +258,13 @@ def delete_sent_mail(store, result, mail_id):
 
 
 @transact_sync
-def get_mails_from_the_pool(store):
+def get_mails_from_the_pool(store, exclude_ids=()):
     ret = []
 
     for mail in store.find(models.Mail):
+        if mail.id in exclude_ids:
+            continue
+
         if mail.processing_attempts > 9:
             store.remove(mail)
             continue
@@ -234,7 +275,8 @@ def get_mails_from_the_pool(store):
             'id': mail.id,
             'address': mail.address,
             'subject': mail.subject,
-            'body': mail.body
+            'body': mail.body,
+            'processing_attempts': mail.processing_attempts
         })
 
     return ret
@@ -245,17 +287,68 @@ class NotificationSchedule(LoopingJob):
     interval = 5
     monitor_interval = 3 * 60
 
+    # delay of the first retry of a mail that failed to be delivered;
+    # the delay is doubled at each attempt up to retry_delay_max
+    retry_delay = 30
+    retry_delay_max = 3600
+
+    def __init__(self):
+        LoopingJob.__init__(self)
+
+        # time of the next attempt of the mails that failed to be delivered
+        self.retry_time = {}
+
+        # time of the first event collected in the current digest
+        self.digest_start = None
+
+    def mail_failed(self, failure, mail):
+        delay = min(self.retry_delay * 2 ** (mail['processing_attempts'] - 1), self.retry_delay_max)
+        self.retry_time[mail['id']] = time.time() + delay
+
+        log.debug("Failed to deliver mail %s (attempt %d); next attempt in %d seconds" %
+                  (mail['id'], mail['processing_attempts'], delay))
+
     def sendmail(self, mail):
         d = sendmail(mail['address'], mail['subject'], mail['body'])
-        d.addCallback(delete_sent_mail, mail['id'])
+        d.addCallbacks(delete_sent_mail, self.mail_failed, callbackArgs=(mail['id'],), errbackArgs=(mail,))
         return d
 
+    def sendmails(self, mails):
+        # the mails are queued at once on the smtp pool that delivers them
+        # in parallel over its sessions
+        return defer.DeferredList([self.sendmail(mail) for mail in mails], consumeErrors=True)
+
     def spool_emails(self):
-        mails = get_mails_from_the_pool()
-        for mail in mails:
-            threads.blockingCallFromThread(reactor, self.sendmail, mail)
+        now = time.time()
+
+        self.retry_time = {mail_id: t for mail_id, t in self.retry_time.items() if t > now}
+
+        mails = get_mails_from_the_pool(self.retry_time)
+        if mails:
+            threads.blockingCallFromThread(reactor, self.sendmails, mails)
+
+    def generate_mails(self):
+        interval = GLSettings.memory_copy.notif.notification_digest_interval
+        if not interval:
+            self.digest_start = None
+            MailGenerator().generate()
+            return
+
+        # the events are left pending until the end of the digest window
+        # opened by the first of them
+        if not count_new_notifications():
+            self.digest_start = None
+            return
+
+        now = time.time()
+        if self.digest_start is None:
+            self.digest_start = now
+
+        if now - self.digest_start >= interval * 60:
+            self.digest_start = None
+            MailGenerator(digest=True).generate()
 
     def operation(self):
-        MailGenerator().generate()
+        self.generate_mails()
 
         self.spool_emails()
@@ -22,7 +22,7 @@ from twisted.internet.error import ConnectionRefusedError
 from twisted.internet.defer import inlineCallbacks, Deferred
 
 from globaleaks.rest.apicache import GLApiCache
-from globaleaks.models.config import NodeFactory, PrivateFactory
+from globaleaks.models.config import Config, NodeFactory, PrivateFactory
 from globaleaks.rest.apicache import GLApiCache
 from globaleaks.utils.utility import deferred_sleep, log
 
@@ -54,8 +54,6 @@ def set_onion_service_info(store, hostname, key):
     priv_fact = PrivateFactory(store)
     priv_fact.set_val('tor_onion_key', key)
 
-    GLApiCache.invalidate()
-
 
 class OnionService(ServiceJob):
     name = "OnionService"
@@ -87,6 +85,7 @@ class OnionService(ServiceJob):
                 log.info('Initialization of hidden-service %s completed.', ephs.hostname)
                 if hostname == '' and key == '':
                     yield set_onion_service_info(ephs.hostname, ephs.private_key)
+                    yield GLApiCache.invalidate((Config,))
 
             d = ephs.add_to_tor(tor_conn.protocol)
             d.addCallback(initialization_callback) # pylint: disable=no-member
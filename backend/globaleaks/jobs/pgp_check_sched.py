@@ -10,6 +10,7 @@ from globaleaks.handlers.admin.user import db_get_admin_users
 from globaleaks.handlers.user import user_serialize_user
 from globaleaks.jobs.base import LoopingJob
 from globaleaks.orm import transact_sync
+from globaleaks.security import GLPGPKeyrings
 from globaleaks.settings import GLSettings
 from globaleaks.transactions import db_schedule_email
 from globaleaks.utils.templating import Templating
@@ -72,6 +73,7 @@ class PGPCheckSchedule(LoopingJob):
             expired_or_expiring.append(user_serialize_user(user, GLSettings.memory_copy.default_language))
 
             if user.pgp_key_expiration < datetime_now():
+                GLPGPKeyrings.invalidate(user.pgp_key_fingerprint)
                 user.pgp_key_public = ''
                 user.pgp_key_fingerprint = ''
                 user.pgp_key_expiration = datetime_null()
@@ -0,0 +1,99 @@
+# -*- coding: UTF-8
+# Implementation of the secure deletion of the files.
+#
+# The files marked for secure deletion by means of SecureFileDelete are
+# overwritten in background on GLSettings.secure_delete_tp so that the
+# number of the files wiped in parallel is bounded by the size of the pool.
+import os
+import threading
+import time
+from functools import partial
+
+from storm.expr import In
+
+from globaleaks import models
+from globaleaks.jobs.base import LoopingJob
+from globaleaks.orm import transact_sync
+from globaleaks.security import overwrite_and_remove
+from globaleaks.settings import GLSettings
+from globaleaks.utils.utility import log
+
+
+__all__ = ['SecureFileDeleteSchedule']
+
+
+@transact_sync
+def get_files_to_secure_delete(store, limit):
+    return list(store.find(models.SecureFileDelete).config(limit=limit).values(models.SecureFileDelete.filepath))
+
+
+@transact_sync
+def commit_files_deletion(store, filepaths):
+    store.find(models.SecureFileDelete, In(models.SecureFileDelete.filepath, filepaths)).remove()
+
+
+def secure_delete_file(filepath):
+    # the file could have been removed by a previous interrupted run
+    if not os.path.exists(filepath):
+        return
+
+    start_time = time.time()
+    log.debug("Starting secure delete of file %s" % filepath)
+    overwrite_and_remove(filepath)
+    log.debug("Ending secure delete of file %s (execution time: %.2f)" % (filepath, time.time() - start_time))
+
+
+class SecureFilesEraser(object):
+    """
+    Fan out the secure deletion of the files on GLSettings.secure_delete_tp
+    """
+    def __init__(self, filepaths):
+        self.filepaths = filepaths
+        self.deleted = []
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.remaining = len(filepaths)
+
+    def run(self):
+        if not self.remaining:
+            return []
+
+        for filepath in self.filepaths:
+            GLSettings.secure_delete_tp.callInThreadWithCallback(partial(self.file_completed, filepath),
+                                                                 secure_delete_file, filepath)
+
+        self.done.wait()
+
+        return self.deleted
+
+    def file_completed(self, filepath, success, result):
+        with self.lock:
+            if success:
+                self.deleted.append(filepath)
+            else:
+                log.err("Unable to perform the secure deletion of file %s: %s" % (filepath, result))
+
+            self.remaining -= 1
+            if not self.remaining:
+                self.done.set()
+
+
+class SecureFileDeleteSchedule(LoopingJob):
+    name = "SecureFileDelete"
+    interval = 10
+    monitor_interval = 30 * 60
+
+    # number of the files fetched from the queue on each iteration
+    batch_size = 100
+
+    def operation(self):
+        while True:
+            filepaths = get_files_to_secure_delete(self.batch_size)
+            if not filepaths:
+                break
+
+            deleted = SecureFilesEraser(filepaths).run()
+            if not deleted:
+                break
+
+            commit_files_deletion(deleted)
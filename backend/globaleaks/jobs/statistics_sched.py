@@ -4,6 +4,7 @@
 import os
 
 from globaleaks.anomaly import Alarm
+from globaleaks.event import EventCounters
 from globaleaks.jobs.base import LoopingJob
 from globaleaks.models import Stats, Anomalies
 from globaleaks.orm import transact_sync
@@ -48,16 +49,7 @@ def get_anomalies():
     return anomalies
 
 def get_statistics():
-    statsummary = {}
-
-    for descblob in GLSettings.RecentEventQ:
-        if 'event' not in descblob:
-            continue
-
-        statsummary.setdefault(descblob['event'], 0)
-        statsummary[descblob['event']] += 1
-
-    return statsummary
+    return EventCounters.get_event_matrix(EventCounters.get_statistics_window())
 
 @transact_sync
 def save_statistics(store, start, end, activity_collection):
@@ -59,11 +59,10 @@ class X509CertCheckSchedule(LoopingJob):
             log.err('ACME certificate renewal failed with: %s' % e)
             raise
         try:
-            yield GLSettings.appstate.process_supervisor.shutdown()
-            yield GLSettings.appstate.process_supervisor.maybe_launch_https_workers()
+            GLSettings.appstate.process_supervisor.db_reload_tls_contexts(store)
         except Exception as e:
             self.acme_failures =+ 1
-            log.err('Restart of HTTPS workers failed with: %s' % e)
+            log.err('Reload of the TLS contexts of the HTTPS workers failed with: %s' % e)
             raise
 
     @transact_sync
@@ -7,17 +7,68 @@ from twisted.internet import defer
 from twisted.protocols import policies
 from twisted.web import http
 from twisted.web.client import HTTPPageGetter
-from twisted.web.http import HTTPChannel, HTTPFactory, Request
+from twisted.web.http import HTTPChannel, HTTPFactory, Request, parse_qs, \
+    _respondToBadRequestAndDisconnect
 
 from globaleaks.settings import GLSettings
+from globaleaks.utils.multipart import MultipartError, MultipartUploadParser, \
+    get_multipart_boundary
 
 
 HTTPFactory__init__orig = HTTPFactory.__init__
 Request__write__orig = Request.write
+Request__requestReceived__orig = Request.requestReceived
 
 
 def mock_Request_gotLength(self, length):
-    self.content = StringIO()
+    """
+    The mock keeps the request bodies in memory avoiding the plaintext
+    temporary files used by twisted; multipart bodies are instead parsed
+    while received and their files are encrypted directly on the disk.
+    """
+    ctype = self.requestHeaders.getRawHeaders(b'content-type')
+    boundary = get_multipart_boundary(ctype[0] if ctype else None)
+
+    if boundary:
+        self.content = MultipartUploadParser(boundary,
+                                             GLSettings.memory_copy.maximum_filesize * 1024 * 1024)
+    else:
+        self.content = StringIO()
+
+
+def mock_Request_requestReceived(self, command, path, version):
+    """
+    The mock bypasses the cgi.parse_multipart processing of the whole
+    body for the requests already parsed by the MultipartUploadParser.
+    """
+    if not isinstance(self.content, MultipartUploadParser):
+        return Request__requestReceived__orig(self, command, path, version)
+
+    parser, self.content = self.content, StringIO()
+
+    self.args = {}
+    self.method, self.uri = command, path
+    self.clientproto = version
+    x = self.uri.split(b'?', 1)
+
+    if len(x) == 1:
+        self.path = self.uri
+    else:
+        self.path, argstring = x
+        self.args = parse_qs(argstring, 1)
+
+    self.client = self.channel.transport.getPeer()
+    self.host = self.channel.transport.getHost()
+
+    try:
+        parser.finalize()
+    except MultipartError:
+        _respondToBadRequestAndDisconnect(self.channel.transport)
+        return
+
+    self.args.update(parser.args)
+
+    self.process()
 
 
 def mock_HTTPFactory__init__(self, logPath=None, timeout=60, logFormatter=None):
@@ -48,6 +99,7 @@ def mock_HTTChannel__timeoutConnection(self):
 
 
 Request.gotLength = mock_Request_gotLength
+Request.requestReceived = mock_Request_requestReceived
 HTTPPageGetter.timeout = mock_HTTPPageGetter_timeout
 HTTPFactory.__init__ = mock_HTTPFactory__init__
 HTTPChannel.timeoutConnection = mock_HTTChannel__timeoutConnection
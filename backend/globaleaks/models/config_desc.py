@@ -79,6 +79,7 @@ GLConfig = {
 
         'tip_expiration_threshold': Int(validator=natnum_v, default=72), # Hours
         'notification_threshold_per_hour': Int(validator=natnum_v, default=20),
+        'notification_digest_interval': Int(validator=natnum_v, default=0), # Minutes; 0 disables the digests
 
         'exception_email_address': Unicode(validator=shorttext_v, default=u'globaleaks-stackexception@lists.globaleaks.org'),
         'exception_email_pgp_key_fingerprint': Unicode(default=u''),
@@ -28,18 +28,32 @@ class SQLite(storm.databases.sqlite.Database):
             raise storm.databases.sqlite.DatabaseModuleError("'pysqlite2' module not found")
         self._filename = uri.database or ":memory:"
         self._timeout = float(uri.options.get("timeout", 30))
+        self._cached_statements = int(uri.options.get("cached_statements", 256))
         self._synchronous = uri.options.get("synchronous")
+        self._auto_vacuum = uri.options.get("auto_vacuum")
         self._journal_mode = uri.options.get("journal_mode")
         self._foreign_keys = uri.options.get("foreign_keys")
+        self._query_only = uri.options.get("query_only")
 
     def raw_connect(self):
+        # connections are kept open by the StorePool and are used by a
+        # single thread at a time; check_same_thread is disabled in order
+        # to permit the pool to close them at shutdown.
         raw_connection = sqlite.connect(self._filename, timeout=self._timeout,
-                                        isolation_level=None)
+                                        isolation_level=None,
+                                        check_same_thread=False,
+                                        cached_statements=self._cached_statements)
 
         if self._synchronous is not None:
             raw_connection.execute("PRAGMA synchronous = %s" %
                                    (self._synchronous,))
 
+        # auto_vacuum needs to be configured before the journal_mode
+        # as switching to WAL initializes the header of new databases
+        if self._auto_vacuum is not None:
+            raw_connection.execute("PRAGMA auto_vacuum = %s" %
+                                   (self._auto_vacuum,))
+
         if self._journal_mode is not None:
             raw_connection.execute("PRAGMA journal_mode = %s" %
                                    (self._journal_mode,))
@@ -48,6 +62,10 @@ class SQLite(storm.databases.sqlite.Database):
             raw_connection.execute("PRAGMA foreign_keys = %s" %
                                    (self._foreign_keys,))
 
+        if self._query_only is not None:
+            raw_connection.execute("PRAGMA query_only = %s" %
+                                   (self._query_only,))
+
         raw_connection.execute("PRAGMA secure_delete = ON")
 
         return raw_connection
@@ -60,6 +78,91 @@ def get_store():
     return Store(create_database(GLSettings.db_uri))
 
 
+class StorePool(object):
+    """
+    Pool of long-lived stores.
+
+    A store is kept open for each thread and database uri so that the
+    sqlite connections, their pragmas and their prepared statements cache
+    are reused across transactions instead of being setup on every call.
+    """
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.stores = set()
+        self.generation = 0
+
+    def _get_thread_stores(self):
+        if getattr(self.local, 'generation', None) != self.generation:
+            self.local.generation = self.generation
+            self.local.stores = {}
+
+        return self.local.stores
+
+    def get(self, uri):
+        stores = self._get_thread_stores()
+
+        store = stores.get(uri)
+        if store is None:
+            store = stores[uri] = Store(create_database(uri))
+            with self.lock:
+                self.stores.add(store)
+
+        return store
+
+    def discard(self, uri):
+        """
+        Close and remove from the pool the store of the current thread;
+        used to recycle connections after an error.
+        """
+        store = self._get_thread_stores().pop(uri, None)
+        if store is None:
+            return
+
+        with self.lock:
+            self.stores.discard(store)
+
+        try:
+            store.rollback()
+        finally:
+            store.close()
+
+    def clear(self):
+        with self.lock:
+            stores, self.stores = self.stores, set()
+            self.generation += 1
+
+        for store in stores:
+            store.close()
+
+    def count(self):
+        return len(self.stores)
+
+
+store_pool = StorePool()
+
+
+def get_thread_pool_stats(tp):
+    """
+    Return the queue depth and the occupation of an ORM thread pool
+    """
+    queue = getattr(tp, '_queue', None)
+
+    return {
+        'queued': queue.qsize() if queue is not None else 0,
+        'working': len(getattr(tp, 'working', [])),
+        'threads': getattr(tp, 'max', 1)
+    }
+
+
+def get_orm_stats():
+    return {
+        'rw': get_thread_pool_stats(GLSettings.orm_tp),
+        'ro': get_thread_pool_stats(GLSettings.orm_ro_tp),
+        'connections': store_pool.count()
+    }
+
+
 transact_lock = threading.Lock()
 
 
@@ -98,34 +201,61 @@ class transact(object):
         passing the store to it.
         """
         with transact_lock:
-            start_time = datetime.now()
-            store = Store(create_database(GLSettings.db_uri))
-
-            try:
-                if self.instance:
-                    result = function(self.instance, store, *args, **kwargs)
-                else:
-                    result = function(store, *args, **kwargs)
-
-                store.commit()
-            except:
-                store.rollback()
-                raise
+            return self._execute(GLSettings.db_uri, function, *args, **kwargs)
+
+    def _execute(self, uri, function, *args, **kwargs):
+        start_time = datetime.now()
+        store = store_pool.get(uri)
+
+        try:
+            if self.instance:
+                result = function(self.instance, store, *args, **kwargs)
+            else:
+                result = function(store, *args, **kwargs)
+
+            self._conclude(store)
+        except:
+            store_pool.discard(uri)
+            raise
+        else:
+            return result
+        finally:
+            store.reset()
+
+            duration = timedelta_to_milliseconds(datetime.now() - start_time)
+            msg = "Query [%s] executed in %.1fms" % (self.method.__name__, duration)
+            if duration > self.timelimit:
+                log.err(msg)
+                schedule_exception_email(msg)
             else:
-                return result
-            finally:
-                store.reset()
-                store.close()
+                log.debug(msg)
 
-                duration = timedelta_to_milliseconds(datetime.now() - start_time)
-                msg = "Query [%s] executed in %.1fms" % (self.method.__name__, duration)
-                if duration > self.timelimit:
-                    log.err(msg)
-                    schedule_exception_email(msg)
-                else:
-                    log.debug(msg)
+    def _conclude(self, store):
+        store.commit()
 
 
 class transact_sync(transact):
     def run(self, function, *args, **kwargs):
         return function(*args, **kwargs)
+
+
+class transact_ro(transact):
+    """
+    Class decorator for managing read-only transactions.
+
+    Read-only transactions are executed on a dedicated multi-thread pool
+    without acquiring the transact_lock; thanks to the WAL journal mode
+    they can run concurrently among them and with the serialized writes.
+    """
+    def run(self, function, *args, **kwargs):
+        return deferToThreadPool(reactor,
+                                 GLSettings.orm_ro_tp,
+                                 function,
+                                 *args,
+                                 **kwargs)
+
+    def _wrap(self, function, *args, **kwargs):
+        return self._execute(GLSettings.db_ro_uri, function, *args, **kwargs)
+
+    def _conclude(self, store):
+        store.rollback()
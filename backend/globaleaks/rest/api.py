@@ -5,8 +5,6 @@
 #   This file defines the URI mapping for the GlobaLeaks API and its factory
 
 import json
-import re
-
 import urlparse
 
 from twisted.internet import reactor, defer
@@ -44,6 +42,7 @@ from globaleaks.handlers.admin import step as admin_step
 from globaleaks.handlers.admin import user as admin_user
 
 from globaleaks.rest import apicache, requests, errors
+from globaleaks.rest.router import Router
 from globaleaks.settings import GLSettings
 from globaleaks.utils.utility import randbits
 from globaleaks.utils.mailutils import extract_exception_traceback_and_send_email
@@ -127,6 +126,8 @@ api_spec = [
     (r'/admin/activities/(summary|details)', admin_statistics.RecentEventsCollection),
     (r'/admin/anomalies', admin_statistics.AnomalyCollection),
     (r'/admin/jobs', admin_statistics.JobsTiming),
+    (r'/admin/orm', admin_statistics.ORMStats),
+    (r'/admin/apicache', admin_statistics.APICacheStats),
     (r'/admin/l10n/(' + '|'.join(LANGUAGES_SUPPORTED_CODES) + ')', admin_l10n.AdminL10NHandler),
     (r'/admin/files/(logo|favicon|css|homepage|script)', admin_files.FileInstance),
     (r'/admin/config/tls', https.ConfigHandler),
@@ -151,7 +152,7 @@ api_spec = [
     (r'/l10n/(' + '|'.join(LANGUAGES_SUPPORTED_CODES) + ')', l10n.L10NHandler),
 
     ## This handler attempts to route all non routed get requests
-    (r'/([a-zA-Z0-9_\-\/\.]*)', base.StaticFileHandler, {'path': GLSettings.client_path})
+    (r'/([a-zA-Z0-9_\-\/\.]*)', base.ClientFileHandler, {'path': GLSettings.client_path})
 ]
 
 
@@ -177,34 +178,22 @@ def decorate_method(h, method):
 
 
 class APIResourceWrapper(Resource):
-    _registry = None
+    _router = None
     isLeaf = True
     method_map = {'get': 200, 'post': 201, 'put': 202, 'delete': 200}
 
     def __init__(self):
         Resource.__init__(self)
-        self._registry = []
 
         for tup in api_spec:
-            args = {}
-            if len(tup) == 2:
-                pattern, handler = tup
-            else:
-                pattern, handler, args = tup
-
-            if not pattern.startswith("^"):
-                pattern = "^" + pattern
-
-            if not pattern.endswith("$"):
-                pattern += "$"
-
+            handler = tup[1]
             if not hasattr(handler, '_decorated'):
                 handler._decorated = True
                 for m in ['get', 'put', 'post', 'delete']:
                     if hasattr(handler, m):
                         decorate_method(handler, m)
 
-            self._registry.append((re.compile(pattern), handler, args))
+        self._router = Router(api_spec)
 
     def should_redirect_tor(self, request):
         if request.client_using_tor and \
@@ -277,7 +266,8 @@ class APIResourceWrapper(Resource):
             request.client_ip = request.getClientIP()
             request.client_proto = 'http'
 
-        request.client_using_tor = request.getHost().port == 8083 or \
+        # the unix domain socket of the https workers has no port
+        request.client_using_tor = getattr(request.getHost(), 'port', None) == 8083 or \
                                    request.client_ip in GLSettings.appstate.tor_exit_set
 
         if 'x-tor2web' in request.headers:
@@ -312,16 +302,13 @@ class APIResourceWrapper(Resource):
             self.redirect_https(request)
             return b''
 
-        match = None
-        for regexp, handler, args in self._registry:
-            match = regexp.match(request.path)
-            if match:
-                break
-
+        match = self._router.match(request.path)
         if match is None:
             self.handle_exception(errors.ResourceNotFound(), request)
             return b''
 
+        handler, args, groups = match
+
         method = request.method.lower()
         if not method in self.method_map or not hasattr(handler, method):
             self.handle_exception(errors.MethodNotImplemented(), request)
@@ -331,7 +318,7 @@ class APIResourceWrapper(Resource):
 
         f = getattr(handler, method)
 
-        groups = [unicode(g) for g in match.groups()]
+        groups = [unicode(g) for g in groups]
         h = handler(request, **args)
 
         d = defer.maybeDeferred(f, h, *groups)
@@ -356,7 +343,7 @@ class APIResourceWrapper(Resource):
 
             if not request_finished[0]:
                 if not ret is None:
-                    h.write(ret)
+                    self.write_response(request, h, method, ret)
 
                 request.finish()
 
@@ -365,6 +352,26 @@ class APIResourceWrapper(Resource):
 
         return NOT_DONE_YET
 
+    def write_response(self, request, h, method, ret):
+        """
+        Writes the response of a handler; successful GET responses are
+        tagged with a strong etag computed on the encoded body and are not
+        sent again to the clients already holding them
+        """
+        chunk = h.serialize(ret)
+
+        if method == 'get' and request.code == 200 and \
+                not request.responseHeaders.hasHeader(b'etag'):
+            etag = h.etag if h.etag is not None else apicache.compute_etag(chunk)
+            request.setHeader(b'ETag', etag)
+
+            if base.match_etag(request.headers.get('if-none-match'), etag):
+                apicache.GLApiCache.not_modified += 1
+                request.setResponseCode(304)
+                return
+
+        request.write(chunk)
+
     @staticmethod
     def set_default_headers(request):
         # to avoid version attacks
@@ -382,7 +389,9 @@ class APIResourceWrapper(Resource):
         # to avoid information leakage via referrer
         request.setHeader("Referrer-Policy", "no-referrer")
 
-        request.setHeader("Connection", "close")
+        # the connections of the https workers are kept alive and reused
+        if request.client_proto == 'http':
+            request.setHeader("Connection", "close")
 
         # to avoid Robots spidering, indexing, caching
         if not GLSettings.memory_copy.allow_indexing:
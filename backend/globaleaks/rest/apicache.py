@@ -1,42 +1,283 @@
 # -*- encoding: utf-8 -*-
-from twisted.internet import defer
+import json
+import threading
+import types
+from collections import OrderedDict
+
+from twisted.internet import defer, reactor
+from twisted.python import threadable
+
+from globaleaks.security import sha256
+from globaleaks.settings import GLSettings
+from globaleaks.utils.utility import log
+
+
+def compute_etag(body):
+    """
+    Returns the strong etag of an encoded response
+    """
+    return '"%s"' % sha256(body)[:32]
+
+
+class GLApiCacheEntry(object):
+    __slots__ = ('body', 'content_type', 'dependencies', 'etag', 'stale')
+
+    def __init__(self, body, content_type, dependencies):
+        self.body = body
+        self.content_type = content_type
+        self.dependencies = dependencies
+        self.etag = compute_etag(body)
+        self.stale = False
 
 
 class GLApiCache(object):
-    memory_cache_dict = {}
+    """
+    LRU cache of the encoded responses of the API bounded by their total size.
+
+    Each entry is tagged with the models it depends on; entries without
+    dependencies are considered dependent on every model.
+
+    The resources with a registered warmer are rebuilt in background for
+    every enabled language; once invalidated their entries are kept as
+    stale and served until the new version replaces them.
+    """
+    memory_cache_dict = OrderedDict()
+    size = 0
+
+    # incremented by every invalidation; responses computed across an
+    # invalidation are not stored as they could be outdated
+    generation = 0
+
+    warmers = OrderedDict()
+    warming = False
+    warm_pending = False
+    warm_missing = False
+    warm_waiters = []
+
+    # counters exposed for monitoring
+    hits = 0
+    misses = 0
+    not_modified = 0
+
+    # the cache is invalidated also by transactions running in threads
+    lock = threading.RLock()
+
+    @classmethod
+    def get_entry(cls, resource, language):
+        key = (resource, language)
+
+        with cls.lock:
+            if key not in cls.memory_cache_dict:
+                return None
+
+            # the entry is moved to the end as the most recently used
+            entry = cls.memory_cache_dict.pop(key)
+            cls.memory_cache_dict[key] = entry
+            return entry
 
     @classmethod
     def get(cls, resource, language):
-        if resource in cls.memory_cache_dict \
-                and language in cls.memory_cache_dict[resource]:
-            return cls.memory_cache_dict[resource][language]
+        entry = cls.get_entry(resource, language)
+        if entry is not None:
+            return entry.body
+
+    @classmethod
+    def set(cls, resource, language, value, dependencies=None, generation=None):
+        """
+        Store a response; dicts and lists are stored encoded in JSON
+
+        If a generation is specified the response is stored only if no
+        invalidation happened since then.
+        """
+        if value is None:
+            return
+
+        content_type = None
+        if isinstance(value, (types.DictType, types.ListType)):
+            value = json.dumps(value)
+            content_type = b'application/json'
+        elif isinstance(value, unicode):
+            value = value.encode('utf-8')
+
+        with cls.lock:
+            if generation is not None and generation != cls.generation:
+                return
+
+            cls.remove((resource, language))
+
+            if len(value) > GLSettings.api_cache_size:
+                return
+
+            while cls.size + len(value) > GLSettings.api_cache_size:
+                cls.remove(next(cls.memory_cache_dict.iterkeys()))
+
+            cls.memory_cache_dict[(resource, language)] = GLApiCacheEntry(value, content_type, dependencies)
+            cls.size += len(value)
+
+    @classmethod
+    def remove(cls, key):
+        with cls.lock:
+            entry = cls.memory_cache_dict.pop(key, None)
+            if entry is not None:
+                cls.size -= len(entry.body)
+
+    @classmethod
+    def clear(cls):
+        with cls.lock:
+            cls.memory_cache_dict.clear()
+            cls.size = 0
+            cls.generation += 1
+
+    @classmethod
+    def invalidate(cls, dependencies=None):
+        """
+        Invalidate the entries depending on any of the given models or all
+        the entries if no model is specified.
+
+        When called from the reactor thread it returns a deferred fired
+        once the invalidated resources have been warmed again.
+        """
+        warm_keys = cls.warm_keys()
+
+        with cls.lock:
+            cls.generation += 1
+
+            for key, entry in cls.memory_cache_dict.items():
+                if dependencies is None or entry.dependencies is None or \
+                        not entry.dependencies.isdisjoint(dependencies):
+                    if key in warm_keys:
+                        entry.stale = True
+                    else:
+                        cls.remove(key)
+
+        if threadable.isInIOThread():
+            return cls.warm(missing=False)
+
+        reactor.callFromThread(cls.warm, missing=False)
 
     @classmethod
-    def set(cls, resource, language, value):
-        if resource not in GLApiCache.memory_cache_dict:
-            cls.memory_cache_dict[resource] = {}
+    def register_warmer(cls, resource, function, dependencies):
+        """
+        Register the function used to build a resource in background.
 
-        cls.memory_cache_dict[resource][language] = value
+        The resource may contain a {} placeholder replaced by the language;
+        the function is called with the language and returns a deferred.
+        """
+        cls.warmers[resource] = (function, cache_dependencies(dependencies))
 
     @classmethod
-    def invalidate(cls):
-        cls.memory_cache_dict.clear()
+    def warm_keys(cls):
+        return set((resource.format(language), language)
+                   for resource in cls.warmers
+                   for language in GLSettings.memory_copy.languages_enabled)
+
+    @classmethod
+    def warm(cls, missing=True):
+        """
+        Build the stale entries of the registered warmers and, if requested,
+        the missing ones.
+
+        Warm requests received while a warm is in progress are coalesced
+        in a single new run.
+        """
+        d = defer.Deferred()
+        cls.warm_waiters.append(d)
+        cls.warm_missing = cls.warm_missing or missing
+
+        if cls.warming:
+            cls.warm_pending = True
+        else:
+            cls._warm()
+
+        return d
+
+    @classmethod
+    @defer.inlineCallbacks
+    def _warm(cls):
+        cls.warming = True
+
+        try:
+            cls.warm_pending = True
+            while cls.warm_pending:
+                cls.warm_pending = False
+                waiters, cls.warm_waiters = cls.warm_waiters, []
+                missing, cls.warm_missing = cls.warm_missing, False
+
+                generation = cls.generation
+
+                keys, dl = [], []
+                for resource, (function, dependencies) in cls.warmers.items():
+                    for language in GLSettings.memory_copy.languages_enabled:
+                        key = (resource.format(language), language)
+                        entry = cls.memory_cache_dict.get(key)
+                        if (entry is None and missing) or (entry is not None and entry.stale):
+                            keys.append((key, dependencies))
+                            dl.append(defer.maybeDeferred(function, language))
+
+                results = yield defer.DeferredList(dl, consumeErrors=True)
+
+                for ((resource, language), dependencies), (success, result) in zip(keys, results):
+                    if success:
+                        cls.set(resource, language, result, dependencies, generation)
+                    else:
+                        log.err("Unable to warm the cache of %s: %s" % (resource, result.getErrorMessage()))
+                        entry = cls.memory_cache_dict.get((resource, language))
+                        if entry is not None and entry.stale:
+                            cls.remove((resource, language))
+
+                for d in waiters:
+                    d.callback(None)
+        finally:
+            cls.warming = False
+
+
+    @classmethod
+    def get_stats(cls):
+        return {
+            'entries': len(cls.memory_cache_dict),
+            'size': cls.size,
+            'hits': cls.hits,
+            'misses': cls.misses,
+            'not_modified': cls.not_modified
+        }
+
+
+def cache_dependencies(value):
+    """
+    Map the value of the cache_resource/invalidate_cache attributes of a
+    handler to the models it refers to; True means every model
+    """
+    return frozenset(value) if isinstance(value, (tuple, list, set, frozenset)) else None
 
 
 def decorator_cache_get(f):
     def decorator_cache_get_wrapper(self, *args, **kwargs):
-        c = GLApiCache.get(self.request.path, self.request.language)
-        if c is None:
-            c = f(self, *args, **kwargs)
-            if isinstance(c, defer.Deferred):
-                def callback(data):
-                    GLApiCache.set(self.request.path, self.request.language, data)
+        entry = GLApiCache.get_entry(self.request.path, self.request.language)
+        if entry is not None:
+            GLApiCache.hits += 1
+
+            if entry.content_type is not None:
+                self.request.setHeader(b'content-type', entry.content_type)
+
+            self.etag = entry.etag
+
+            return entry.body
 
-                    return data
+        GLApiCache.misses += 1
 
-                c.addCallback(callback)
-            else:
-                GLApiCache.set(self.request.path, self.request.language, c)
+        dependencies = cache_dependencies(getattr(self, 'cache_resource', True))
+        generation = GLApiCache.generation
+
+        c = f(self, *args, **kwargs)
+        if isinstance(c, defer.Deferred):
+            def callback(data):
+                GLApiCache.set(self.request.path, self.request.language, data, dependencies, generation)
+
+                return data
+
+            c.addCallback(callback)
+        else:
+            GLApiCache.set(self.request.path, self.request.language, c, dependencies, generation)
 
         return c
 
@@ -45,7 +286,21 @@ def decorator_cache_get(f):
 
 def decorator_cache_invalidate(f):
     def decorator_cache_invalidate_wrapper(self, *args, **kwargs):
-        GLApiCache.invalidate()
-        return f(self, *args, **kwargs)
+        dependencies = cache_dependencies(self.invalidate_cache)
+
+        # the cache is invalidated once the modification is concluded and
+        # the response is sent only after the new version has been warmed
+        def invalidate(result):
+            d = GLApiCache.invalidate(dependencies)
+            d.addCallback(lambda _: result)
+            return d
+
+        c = f(self, *args, **kwargs)
+        if isinstance(c, defer.Deferred):
+            return c.addBoth(invalidate)
+
+        GLApiCache.invalidate(dependencies)
+
+        return c
 
     return decorator_cache_invalidate_wrapper
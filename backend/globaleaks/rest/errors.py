@@ -404,3 +404,12 @@ class ModelNotFound(GLException):
             self.reason = "Model not found"
         else:
             self.reason = "Model of type {} has not been found".format(model)
+
+
+class RequestedRangeNotSatisfiable(GLException):
+    """
+    The byte range requested for a file download lies outside the file
+    """
+    reason = "The requested range is not satisfiable"
+    error_code = 60
+    status_code = 416  # Requested Range Not Satisfiable
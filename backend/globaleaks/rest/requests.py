@@ -244,6 +244,7 @@ AdminNotificationDesc = disjoint_union({
     'disable_receiver_notification_emails': bool,
     'tip_expiration_threshold': int,
     'notification_threshold_per_hour': int,
+    'notification_digest_interval': int,
     'reset_templates': bool,
     'exception_email_address': email_regexp,
     'exception_email_pgp_key_fingerprint': unicode,
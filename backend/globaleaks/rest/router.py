@@ -0,0 +1,177 @@
+# -*- coding: UTF-8
+#   router
+#   ******
+#
+# Compiled dispatch table used by the APIResourceWrapper to route requests.
+#
+# Routes are indexed by the first literal segment of their path and by their
+# segment count; the regular expressions are evaluated only on the routes
+# that could actually match a request and routes without parameters are
+# resolved with a simple string comparison.
+
+import re
+
+REGEXP_METACHARS = set('\\.^$*+?{}[]|()')
+
+
+def split_pattern(pattern):
+    """
+    Split a route pattern in its literal prefix and its parameterized tail
+
+    :param pattern: a route pattern without the ^ and $ anchors
+    :return: a tuple (prefix, tail)
+    """
+    for i, c in enumerate(pattern):
+        if c in REGEXP_METACHARS:
+            return pattern[:i], pattern[i:]
+
+    return pattern, ''
+
+
+def count_segments(pattern):
+    """
+    Return the number of path segments matched by a route pattern or None
+    if the pattern could match paths with a variable number of segments.
+    """
+    count = 0
+    depth = 0
+    in_class = False
+    i = 0
+
+    while i < len(pattern):
+        c = pattern[i]
+
+        if c == '\\':
+            if i + 1 < len(pattern) and pattern[i + 1] in '/WSD':
+                return None
+
+            i += 2
+            continue
+
+        if in_class:
+            if c == '/':
+                return None
+            elif c == ']':
+                in_class = False
+        elif c == '[':
+            in_class = True
+            if i + 1 < len(pattern) and pattern[i + 1] == '^':
+                return None
+        elif c == '.' or (c == '|' and depth == 0):
+            return None
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == '/':
+            if depth > 0:
+                return None
+
+            count += 1
+
+        i += 1
+
+    return count
+
+
+def first_segment(path):
+    """
+    Return the first segment of a path (e.g. '/rtip' for '/rtip/rfile/x')
+    """
+    idx = path.find('/', 1)
+
+    return path if idx == -1 else path[:idx]
+
+
+class Route(object):
+    def __init__(self, idx, pattern, handler, args):
+        self.idx = idx
+        self.handler = handler
+        self.args = args
+
+        if pattern.startswith('^'):
+            pattern = pattern[1:]
+
+        if pattern.endswith('$'):
+            pattern = pattern[:-1]
+
+        self.prefix, self.tail = split_pattern(pattern)
+        self.regexp = re.compile('^' + pattern + '$')
+        self.segments = count_segments(pattern)
+
+        self.first_segment = None
+        if self.prefix.startswith('/') and (not self.tail or self.prefix.find('/', 1) != -1):
+            self.first_segment = first_segment(self.prefix)
+
+    def match(self, path):
+        """
+        :return: the tuple of the matched groups or None
+        """
+        if not self.tail:
+            return () if path == self.prefix else None
+
+        if not path.startswith(self.prefix):
+            return None
+
+        match = self.regexp.match(path)
+
+        return match.groups() if match is not None else None
+
+
+class Router(object):
+    """
+    Compiled router implementing the first-match semantic of a list of
+    (pattern, handler[, args]) routes.
+    """
+    def __init__(self, spec):
+        self.routes = []
+
+        for idx, tup in enumerate(spec):
+            args = {}
+            if len(tup) == 2:
+                pattern, handler = tup
+            else:
+                pattern, handler, args = tup
+
+            self.routes.append(Route(idx, pattern, handler, args))
+
+        # routes matchable by any path
+        wildcards = [r for r in self.routes if r.first_segment is None]
+
+        # routes indexed by first segment and segment count
+        self.table = {}
+
+        for seg in set(r.first_segment for r in self.routes if r.first_segment is not None):
+            routes = [r for r in self.routes if r.first_segment == seg]
+            variable = [r for r in routes if r.segments is None]
+
+            by_count = {None: sorted(variable + wildcards, key=lambda r: r.idx)}
+            for count in set(r.segments for r in routes if r.segments is not None):
+                by_count[count] = sorted([r for r in routes if r.segments == count] + variable + wildcards,
+                                         key=lambda r: r.idx)
+
+            self.table[seg] = by_count
+
+        self.wildcards = wildcards
+
+    def candidates(self, path):
+        by_count = self.table.get(first_segment(path))
+        if by_count is None:
+            return self.wildcards
+
+        routes = by_count.get(path.count('/'))
+        if routes is None:
+            routes = by_count[None]
+
+        return routes
+
+    def match(self, path):
+        """
+        :return: a tuple (handler, args, groups) or None if no route matches
+        """
+        for route in self.candidates(path):
+            groups = route.match(path)
+            if groups is not None:
+                return route.handler, route.args, groups
+
+        return None
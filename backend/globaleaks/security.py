@@ -8,22 +8,28 @@
 import base64
 import binascii
 import json
+import multiprocessing
 import os
-import random
 import shutil
+import signal
 import string
+import struct
+import threading
 import time
+from subprocess import Popen, PIPE
 from tempfile import _TemporaryFileWrapper
 
 import scrypt
 from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import constant_time, hashes
+from cryptography.hazmat.primitives import constant_time, hashes, hmac
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from datetime import datetime
 from gnupg import GPG
+from twisted.internet import defer, reactor
 
 from globaleaks.rest import errors
 from globaleaks.settings import GLSettings
+from globaleaks.utils import securerandom
 from globaleaks.utils.utility import log
 
 crypto_backend = default_backend()
@@ -44,21 +50,21 @@ def generateRandomReceipt():
     """
     Return a random receipt of 16 digits
     """
-    return ''.join(random.SystemRandom().choice(string.digits) for _ in range(16)).encode('utf-8')
+    return securerandom.randstring(16, string.digits)
 
 
 def generateRandomKey(N):
     """
     Return a random key of N characters in a-zA-Z0-9
     """
-    return ''.join(random.SystemRandom().choice(string.ascii_letters + string.digits) for _ in range(N)).encode('utf-8')
+    return securerandom.randstring(N, string.ascii_letters + string.digits)
 
 
 def generateRandomSalt():
     """
     Return a base64 encoded string with 128 bit of entropy
     """
-    return base64.b64encode(os.urandom(16))
+    return base64.b64encode(securerandom.randbytes(16))
 
 
 def generateRandomPassword():
@@ -79,51 +85,56 @@ def generate_api_token():
     return token, token_hash
 
 
-def _overwrite(absolutefpath, pattern):
-    filesize = os.path.getsize(absolutefpath)
-    bytecnt = 0
-    with open(absolutefpath, 'w+') as f:
-        f.seek(0)
-        while bytecnt < filesize:
-            f.write(pattern)
-            bytecnt += len(pattern)
+def _overwrite(fd, filesize, pattern):
+    """
+    Overwrite the first filesize bytes of a file with a repeated pattern
+    and wait for the data to reach the disk
+    """
+    os.lseek(fd, 0, os.SEEK_SET)
+
+    remaining = filesize
+    while remaining > 0:
+        remaining -= os.write(fd, pattern if remaining >= len(pattern) else pattern[:remaining])
+
+    fdatasync = getattr(os, 'fdatasync', os.fsync)
+    fdatasync(fd)
 
 
 def overwrite_and_remove(absolutefpath, iterations_number=1):
     """
     Overwrite the file with all_zeros, all_ones, random patterns
 
-    Note: At each iteration the original size of the file is altered.
+    Each pass is written with buffers of GLSettings.secure_delete_buffer_size
+    bytes and synced to the disk before the following one.
     """
-
-    if random.randint(1, 5) == 3:
+    if securerandom.randint(1, 5) == 3:
         iterations_number += 1
 
     log.debug("Starting secure deletion of file %s" % absolutefpath)
 
     try:
-        # in the following loop, the file is open and closed on purpose, to trigger flush operations
-        all_zeros = "\0\0\0\0" * 1024               # 4kb of zeros
-        all_ones = "FFFFFFFF".decode("hex") * 1024  # 4kb of ones
+        filesize = os.path.getsize(absolutefpath)
+        buffer_size = min(GLSettings.secure_delete_buffer_size, max(filesize, 1))
 
-        for iteration in xrange(iterations_number):
-            OPTIMIZATION_RANDOM_BLOCK = 4096 + random.randint(1, 4096)
+        all_zeros = b'\x00' * buffer_size
+        all_ones = b'\xff' * buffer_size
 
-            random_pattern = ""
-            for _ in xrange(OPTIMIZATION_RANDOM_BLOCK):
-                random_pattern += str(random.randrange(256))
-
-            log.debug("Excecuting rewrite iteration (%d out of %d)" %
-                      (iteration, iterations_number))
+        fd = os.open(absolutefpath, os.O_WRONLY)
+        try:
+            for iteration in xrange(iterations_number):
+                log.debug("Excecuting rewrite iteration (%d out of %d)" %
+                          (iteration, iterations_number))
 
-            _overwrite(absolutefpath, all_zeros)
-            log.debug("Overwritten file %s with all zeros pattern" % absolutefpath)
+                _overwrite(fd, filesize, all_zeros)
+                log.debug("Overwritten file %s with all zeros pattern" % absolutefpath)
 
-            _overwrite(absolutefpath, all_ones)
-            log.debug("Overwritten file %s with all ones pattern" % absolutefpath)
+                _overwrite(fd, filesize, all_ones)
+                log.debug("Overwritten file %s with all ones pattern" % absolutefpath)
 
-            _overwrite(absolutefpath, random_pattern)
-            log.debug("Overwritten file %s with random pattern" % absolutefpath)
+                _overwrite(fd, filesize, os.urandom(buffer_size))
+                log.debug("Overwritten file %s with random pattern" % absolutefpath)
+        finally:
+            os.close(fd)
 
     except Exception as e:
         log.err("Unable to perform secure overwrite for file %s: %s" %
@@ -139,11 +150,67 @@ def overwrite_and_remove(absolutefpath, iterations_number=1):
     log.debug("Performed deletion of file: %s" % absolutefpath)
 
 
+class AESChunkedCipher(object):
+    """
+    Authenticated encryption of files in independent chunks of fixed size.
+
+    The file starts with a header made of a magic string, the size of the
+    chunks and a random salt; the key of the chunks is derived from the key
+    of the file and the header so that the header is authenticated too.
+    Each chunk is encrypted with AES-GCM using its index as nonce and is
+    followed by its tag; the last chunk is flagged in the nonce in order to
+    detect truncations.
+    """
+    magic = b'GLAESGCM'
+    header = struct.Struct('>8sI16s')
+    tag_size = 16
+
+    def __init__(self, key, header):
+        _, self.chunk_size, _ = self.header.unpack(header)
+
+        h = hmac.HMAC(key, hashes.SHA256(), backend=crypto_backend)
+        h.update(header)
+        self.key = h.finalize()
+
+    @classmethod
+    def new_header(cls, chunk_size):
+        return cls.header.pack(cls.magic, chunk_size, securerandom.randbytes(16))
+
+    @classmethod
+    def is_header(cls, header):
+        return len(header) == cls.header.size and header.startswith(cls.magic)
+
+    def cipher(self, index, final, tag=None):
+        nonce = struct.pack('>QI', index, final)
+        return Cipher(algorithms.AES(self.key), modes.GCM(nonce, tag), backend=crypto_backend)
+
+    def encrypt_chunk(self, index, data, final):
+        encryptor = self.cipher(index, final).encryptor()
+        return encryptor.update(data) + encryptor.finalize() + encryptor.tag
+
+    def decrypt_chunk(self, index, data, final):
+        decryptor = self.cipher(index, final, data[-self.tag_size:]).decryptor()
+        return decryptor.update(data[:-self.tag_size]) + decryptor.finalize()
+
+    def chunks_count(self, file_size):
+        """
+        Return the number of chunks of a file of the given size; the last
+        chunk, always present, holds from 0 to chunk_size bytes.
+        """
+        data_size = file_size - self.header.size
+        return max(-(-data_size // (self.chunk_size + self.tag_size)), 1)
+
+
 class GLSecureTemporaryFile(_TemporaryFileWrapper):
     """
     WARNING!
     You can't use this File object like a normal file object,
     check .read and .write!
+
+    The file is written in the chunked format of AESChunkedCipher;
+    read() and seek() work on the plaintext and allow random access.
+    Files written with the legacy format (a single AES-CTR stream) are
+    recognized by the absence of the header and can only be read.
     """
     last_action = 'init'
 
@@ -166,16 +233,29 @@ class GLSecureTemporaryFile(_TemporaryFileWrapper):
         # last argument is 'True' because the file has to be deleted on .close()
         _TemporaryFileWrapper.__init__(self, self.file, self.filepath, True)
 
+        self.header = AESChunkedCipher.new_header(GLSettings.AES_chunk_size)
+        self.file.write(self.header)
+        self.initialize_cipher()
+
     def initialize_cipher(self):
-        self.cipher = Cipher(algorithms.AES(self.key), modes.CTR(self.key_counter_nonce), backend=crypto_backend)
-        self.encryptor = self.cipher.encryptor()
-        self.decryptor = self.cipher.decryptor()
+        self.chunked = AESChunkedCipher.is_header(self.header)
+        self.position = 0
+
+        if self.chunked:
+            self.cipher = AESChunkedCipher(self.key, self.header)
+            self.write_buffer = []
+            self.write_buffer_size = 0
+            self.write_index = 0
+            self.read_index = None
+        else:
+            self.cipher = Cipher(algorithms.AES(self.key), modes.CTR(self.key_counter_nonce), backend=crypto_backend)
+            self.decryptor = self.cipher.decryptor()
 
     def create_key(self):
         """
         Create the AES Key to encrypt uploaded file.
         """
-        self.key = os.urandom(GLSettings.AES_key_size)
+        self.key = securerandom.randbytes(GLSettings.AES_key_size)
 
         self.key_id = generateRandomKey(16)
         self.keypath = os.path.join(GLSettings.ramdisk_path, "%s%s" %
@@ -186,12 +266,8 @@ class GLSecureTemporaryFile(_TemporaryFileWrapper):
             self.keypath = os.path.join(GLSettings.ramdisk_path, "%s%s" %
                                         (GLSettings.AES_keyfile_prefix, self.key_id))
 
-        self.key_counter_nonce = os.urandom(GLSettings.AES_counter_nonce)
-        self.initialize_cipher()
-
         key_json = {
-            'key': base64.b64encode(self.key),
-            'key_counter_nonce': base64.b64encode(self.key_counter_nonce)
+            'key': base64.b64encode(self.key)
         }
 
         log.debug("Key initialization at %s" % self.keypath)
@@ -220,17 +296,35 @@ class GLSecureTemporaryFile(_TemporaryFileWrapper):
             if isinstance(data, unicode):
                 data = data.encode('utf-8')
 
-            self.file.write(self.encryptor.update(data))
+            self.write_buffer.append(data)
+            self.write_buffer_size += len(data)
+
+            # the last chunk is kept in the buffer until the finalization
+            if self.write_buffer_size > self.cipher.chunk_size:
+                data = ''.join(self.write_buffer)
+                end = (len(data) - 1) / self.cipher.chunk_size * self.cipher.chunk_size
+
+                for i in range(0, end, self.cipher.chunk_size):
+                    self.file.write(self.cipher.encrypt_chunk(self.write_index, data[i:i + self.cipher.chunk_size], False))
+                    self.write_index += 1
+
+                self.write_buffer = [data[end:]]
+                self.write_buffer_size = len(data) - end
         except Exception as wer:
             log.err("Unable to write() in GLSecureTemporaryFile: %s" % wer.message)
             raise wer
 
+    def finalize_encryption(self):
+        if any(x in self.file.mode for x in 'wa') and not self.encryptor_finalized:
+            self.encryptor_finalized = True
+            self.file.write(self.cipher.encrypt_chunk(self.write_index, ''.join(self.write_buffer), True))
+            self.file.flush()
+            self.write_buffer = []
+
     def close(self):
         if not self.close_called:
             try:
-                if any(x in self.file.mode for x in 'wa') and not self.encryptor_finalized:
-                    self.encryptor_finalized = True
-                    self.file.write(self.encryptor.finalize())
+                self.finalize_encryption()
 
             except:
                 pass
@@ -244,29 +338,94 @@ class GLSecureTemporaryFile(_TemporaryFileWrapper):
         except:
             pass
 
+    def seek(self, offset, whence=0):
+        """
+        Move to a position of the plaintext
+        """
+        if whence == 1:
+            offset += self.tell()
+        elif whence == 2:
+            offset += self.plaintext_size()
+
+        if self.chunked:
+            self.position = offset
+            return
+
+        # the counter of the legacy format is moved to the block of the offset
+        block, skip = divmod(offset, 16)
+        counter = (int(binascii.b2a_hex(self.key_counter_nonce), 16) + block) % (1 << 128)
+        counter_nonce = binascii.a2b_hex('%032x' % counter)
+
+        self.file.seek(block * 16)
+        self.decryptor = Cipher(algorithms.AES(self.key), modes.CTR(counter_nonce), backend=crypto_backend).decryptor()
+        self.decryptor.update(self.file.read(skip))
+        self.position = offset
+
+    def tell(self):
+        return self.position
+
+    def plaintext_size(self):
+        file_size = os.fstat(self.file.fileno()).st_size
+
+        if not self.chunked:
+            return file_size
+
+        return file_size - AESChunkedCipher.header.size - \
+               self.cipher.chunks_count(file_size) * AESChunkedCipher.tag_size
+
+    def read_chunk(self, index):
+        """
+        Return the plaintext of the chunk with the given index
+        """
+        if index != self.read_index:
+            chunks_count = self.cipher.chunks_count(os.fstat(self.file.fileno()).st_size)
+            if index >= chunks_count:
+                return ''
+
+            chunk_size = self.cipher.chunk_size + AESChunkedCipher.tag_size
+            self.file.seek(AESChunkedCipher.header.size + index * chunk_size)
+            self.read_buffer = self.cipher.decrypt_chunk(index, self.file.read(chunk_size), index == chunks_count - 1)
+            self.read_index = index
+
+        return self.read_buffer
+
     def read(self, c=None):
         """
         The first time 'read' is called after a write, seek(0) is performed
         """
-        if self.last_action == 'write':
-            if any(x in self.file.mode for x in 'wa') and not self.encryptor_finalized:
-                self.encryptor_finalized = True
-                self.file.write(self.encryptor.finalize())
+        if self.last_action != 'read':
+            self.finalize_encryption()
+
+            if self.last_action == 'write':
+                self.seek(0, 0)  # this is a trick just to misc write and read
+                log.debug("First seek on %s" % self.filepath)
 
-            self.seek(0, 0)  # this is a trick just to misc write and read
-            self.initialize_cipher()
-            log.debug("First seek on %s" % self.filepath)
             self.last_action = 'read'
 
+        if not self.chunked:
+            data = self.file.read() if c is None else self.file.read(c)
+            self.position += len(data)
+
+            if len(data):
+                return self.decryptor.update(data)
+            else:
+                return self.decryptor.finalize()
+
         if c is None:
-            data = self.file.read()
-        else:
-            data = self.file.read(c)
+            c = self.plaintext_size() - self.position
 
-        if len(data):
-            return self.decryptor.update(data)
-        else:
-            return self.decryptor.finalize()
+        ret = []
+        while c > 0:
+            index, offset = divmod(self.position, self.cipher.chunk_size)
+            data = self.read_chunk(index)[offset:offset + c]
+            if not data:
+                break
+
+            ret.append(data)
+            self.position += len(data)
+            c -= len(data)
+
+        return ''.join(ret)
 
 
 class GLSecureFile(GLSecureTemporaryFile):
@@ -282,6 +441,10 @@ class GLSecureFile(GLSecureTemporaryFile):
         # last argument is 'False' because the file has not to be deleted on .close()
         _TemporaryFileWrapper.__init__(self, self.file, self.filepath, False)
 
+        self.header = self.file.read(AESChunkedCipher.header.size)
+        if not AESChunkedCipher.is_header(self.header):
+            self.file.seek(0)
+
         self.load_key()
 
     def load_key(self):
@@ -295,7 +458,7 @@ class GLSecureFile(GLSecureTemporaryFile):
                 key_json = json.load(kf)
 
             self.key = base64.b64decode(key_json['key'])
-            self.key_counter_nonce = base64.b64decode(key_json['key_counter_nonce'])
+            self.key_counter_nonce = base64.b64decode(key_json.get('key_counter_nonce', ''))
             self.initialize_cipher()
 
         except Exception as axa:
@@ -303,6 +466,66 @@ class GLSecureFile(GLSecureTemporaryFile):
             log.err("The file %s has been encrypted with a lost/invalid key (%s)" % (self.keypath, axa.message))
             raise axa
 
+    def convert(self):
+        """
+        Rewrite a file encrypted with the legacy format in the chunked one.
+
+        The key of the file is kept, so that the conversion is completed
+        by an atomic rename of the new file over the old one.
+        """
+        header = AESChunkedCipher.new_header(GLSettings.AES_chunk_size)
+        cipher = AESChunkedCipher(self.key, header)
+        tmppath = "%s.tmp" % self.filepath
+
+        try:
+            with open(tmppath, 'wb') as f:
+                f.write(header)
+
+                index = 0
+                data = self.read(cipher.chunk_size)
+                while True:
+                    # a short read is the end of the file
+                    next_data = self.read(cipher.chunk_size) if len(data) == cipher.chunk_size else ''
+                    f.write(cipher.encrypt_chunk(index, data, next_data == ''))
+                    if next_data == '':
+                        break
+
+                    data = next_data
+                    index += 1
+
+                f.flush()
+                os.fsync(f.fileno())
+
+            # the file could have been removed while being converted
+            if not os.path.exists(self.filepath):
+                log.debug("The file %s has been removed during the conversion" % self.filepath)
+                return
+
+            os.rename(tmppath, self.filepath)
+        finally:
+            if os.path.exists(tmppath):
+                os.remove(tmppath)
+
+
+def convert_legacy_secure_files(path):
+    """
+    Convert to the chunked format the files of the given directory that
+    are still encrypted with the legacy AES-CTR format.
+    """
+    for filename in os.listdir(path):
+        if not filename.endswith('.aes'):
+            continue
+
+        filepath = os.path.join(path, filename)
+
+        try:
+            with GLSecureFile(filepath) as f:
+                if not f.chunked:
+                    log.debug("Converting %s to the chunked encryption format" % filepath)
+                    f.convert()
+        except Exception as excep:
+            log.err("Unable to convert the encrypted file %s: %s" % (filepath, excep))
+
 
 def directory_traversal_check(trusted_absolute_prefix, untrusted_path):
     """
@@ -338,6 +561,79 @@ def check_password(guessed_password, salt, password_hash):
     return constant_time.bytes_eq(hash_password(guessed_password, salt), bytes(password_hash))
 
 
+def _kdf_pool_initializer():
+    # the processes are forked from the backend and inherit the handlers
+    # installed by the reactor; they are restored so that the pool can be
+    # terminated and the interruptions are handled by the backend only
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _kdf_call(function, args):
+    # python 2 does not provide an error callback to apply_async and so the
+    # exceptions are returned to the backend together with the result
+    try:
+        return True, function(*args)
+    except Exception as excep:
+        return False, '%s: %s' % (type(excep).__name__, excep)
+
+
+class KDFPool(object):
+    """
+    Bounded pool of processes computing the key derivation functions
+
+    scrypt is designed to be CPU and memory intensive; it is run outside
+    of the backend process so that a burst of logins neither holds the
+    transactions nor the reactor, and the number of hashes computed in
+    parallel is bounded by the number of processes.
+    """
+    def __init__(self, processes):
+        self.pool = multiprocessing.Pool(processes, _kdf_pool_initializer)
+
+    def run(self, function, *args):
+        """
+        Run the function in one of the processes of the pool
+
+        @return: a deferred fired with the result in the reactor thread
+        """
+        d = defer.Deferred()
+
+        def callback(result):
+            success, value = result
+            if success:
+                reactor.callFromThread(d.callback, value)
+            else:
+                reactor.callFromThread(d.errback, Exception(value))
+
+        self.pool.apply_async(_kdf_call, (function, args), callback=callback)
+
+        return d
+
+    def stop(self):
+        self.pool.terminate()
+        self.pool.join()
+
+
+def run_kdf(function, *args):
+    """
+    Run a key derivation function on GLSettings.kdf_pool; when the pool
+    is not started the function is run in the calling thread.
+    """
+    if GLSettings.kdf_pool is None:
+        return defer.maybeDeferred(function, *args)
+
+    return GLSettings.kdf_pool.run(function, *args)
+
+
+def deferred_hash_password(password, salt):
+    return run_kdf(hash_password, password, salt)
+
+
+def deferred_check_password(guessed_password, salt, password_hash):
+    return run_kdf(check_password, guessed_password, salt, password_hash)
+
+
 def change_password(old_password_hash, old_password, new_password, salt):
     """
     @param old_password_hash: the stored password hash.
@@ -355,6 +651,18 @@ def change_password(old_password_hash, old_password, new_password, salt):
     return hash_password(new_password, salt)
 
 
+class GLGPG(GPG):
+    """
+    GPG spawning the gpg processes without the file descriptors of the
+    parent; otherwise, when more processes are spawned concurrently by
+    different threads, a process could keep open the stdin of another
+    one that would then never receive the EOF.
+    """
+    def _open_subprocess(self, args, passphrase=False):
+        return Popen(self.make_args(args, passphrase), shell=False, close_fds=True,
+                     stdin=PIPE, stdout=PIPE, stderr=PIPE)
+
+
 class GLBPGP(object):
     """
     PGP does not have a dedicated class, because one of the function is called inside a transact.
@@ -368,7 +676,7 @@ class GLBPGP(object):
         try:
             temp_pgproot = os.path.join(GLSettings.pgproot, "%s" % generateRandomKey(8))
             os.makedirs(temp_pgproot, mode=0700)
-            self.gnupg = GPG(gnupghome=temp_pgproot, options=['--trust-model', 'always'])
+            self.gnupg = GLGPG(gnupghome=temp_pgproot, options=['--trust-model', 'always'])
             self.gnupg.encoding = "UTF-8"
         except OSError as ose:
             log.err("Critical, OS error in operating with GnuPG home: %s" % ose)
@@ -441,19 +749,80 @@ class GLBPGP(object):
             log.err("Unable to clean temporary PGP environment: %s: %s" % (self.gnupg.gnupghome, excep))
 
 
-def encrypt_pgp_message(pgp_key_public, pgp_key_fingerprint, msg):
-    gpob = GLBPGP()
+class PGPKeyringCache(object):
+    """
+    Long-lived GnuPG keyrings kept on the ramdisk, one for each public key.
 
-    try:
-        gpob.load_key(pgp_key_public)
-        body = gpob.encrypt_message(pgp_key_fingerprint, msg)
-    except:
-        raise
-    finally:
-        # The finally statement is always called also if except contains a
-        # return or a raise
-        gpob.destroy_environment()
-    return body
+    The keyrings are indexed by fingerprint and are rebuilt whenever the
+    public key associated to a fingerprint changes so that delivery and
+    notification encryption do not need to import the key at every use.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keyrings = {}
+        self.fingerprints = {}
+
+    def get(self, pgp_key_public):
+        """
+        @param pgp_key_public: the armored public key
+        @return: a GLBPGP object with the key loaded; the fingerprint and the
+                 expiration of the key are available in its 'key' attribute.
+        """
+        digest = sha256(pgp_key_public.encode('utf-8'))
+
+        with self.lock:
+            fingerprint = self.fingerprints.get(digest)
+            if fingerprint is not None:
+                gpob = self.keyrings[fingerprint]
+                if os.path.isdir(gpob.gnupg.gnupghome):
+                    return gpob
+
+                self._remove(fingerprint)
+
+            gpob = GLBPGP()
+
+            try:
+                gpob.key = gpob.load_key(pgp_key_public)
+            except:
+                gpob.destroy_environment()
+                raise
+
+            fingerprint = gpob.key['fingerprint']
+
+            # the key associated to the fingerprint has been changed
+            self._remove(fingerprint)
+
+            self.keyrings[fingerprint] = gpob
+            self.fingerprints[digest] = fingerprint
+
+            return gpob
+
+    def _remove(self, fingerprint):
+        gpob = self.keyrings.pop(fingerprint, None)
+        if gpob is None:
+            return
+
+        for digest in [d for d, f in self.fingerprints.iteritems() if f == fingerprint]:
+            del self.fingerprints[digest]
+
+        if os.path.isdir(gpob.gnupg.gnupghome):
+            gpob.destroy_environment()
+
+    def invalidate(self, fingerprint):
+        with self.lock:
+            self._remove(fingerprint)
+
+    def clear(self):
+        with self.lock:
+            for fingerprint in self.keyrings.keys():
+                self._remove(fingerprint)
+
+
+GLPGPKeyrings = PGPKeyringCache()
+
+
+def encrypt_pgp_message(pgp_key_public, pgp_key_fingerprint, msg):
+    return GLPGPKeyrings.get(pgp_key_public).encrypt_message(pgp_key_fingerprint, msg)
 
 
 def parse_pgp_key(key):
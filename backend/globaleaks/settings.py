@@ -72,10 +72,32 @@ class GLSettingsClass(object):
         # thread pool size of 1
         self.orm_tp = ThreadPool(1, 1)
 
+        # thread pool used for read-only transactions
+        self.orm_ro_threads = 4
+        self.orm_ro_tp = ThreadPool(1, self.orm_ro_threads)
+
+        # thread pool used by the delivery to run the gpg processes
+        # encrypting the files of the receivers
+        self.delivery_threads = 4
+        self.delivery_tp = ThreadPool(0, self.delivery_threads)
+
+        # thread pool used to overwrite the files pending secure deletion
+        self.secure_delete_threads = 2
+        self.secure_delete_tp = ThreadPool(0, self.secure_delete_threads)
+
+        # pool of processes computing the scrypt hashes of the passwords
+        # and of the receipts; it is created at startup by the backend
+        self.kdf_processes = 2
+        self.kdf_pool = None
+
         self.bind_address = '0.0.0.0'
         self.bind_remote_ports = [80, 443]
         self.bind_local_ports = [8082, 8083]
 
+        # transport used by the https workers to reach the backend:
+        # 'tcp' uses the local port 8082, 'unix' a unix domain socket
+        self.proxy_transport = 'tcp'
+
         # store name
         self.store_name = 'main_store'
 
@@ -106,7 +128,6 @@ class GLSettingsClass(object):
 
         self.services = []
 
-        self.RecentEventQ = []
         self.RecentAnomaliesQ = {}
         self.stats_collection_start_time = datetime_now()
 
@@ -187,9 +208,20 @@ class GLSettingsClass(object):
         # size used while streaming files
         self.file_chunk_size = 65535 # 64kb
 
+        # size of the buffers used to overwrite the files on secure deletion;
+        # a multiple of the page size
+        self.secure_delete_buffer_size = 1024 * 1024 # 1MB
+
+        # size of the in memory cache of the responses of the API
+        self.api_cache_size = 16 * 1024 * 1024 # 16MB
+
+        # size of the in memory cache of the files of the client
+        self.client_assets_cache_size = 16 * 1024 * 1024 # 16MB
+
         self.AES_key_size = 32
         self.AES_key_id_regexp = u'[A-Za-z0-9]{16}'
         self.AES_counter_nonce = 128 / 8
+        self.AES_chunk_size = 64 * 1024
         self.AES_file_regexp = r'(.*)\.aes'
         self.AES_file_regexp_comp = re.compile(self.AES_file_regexp)
         self.AES_keyfile_prefix = "aeskey-"
@@ -208,6 +240,7 @@ class GLSettingsClass(object):
 
         self.mail_counters = {}
         self.mail_timeout = 15 # seconds
+        self.mail_connections = 2 # parallel smtp sessions
         self.mail_attempts_limit = 3 # per mail limit
 
         self.https_socks = []
@@ -221,11 +254,11 @@ class GLSettingsClass(object):
         self.appstate.latest_version = StrictVersion(__version__)
         self.appstate.api_token_session = None
         self.appstate.api_token_session_suspended = False
+        self.appstate.client_assets = None
 
         self.acme_directory_url = 'https://acme-v01.api.letsencrypt.org/directory'
 
     def reset_hourly(self):
-        self.RecentEventQ[:] = []
         self.RecentAnomaliesQ.clear()
         self.exceptions.clear()
         self.exceptions_email_count = 0
@@ -254,7 +287,8 @@ class GLSettingsClass(object):
         self.db_schema = os.path.join(self.static_db_source, 'sqlite.sql')
         self.db_file_name = 'glbackend-%d.db' % DATABASE_VERSION
         self.db_file_path = os.path.join(os.path.abspath(os.path.join(self.db_path, self.db_file_name)))
-        self.db_uri = self.make_db_uri(self.db_file_path)
+        self.db_uri = self.make_db_uri(self.db_file_path, auto_vacuum='FULL', journal_mode='WAL')
+        self.db_ro_uri = self.make_db_uri(self.db_file_path, auto_vacuum='FULL', journal_mode='WAL', query_only='ON')
 
         self.logfile = os.path.abspath(os.path.join(self.log_path, 'globaleaks.log'))
         self.httplogfile = os.path.abspath(os.path.join(self.log_path, "http.log"))
@@ -262,6 +296,9 @@ class GLSettingsClass(object):
         # gnupg path is used by PGP as temporary directory with keyring and files encryption.
         self.pgproot = os.path.abspath(os.path.join(self.ramdisk_path, 'gnupg'))
 
+        # unix domain socket used by the https workers when proxy_transport is 'unix'
+        self.proxy_socket_path = os.path.abspath(os.path.join(self.ramdisk_path, 'backend.sock'))
+
         # If we see that there is a custom build of GLClient, use that one.
         custom_client_path = '/var/globaleaks/client'
         if os.path.exists(custom_client_path):
@@ -330,6 +367,8 @@ class GLSettingsClass(object):
             sys.exit(1)
         self.socks_port = self.cmdline_options.socks_port
 
+        self.proxy_transport = self.cmdline_options.proxy_transport
+
         if self.cmdline_options.ramdisk:
             self.ramdisk_path = self.cmdline_options.ramdisk
 
@@ -523,8 +562,9 @@ class GLSettingsClass(object):
                 self.print_msg("Error while evaluating removal for %s: %s" % (path, excep))
 
     @staticmethod
-    def make_db_uri(db_file_path):
-        return 'sqlite:' + db_file_path + '?foreign_keys=ON'
+    def make_db_uri(db_file_path, **options):
+        options.setdefault('foreign_keys', 'ON')
+        return 'sqlite:' + db_file_path + '?' + '&'.join('%s=%s' % o for o in sorted(options.items()))
 
     def start_jobs(self):
         from globaleaks.jobs import jobs_list
@@ -3,7 +3,7 @@ import json
 
 from twisted.internet.defer import inlineCallbacks
 
-from globaleaks.handlers.admin import context
+from globaleaks.handlers.admin import context, user
 from globaleaks.models import Context
 from globaleaks.rest import requests, errors
 from globaleaks.tests import helpers
@@ -31,6 +31,23 @@ class TestContextsCollection(helpers.TestHandlerWithPopulatedDB):
         self.dummyContext['id'] = response['id']
         self.assertEqual(response['description'], stuff)
 
+    @inlineCallbacks
+    def test_get_after_receiver_deletion(self):
+        handler = self.request(role='admin', path='/admin/contexts')
+        response = yield handler.get()
+        self.assertIn(self.dummyReceiver_1['id'], response[0]['receivers'])
+
+        handler = self.request(role='admin', handler_cls=user.UserInstance)
+        yield handler.delete(self.dummyReceiver_1['id'])
+
+        # the cache hits return the serialized response
+        handler = self.request(role='admin', path='/admin/contexts')
+        response = yield handler.get()
+        if isinstance(response, str):
+            response = json.loads(response)
+
+        self.assertNotIn(self.dummyReceiver_1['id'], response[0]['receivers'])
+
 
 class TestContextInstance(helpers.TestHandlerWithPopulatedDB):
     _handler = context.ContextInstance
@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
+import json
 
 from twisted.internet.defer import inlineCallbacks
 
 from globaleaks import models
-from globaleaks.handlers.admin import modelimgs
+from globaleaks.handlers.admin import modelimgs, user
 from globaleaks.tests import helpers
 
 
@@ -26,3 +27,22 @@ class TestModelImgInstance(helpers.TestHandlerWithPopulatedDB):
 
         img = yield modelimgs.get_model_img(models.User, self.dummyReceiverUser_1['id'])
         self.assertEqual(img, '')
+
+    @inlineCallbacks
+    def test_post_refreshes_the_users_list(self):
+        handler = self.request(role='admin', path='/admin/users', handler_cls=user.UsersCollection)
+        response = yield handler.get()
+        pictures = {u['id']: u['picture'] for u in response}
+        self.assertEqual(pictures[self.dummyReceiverUser_1['id']], '')
+
+        handler = self.request({}, role='admin')
+        yield handler.post('users', self.dummyReceiverUser_1['id'])
+
+        # the cache hits return the serialized response
+        handler = self.request(role='admin', path='/admin/users', handler_cls=user.UsersCollection)
+        response = yield handler.get()
+        if isinstance(response, str):
+            response = json.loads(response)
+
+        pictures = {u['id']: u['picture'] for u in response}
+        self.assertNotEqual(pictures[self.dummyReceiverUser_1['id']], '')
@@ -24,7 +24,7 @@ class TestStatsCollection(helpers.TestHandler):
         self.assertEqual(len(response), 3)
         self.assertEqual(len(response['heatmap']), 7 * 24)
 
-        self.pollute_events_and_perform_synthesis(10)
+        self.pollute_events(10)
 
         yield AnomaliesSchedule().run()
         yield StatisticsSchedule().run()
@@ -41,7 +41,7 @@ class TestAnomalyCollection(helpers.TestHandler):
 
     @inlineCallbacks
     def test_get(self):
-        self.pollute_events_and_perform_synthesis(10)
+        self.pollute_events(10)
 
         yield AnomaliesSchedule().run()
         yield StatisticsSchedule().run()
@@ -59,7 +59,7 @@ class TestRecentEventsCollection(helpers.TestHandler):
 
     @inlineCallbacks
     def test_get(self):
-        self.pollute_events_and_perform_synthesis(3)
+        self.pollute_events(3)
 
         yield StatisticsSchedule().run()
 
@@ -89,3 +89,32 @@ class TestJobsTiming(helpers.TestHandler):
         handler = self.request({}, role='admin')
 
         yield handler.get()
+
+
+class TestORMStats(helpers.TestHandler):
+    _handler = statistics.ORMStats
+
+    @inlineCallbacks
+    def test_get(self):
+        handler = self.request({}, role='admin')
+
+        response = yield handler.get()
+
+        for pool in ['rw', 'ro']:
+            for k in ['queued', 'working', 'threads']:
+                self.assertTrue(k in response[pool])
+
+        self.assertTrue(response['connections'] >= 1)
+
+
+class TestAPICacheStats(helpers.TestHandler):
+    _handler = statistics.APICacheStats
+
+    @inlineCallbacks
+    def test_get(self):
+        handler = self.request({}, role='admin')
+
+        response = yield handler.get()
+
+        for k in ['entries', 'size', 'hits', 'misses', 'not_modified']:
+            self.assertTrue(k in response)
@@ -5,10 +5,21 @@ from globaleaks.handlers.base import GLSessions
 from globaleaks.handlers.user import UserInstance
 from globaleaks.handlers.wbtip import WBTipInstance
 from globaleaks.rest import errors
+from globaleaks.security import KDFPool
 from globaleaks.settings import GLSettings
 from globaleaks.tests import helpers
 
 
+def start_kdf_pool(test):
+    GLSettings.kdf_pool = KDFPool(1)
+
+    def stop_kdf_pool():
+        GLSettings.kdf_pool.stop()
+        GLSettings.kdf_pool = None
+
+    test.addCleanup(stop_kdf_pool)
+
+
 class TestAuthentication(helpers.TestHandlerWithPopulatedDB):
     _handler = authentication.AuthenticationHandler
 
@@ -25,6 +36,23 @@ class TestAuthentication(helpers.TestHandlerWithPopulatedDB):
         self.assertTrue('session_id' in response)
         self.assertEqual(len(GLSessions), 1)
 
+    @inlineCallbacks
+    def test_successful_login_with_kdf_pool(self):
+        start_kdf_pool(self)
+
+        handler = self.request({
+            'username': 'admin',
+            'password': helpers.VALID_PASSWORD1
+        })
+        response = yield handler.post()
+        self.assertTrue('session_id' in response)
+
+        handler = self.request({
+            'username': 'admin',
+            'password': helpers.INVALID_PASSWORD
+        })
+        yield self.assertFailure(handler.post(), errors.InvalidAuthentication)
+
     @inlineCallbacks
     def test_accept_login_in_tor2web(self):
         handler = self.request({
@@ -134,6 +162,19 @@ class TestReceiptAuth(helpers.TestHandlerWithPopulatedDB):
         self.assertTrue('session_id' in response)
         self.assertEqual(len(GLSessions), 1)
 
+    @inlineCallbacks
+    def test_successful_whistleblower_login_with_kdf_pool(self):
+        yield self.perform_full_submission_actions()
+        start_kdf_pool(self)
+
+        handler = self.request({
+            'receipt': self.dummySubmission['receipt']
+        })
+        handler.request.client_using_tor = True
+        response = yield handler.post()
+        self.assertTrue('session_id' in response)
+        self.assertEqual(len(GLSessions), 1)
+
     @inlineCallbacks
     def test_accept_whistleblower_login_in_tor2web(self):
         yield self.perform_full_submission_actions()
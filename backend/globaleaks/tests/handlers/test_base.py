@@ -1,12 +1,17 @@
 # -*- coding: utf-8 -*-
 import json
+import os
 
 from twisted.internet.defer import inlineCallbacks
 
-from globaleaks.handlers.base import GLSession, GLSessions, BaseHandler, StaticFileHandler
-from globaleaks.rest.errors import InvalidInputFormat, ResourceNotFound
+from globaleaks.handlers.base import GLSession, GLSessions, BaseHandler, ClientFileHandler, StaticFileHandler, \
+    match_etag, parse_range_header
+from globaleaks.rest.errors import FileTooBig, InvalidInputFormat, RequestedRangeNotSatisfiable, ResourceNotFound
 from globaleaks.settings import GLSettings
 from globaleaks.tests import helpers
+from globaleaks.tests.utils.test_multipart import BOUNDARY, build_body
+from globaleaks.utils.assets import AssetManifest
+from globaleaks.utils.multipart import MultipartUploadParser
 
 FUTURE = 100
 
@@ -72,6 +77,56 @@ class TestBaseHandler(helpers.TestHandlerWithPopulatedDB):
         self.assertTrue(BaseHandler.validate_regexp('Foca', '\w+'))
         self.assertFalse(BaseHandler.validate_regexp('Foca', '\d+'))
 
+    def test_parse_range_header(self):
+        self.assertEqual(parse_range_header('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range_header('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range_header('bytes=900-2000', 1000), (900, 999))
+        self.assertEqual(parse_range_header('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range_header('bytes=-2000', 1000), (0, 999))
+
+        # unsupported or malformed ranges are ignored
+        self.assertIsNone(parse_range_header('bytes=0-1,5-6', 1000))
+        self.assertIsNone(parse_range_header('items=0-1', 1000))
+        self.assertIsNone(parse_range_header('bytes=5-1', 1000))
+        self.assertIsNone(parse_range_header('bytes=a-b', 1000))
+
+        self.assertRaises(RequestedRangeNotSatisfiable, parse_range_header, 'bytes=1000-', 1000)
+        self.assertRaises(RequestedRangeNotSatisfiable, parse_range_header, 'bytes=-0', 1000)
+
+    def test_match_etag(self):
+        self.assertTrue(match_etag('"a"', '"a"'))
+        self.assertTrue(match_etag('"b", W/"a"', '"a"'))
+        self.assertTrue(match_etag('*', '"a"'))
+        self.assertFalse(match_etag('"b"', '"a"'))
+        self.assertFalse(match_etag(None, '"a"'))
+
+
+    def test_get_file_upload_just_over_the_limit(self):
+        GLSettings.memory_copy.maximum_filesize = 1
+        max_size = 1024 * 1024
+
+        body = build_body([], 'antani.txt', 'a' * (max_size + 1))
+
+        parser = MultipartUploadParser(BOUNDARY, max_size)
+        parser.write(body)
+        parser.finalize()
+
+        chunk = parser.args['file'][0]
+
+        handler = self.request()
+        handler.request.args = {
+            'file': [chunk],
+            'flowFilename': ['antani.txt'],
+            'flowIdentifier': ['1337-antani'],
+            'flowTotalSize': [str(max_size + 1)],
+            'flowChunkNumber': ['1'],
+            'flowTotalChunks': ['1']
+        }
+
+        # the parser dropped the tail of the chunk that must not be accepted
+        self.assertRaises(FileTooBig, helpers.original_get_file_upload, handler)
+        self.assertFalse(os.path.exists(chunk.filepath))
+
 
 class TestStaticFileHandler(helpers.TestHandler):
     _handler = StaticFileHandler
@@ -92,3 +147,53 @@ class TestStaticFileHandler(helpers.TestHandler):
             return
 
         self.fail('should throw resource not found error')
+
+
+class TestClientFileHandler(helpers.TestHandler):
+    _handler = ClientFileHandler
+
+    @inlineCallbacks
+    def setUp(self):
+        yield helpers.TestHandler.setUp(self)
+
+        GLSettings.appstate.client_assets = AssetManifest(GLSettings.client_path,
+                                                          GLSettings.client_assets_cache_size).build()
+
+    def tearDown(self):
+        GLSettings.appstate.client_assets = None
+
+        return helpers.TestHandler.tearDown(self)
+
+    @inlineCallbacks
+    def test_get_index(self):
+        handler = self.request(kwargs={'path': GLSettings.client_path})
+        response = yield handler.get('')
+        self.assertTrue(response.startswith('<!doctype html>'))
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders('Cache-Control')[-1], 'no-cache')
+
+    @inlineCallbacks
+    def test_get_versioned(self):
+        asset = GLSettings.appstate.client_assets.get('js/app.js')
+
+        handler = self.request(kwargs={'path': GLSettings.client_path}, headers={'Accept-Encoding': 'gzip, deflate'})
+        handler.request.args = {'v': [asset.hash]}
+        yield handler.get('js/app.js')
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders('Cache-Control')[-1],
+                         'public, max-age=31536000, immutable')
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders('Content-Encoding'), ['gzip'])
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders('ETag'), [asset.gzip_etag])
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders('Vary'), ['Accept-Encoding'])
+        self.assertIsNone(handler.request.responseHeaders.getRawHeaders('Pragma'))
+
+        # the identity variant is not validated by the etag of the gzip variant
+        handler = self.request(kwargs={'path': GLSettings.client_path}, headers={'If-None-Match': asset.gzip_etag})
+        response = yield handler.get('js/app.js')
+        self.assertNotEqual(handler.request.responseCode, 304)
+        self.assertNotEqual(response, '')
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders('ETag'), [asset.etag])
+        self.assertIsNone(handler.request.responseHeaders.getRawHeaders('Content-Encoding'))
+
+        handler = self.request(kwargs={'path': GLSettings.client_path}, headers={'If-None-Match': asset.etag})
+        yield handler.get('js/app.js')
+        self.assertEqual(handler.request.responseCode, 304)
+        self.assertEqual(handler.request.getResponseBody(), '')
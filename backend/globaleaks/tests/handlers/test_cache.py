@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
+import json
+from collections import OrderedDict
+
+from twisted.internet import defer
 from twisted.internet.defer import inlineCallbacks
 
-from globaleaks import handlers
-from globaleaks.orm import transact
+from globaleaks import handlers, models
 from globaleaks.rest.apicache import GLApiCache, decorator_cache_get
 from globaleaks.handlers import public
+from globaleaks.settings import GLSettings
 from globaleaks.tests import helpers
 
 
@@ -13,7 +17,7 @@ class TestGLApiCache(helpers.TestGL):
     def setUp(self):
         yield helpers.TestGL.setUp(self)
 
-        GLApiCache.invalidate()
+        GLApiCache.clear()
 
     def test_get_set_items(self):
         self.assertEqual(GLApiCache.memory_cache_dict, {})
@@ -21,13 +25,154 @@ class TestGLApiCache(helpers.TestGL):
         self.assertIsNone(GLApiCache.get("passante_di_professione", "en"))
         GLApiCache.set("passante_di_professione", "it", 'ititit')
         GLApiCache.set("passante_di_professione", "en", 'enenen')
-        self.assertTrue("passante_di_professione" in GLApiCache.memory_cache_dict)
-        self.assertTrue("it" in GLApiCache.memory_cache_dict['passante_di_professione'])
-        self.assertTrue("en" in GLApiCache.memory_cache_dict['passante_di_professione'])
+        self.assertTrue(("passante_di_professione", "it") in GLApiCache.memory_cache_dict)
+        self.assertTrue(("passante_di_professione", "en") in GLApiCache.memory_cache_dict)
         self.assertEqual(GLApiCache.get("passante_di_professione", "it"), 'ititit')
         self.assertEqual(GLApiCache.get("passante_di_professione", "en"), 'enenen')
+        self.assertEqual(GLApiCache.size, 12)
         GLApiCache.invalidate()
         self.assertEqual(GLApiCache.memory_cache_dict, {})
+        self.assertEqual(GLApiCache.size, 0)
+
+    def test_set_serializes_values(self):
+        GLApiCache.set("/json", "en", {'a': [1, 2]})
+        entry = GLApiCache.get_entry("/json", "en")
+        self.assertEqual(json.loads(entry.body), {'a': [1, 2]})
+        self.assertEqual(entry.content_type, 'application/json')
+
+        GLApiCache.set("/unicode", "en", u'è')
+        self.assertEqual(GLApiCache.get("/unicode", "en"), '\xc3\xa8')
+
+    def test_size_limit(self):
+        api_cache_size = GLSettings.api_cache_size
+        GLSettings.api_cache_size = 10
+
+        try:
+            GLApiCache.set("/a", "en", 'aaaa')
+            GLApiCache.set("/b", "en", 'bbbb')
+
+            # the access to /a makes /b the least recently used entry
+            GLApiCache.get("/a", "en")
+            GLApiCache.set("/c", "en", 'cccc')
+            self.assertEqual(GLApiCache.get("/a", "en"), 'aaaa')
+            self.assertIsNone(GLApiCache.get("/b", "en"))
+            self.assertEqual(GLApiCache.get("/c", "en"), 'cccc')
+            self.assertEqual(GLApiCache.size, 8)
+
+            # entries bigger than the cache are not stored
+            GLApiCache.set("/d", "en", 'd' * 11)
+            self.assertIsNone(GLApiCache.get("/d", "en"))
+            self.assertEqual(GLApiCache.size, 8)
+        finally:
+            GLSettings.api_cache_size = api_cache_size
+
+    def test_invalidate_dependencies(self):
+        GLApiCache.set("/receivers", "en", 'receivers', frozenset([models.Context, models.Receiver]))
+        GLApiCache.set("/texts", "en", 'texts', frozenset([models.CustomTexts]))
+        GLApiCache.set("/any", "en", 'any')
+
+        GLApiCache.invalidate((models.Receiver,))
+        self.assertIsNone(GLApiCache.get("/receivers", "en"))
+        self.assertEqual(GLApiCache.get("/texts", "en"), 'texts')
+
+        # entries without dependencies depend on every model
+        self.assertIsNone(GLApiCache.get("/any", "en"))
+
+    def test_set_outdated_generation(self):
+        generation = GLApiCache.generation
+        GLApiCache.invalidate((models.Receiver,))
+        GLApiCache.set("/receivers", "en", 'outdated', None, generation)
+        self.assertIsNone(GLApiCache.get("/receivers", "en"))
+
+
+class TestGLApiCacheWarm(helpers.TestGL):
+    @inlineCallbacks
+    def setUp(self):
+        yield helpers.TestGL.setUp(self)
+
+        GLApiCache.clear()
+
+        self.warmers = GLApiCache.warmers
+        self.languages_enabled = GLSettings.memory_copy.languages_enabled
+        self.calls = []
+
+        GLApiCache.warmers = OrderedDict()
+        GLApiCache.register_warmer('/fake/{}', self.build, (models.Context,))
+        GLSettings.memory_copy.languages_enabled = ['en', 'it']
+
+    def tearDown(self):
+        GLApiCache.warmers = self.warmers
+        GLSettings.memory_copy.languages_enabled = self.languages_enabled
+
+        return helpers.TestGL.tearDown(self)
+
+    def build(self, language):
+        d = defer.Deferred()
+        self.calls.append((language, d))
+        return d
+
+    def complete(self, version):
+        calls, self.calls = self.calls, []
+        for language, d in calls:
+            d.callback({'language': language, 'version': version})
+
+    def get(self, language):
+        return json.loads(GLApiCache.get('/fake/%s' % language, language))
+
+    def test_warm_and_invalidate(self):
+        warmed = GLApiCache.warm()
+        self.assertEqual([l for l, _ in self.calls], ['en', 'it'])
+        self.complete(1)
+        self.assertTrue(warmed.called)
+        self.assertEqual(self.get('it'), {'language': 'it', 'version': 1})
+
+        # unrelated modifications do not require any rebuild
+        GLApiCache.invalidate((models.Receiver,))
+        self.assertEqual(self.calls, [])
+
+        # the previous version is served until the new one is ready
+        warmed = GLApiCache.invalidate((models.Context,))
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(self.get('en'), {'language': 'en', 'version': 1})
+        self.assertFalse(warmed.called)
+
+        self.complete(2)
+        self.assertTrue(warmed.called)
+        self.assertEqual(self.get('en'), {'language': 'en', 'version': 2})
+        self.assertFalse(GLApiCache.get_entry('/fake/en', 'en').stale)
+
+    def test_warm_coalesces_invalidations(self):
+        GLApiCache.warm()
+        self.complete(1)
+
+        first = GLApiCache.invalidate((models.Context,))
+        second = GLApiCache.invalidate((models.Context,))
+        third = GLApiCache.invalidate((models.Context,))
+        self.assertEqual(len(self.calls), 2)
+
+        # the results of the first run predate the following invalidations
+        self.complete(2)
+        self.assertTrue(first.called)
+        self.assertTrue(GLApiCache.get_entry('/fake/en', 'en').stale)
+        self.assertEqual(len(self.calls), 2)
+
+        self.complete(3)
+        self.assertTrue(second.called)
+        self.assertTrue(third.called)
+        self.assertEqual(self.get('en'), {'language': 'en', 'version': 3})
+
+    def test_warm_failure(self):
+        GLApiCache.warm()
+        self.complete(1)
+
+        warmed = GLApiCache.invalidate((models.Context,))
+        calls, self.calls = self.calls, []
+        for _, d in calls:
+            d.errback(Exception("antani"))
+
+        # the stale entries are discarded in order to be rebuilt on request
+        self.assertTrue(warmed.called)
+        self.assertIsNone(GLApiCache.get_entry('/fake/en', 'en'))
 
 
 class TestCacheWithHandlers(helpers.TestHandler):
@@ -35,7 +180,7 @@ class TestCacheWithHandlers(helpers.TestHandler):
 
     @inlineCallbacks
     def test_handler_cache_hit(self):
-        GLApiCache.invalidate()
+        GLApiCache.clear()
 
         handler = self.request(path='/public')
         resp = yield handler.get()
@@ -43,28 +188,28 @@ class TestCacheWithHandlers(helpers.TestHandler):
         self.assertEqual(len(GLApiCache.memory_cache_dict), 1)
 
         cached_resp = GLApiCache.get("/public", "en")
+        self.assertEqual(json.loads(cached_resp), json.loads(json.dumps(resp)))
 
+        # hits return the serialized response
+        handler = self.request(path='/public')
         second_resp = yield handler.get()
-        self.assertEqual(resp, cached_resp)
-        self.assertEqual(resp, second_resp)
+        self.assertEqual(second_resp, cached_resp)
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders('content-type')[-1],
+                         'application/json')
 
         # Check that a different language doesn't blow away a different resource
         handler_fr = self.request(path='/public', headers={'gl-language': 'fr'})
         resp_fr = yield handler_fr.get()
         cached_resp_fr = GLApiCache.get("/public", "fr")
 
-        self.assertEqual(resp_fr, cached_resp_fr)
-
-
-        s = reduce(lambda x, y: x+len(y), GLApiCache.memory_cache_dict.values(), 0)
-
-        self.assertEqual(s, 2)
-        self.assertNotEqual(resp_fr, cached_resp)
+        self.assertEqual(json.loads(cached_resp_fr), json.loads(json.dumps(resp_fr)))
+        self.assertEqual(len(GLApiCache.memory_cache_dict), 2)
+        self.assertNotEqual(cached_resp_fr, cached_resp)
 
     def test_handler_sync_cache_miss(self):
         # Asserts that the cases where the result of f returns immediately,
         # the caching implementation does not fall over and die.
-        GLApiCache.invalidate()
+        GLApiCache.clear()
 
         p = '/fake/sync/res'
         handler = self.request(handler_cls=FakeSyncHandler, path=p)
@@ -73,8 +218,8 @@ class TestCacheWithHandlers(helpers.TestHandler):
         cached_resp = GLApiCache.get(p, "en")
 
         second_resp = handler.get()
-        self.assertEqual(resp, cached_resp)
-        self.assertEqual(resp, second_resp)
+        self.assertEqual(json.loads(cached_resp), resp)
+        self.assertEqual(second_resp, cached_resp)
 
 
 class FakeSyncHandler(handlers.base.BaseHandler):
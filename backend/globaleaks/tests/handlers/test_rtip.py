@@ -6,6 +6,7 @@ from twisted.internet.defer import inlineCallbacks
 from globaleaks import models
 from globaleaks.handlers import rtip
 from globaleaks.jobs.delivery_sched import DeliverySchedule
+from globaleaks.orm import transact
 from globaleaks.rest import errors
 from globaleaks.settings import GLSettings
 from globaleaks.tests import helpers
@@ -244,6 +245,47 @@ class TestReceiverFileDownload(helpers.TestHandlerWithPopulatedDB):
                 yield handler.get(rfile_desc['id'])
                 self.assertNotEqual(handler.request.getResponseBody(), '')
 
+    @transact
+    def get_rfile_downloads(self, store, rfile_id):
+        return store.find(models.ReceiverFile, models.ReceiverFile.id == rfile_id).one().downloads
+
+    @inlineCallbacks
+    def test_get_range(self):
+        yield self.perform_minimal_submission()
+        yield DeliverySchedule().run()
+
+        rtip_desc = (yield self.get_rtips())[0]
+        rfile_desc = (yield self.get_rfiles(rtip_desc['id']))[0]
+
+        handler = self.request(role='receiver', user_id=rtip_desc['receiver_id'])
+        yield handler.get(rfile_desc['id'])
+        content = handler.request.getResponseBody()
+        etag = handler.request.responseHeaders.getRawHeaders('ETag')[0]
+
+        # resume of the transfer
+        handler = self.request(role='receiver', user_id=rtip_desc['receiver_id'],
+                               headers={'Range': 'bytes=10-', 'If-Range': etag})
+        yield handler.get(rfile_desc['id'])
+        self.assertEqual(handler.request.responseCode, 206)
+        self.assertEqual(handler.request.responseHeaders.getRawHeaders('Content-Range')[0],
+                         'bytes 10-%d/%d' % (len(content) - 1, len(content)))
+        self.assertEqual(handler.request.getResponseBody(), content[10:])
+
+        # a range conditioned by a stale ETag gets the whole file
+        handler = self.request(role='receiver', user_id=rtip_desc['receiver_id'],
+                               headers={'Range': 'bytes=10-19', 'If-Range': '"antani"'})
+        yield handler.get(rfile_desc['id'])
+        self.assertNotEqual(handler.request.responseCode, 206)
+        self.assertEqual(handler.request.getResponseBody(), content)
+
+        handler = self.request(role='receiver', user_id=rtip_desc['receiver_id'],
+                               headers={'Range': 'bytes=%d-' % len(content)})
+        yield self.assertFailure(handler.get(rfile_desc['id']), errors.RequestedRangeNotSatisfiable)
+
+        # the resumed transfer is not counted as a new download
+        downloads = yield self.get_rfile_downloads(rfile_desc['id'])
+        self.assertEqual(downloads, 2)
+
 
 class TestIdentityAccessRequestsCollection(helpers.TestHandlerWithPopulatedDB):
     _handler = rtip.IdentityAccessRequestsCollection
@@ -11,7 +11,7 @@ sys.setdefaultencoding('utf8')
 from globaleaks import db, models, security, event, jobs, __version__
 from globaleaks.anomaly import Alarm
 from globaleaks.db.appdata import load_appdata
-from globaleaks.orm import transact
+from globaleaks.orm import transact, store_pool
 from globaleaks.handlers import rtip, wbtip
 from globaleaks.handlers.authentication import db_get_wbtip_by_receipt
 from globaleaks.handlers.base import BaseHandler, GLSessions, new_session, \
@@ -26,7 +26,7 @@ from globaleaks.handlers.admin.user import create_admin_user, create_custodian_u
 from globaleaks.handlers.submission import create_submission
 from globaleaks.rest.apicache import GLApiCache
 from globaleaks.settings import GLSettings
-from globaleaks.security import GLSecureTemporaryFile
+from globaleaks.security import GLPGPKeyrings, GLSecureTemporaryFile
 from globaleaks.utils import tempdict, token, utility
 from globaleaks.utils.structures import fill_localized_keys
 from globaleaks.utils.utility import datetime_null, datetime_now, datetime_to_ISO8601, \
@@ -43,8 +43,6 @@ import os
 import shutil
 import signal
 
-from datetime import timedelta
-
 from twisted.web.test.requesthelper import DummyRequest
 from twisted.internet import threads, defer, task
 from twisted.internet.address import IPv4Address
@@ -105,10 +103,17 @@ def init_glsettings_for_unit_tests():
 
     GLSettings.set_ramdisk_path()
 
+    store_pool.clear()
+
+    GLPGPKeyrings.clear()
+
     GLSettings.remove_directories()
     GLSettings.create_directories()
 
     GLSettings.orm_tp = FakeThreadPool()
+    GLSettings.orm_ro_tp = FakeThreadPool()
+    GLSettings.delivery_tp = FakeThreadPool()
+    GLSettings.secure_delete_tp = FakeThreadPool()
 
     GLSettings.memory_copy.hostname = 'localhost'
 
@@ -201,6 +206,8 @@ def get_dummy_file(filename=None, content_type=None, content=None):
 def get_file_upload(self):
     return get_dummy_file()
 
+original_get_file_upload = BaseHandler.get_file_upload
+
 BaseHandler.get_file_upload = get_file_upload
 
 
@@ -240,7 +247,7 @@ class TestGL(unittest.TestCase):
         GLSettings.appstate.process_supervisor = sup
 
         Alarm.reset()
-        event.EventTrackQueue.clear()
+        event.EventCounters.clear()
         GLSettings.reset_hourly()
 
         GLSettings.submission_minimum_delay = 0
@@ -449,13 +456,7 @@ class TestGL(unittest.TestCase):
         for _ in xrange(number_of_times):
             for event_obj in event.events_monitored:
                 for x in xrange(2):
-                    event.EventTrack(event_obj, timedelta(seconds=1.0 * x))
-
-    def pollute_events_and_perform_synthesis(self, number_of_times=10):
-        for _ in xrange(number_of_times):
-            for event_obj in event.events_monitored:
-                for x in xrange(2):
-                    event.EventTrack(event_obj, timedelta(seconds=1.0 * x)).synthesis()
+                    event.EventCounters.add(event_obj['name'], 1.0 * x)
     @transact
     def get_rtips(self, store):
         ret = []
@@ -667,7 +668,7 @@ class TestHandler(TestGLWithPopulatedDB):
         GLSessions.clear()
 
         # we need to reset GLApiCache to keep each test independent
-        GLApiCache.invalidate()
+        GLApiCache.clear()
 
     def request(self, jbody=None, user_id=None, role=None, headers=None, body='', path=None,
                 remote_ip='0.0.0.0', method='MOCK', handler_cls=None, attached_file={}, kwargs={}):
@@ -4,7 +4,7 @@ import os
 from twisted.internet.defer import inlineCallbacks
 
 from globaleaks import models
-from globaleaks.jobs import cleaning_sched
+from globaleaks.jobs import cleaning_sched, secure_file_delete_sched
 from globaleaks.orm import transact
 from globaleaks.settings import GLSettings
 from globaleaks.tests import helpers
@@ -89,5 +89,7 @@ class TestCleaningSched(helpers.TestGLWithPopulatedDB):
 
         yield cleaning_sched.CleaningSchedule().run()
 
+        yield secure_file_delete_sched.SecureFileDeleteSchedule().run()
+
         # verify cascade deletion when tips expire
         yield self.check0()
@@ -0,0 +1,157 @@
+import os
+import threading
+
+from twisted.internet.defer import inlineCallbacks
+from twisted.python.threadpool import ThreadPool
+
+from globaleaks import models
+from globaleaks.jobs import delivery_sched
+from globaleaks.jobs.delivery_sched import DeliverySchedule
+from globaleaks.orm import transact
+from globaleaks.security import GLBPGP
+from globaleaks.settings import GLSettings
+from globaleaks.tests import helpers
+
+
+class TestDeliverySchedule(helpers.TestGLWithPopulatedDB):
+    @inlineCallbacks
+    def setUp(self):
+        yield helpers.TestGLWithPopulatedDB.setUp(self)
+        yield self.perform_full_submission_actions()
+
+    @transact
+    def get_files_status(self, store):
+        ifiles = [ifile.new for ifile in store.find(models.InternalFile)]
+        rfiles = [rfile.status for rfile in store.find(models.ReceiverFile)]
+        return ifiles, rfiles
+
+    @inlineCallbacks
+    def test_delivery_with_thread_pool(self):
+        fake_tp = GLSettings.delivery_tp
+        GLSettings.delivery_tp = ThreadPool(0, 4)
+        GLSettings.delivery_tp.start()
+
+        try:
+            yield DeliverySchedule().run()
+        finally:
+            GLSettings.delivery_tp.stop()
+            GLSettings.delivery_tp = fake_tp
+
+        ifiles, rfiles = yield self.get_files_status()
+
+        self.assertEqual(len(ifiles), self.population_of_submissions * self.population_of_attachments)
+        self.assertFalse(any(ifiles))
+        self.assertEqual(len(rfiles), len(ifiles) * self.population_of_recipients)
+        self.assertEqual(set(rfiles), {u'encrypted'})
+
+    @inlineCallbacks
+    def test_delivery_bounded_encryptions(self):
+        fake_tp = GLSettings.delivery_tp
+        delivery_threads = GLSettings.delivery_threads
+        fsops_pgp_encrypt = delivery_sched.fsops_pgp_encrypt
+
+        lock = threading.Lock()
+        encryptions = {'running': 0, 'max': 0}
+
+        def counting_fsops_pgp_encrypt(f, recipient_pgp):
+            with lock:
+                encryptions['running'] += 1
+                encryptions['max'] = max(encryptions['max'], encryptions['running'])
+
+            try:
+                return fsops_pgp_encrypt(f, recipient_pgp)
+            finally:
+                with lock:
+                    encryptions['running'] -= 1
+
+        delivery_sched.fsops_pgp_encrypt = counting_fsops_pgp_encrypt
+        GLSettings.delivery_threads = 1
+        GLSettings.delivery_tp = ThreadPool(0, 4)
+        GLSettings.delivery_tp.start()
+
+        try:
+            yield DeliverySchedule().run()
+        finally:
+            GLSettings.delivery_tp.stop()
+            GLSettings.delivery_tp = fake_tp
+            GLSettings.delivery_threads = delivery_threads
+            delivery_sched.fsops_pgp_encrypt = fsops_pgp_encrypt
+
+        # the receivers exceeding the slots are encrypted in subsequent passes
+        self.assertEqual(encryptions['max'], 1)
+
+        ifiles, rfiles = yield self.get_files_status()
+        self.assertEqual(len(rfiles), len(ifiles) * self.population_of_recipients)
+        self.assertEqual(set(rfiles), {u'encrypted'})
+
+    @inlineCallbacks
+    def test_delivery_retry(self):
+        update = delivery_sched.update_internalfile_and_store_receiverfiles
+
+        def update_failure(receiverfiles_maps):
+            raise Exception("antani")
+
+        delivery_sched.update_internalfile_and_store_receiverfiles = update_failure
+
+        try:
+            yield DeliverySchedule().run()
+        finally:
+            delivery_sched.update_internalfile_and_store_receiverfiles = update
+
+        ifiles, rfiles = yield self.get_files_status()
+        self.assertTrue(all(ifiles))
+        self.assertEqual(set(rfiles), {u'processing'})
+
+        yield DeliverySchedule().run()
+
+        # the receiverfiles of the failed attempt are replaced by the new ones
+        ifiles, rfiles = yield self.get_files_status()
+        self.assertFalse(any(ifiles))
+        self.assertEqual(len(rfiles), len(ifiles) * self.population_of_recipients)
+        self.assertEqual(set(rfiles), {u'encrypted'})
+
+
+class TestDeliveryScheduleMixed(helpers.TestGLWithPopulatedDB):
+    encryption_scenario = 'MIXED'
+
+    @inlineCallbacks
+    def setUp(self):
+        yield helpers.TestGLWithPopulatedDB.setUp(self)
+        yield self.perform_full_submission_actions()
+
+    @transact
+    def get_files(self, store):
+        ret = []
+        for ifile in store.find(models.InternalFile):
+            rfiles = dict((rfile.status, rfile.file_path) for rfile in store.find(models.ReceiverFile,
+                                                                                  models.ReceiverFile.internalfile_id == ifile.id))
+            ret.append((ifile.file_path, rfiles))
+
+        return ret
+
+    @inlineCallbacks
+    def test_delivery_tee(self):
+        yield DeliverySchedule().run()
+
+        files = yield self.get_files()
+        self.assertEqual(len(files), self.population_of_submissions * self.population_of_attachments)
+
+        pgpobj = GLBPGP()
+        pgpobj.load_key(helpers.PGPKEYS['VALID_PGP_KEY1_PRV'])
+
+        for ifile_path, rfiles in files:
+            self.assertEqual(set(rfiles.keys()), {u'reference', u'encrypted'})
+            self.assertEqual(rfiles[u'reference'], ifile_path)
+
+            with open(ifile_path, 'rb') as f:
+                plaintext = f.read()
+
+            self.assertNotEqual(plaintext, '')
+
+            # the plaintext copy and the encrypted file are fed by the same decryption
+            with open(rfiles[u'encrypted'], 'rb') as f:
+                self.assertEqual(str(pgpobj.gnupg.decrypt_file(f)), plaintext)
+
+            self.assertFalse(os.path.exists(ifile_path.replace('.plain', '.aes')))
+
+        pgpobj.destroy_environment()
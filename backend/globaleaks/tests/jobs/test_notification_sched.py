@@ -1,7 +1,8 @@
-from twisted.internet.defer import inlineCallbacks, succeed
+from twisted.internet.defer import fail, inlineCallbacks, succeed
 
 from globaleaks.jobs.delivery_sched import DeliverySchedule
 from globaleaks.jobs.notification_sched import NotificationSchedule
+from globaleaks.settings import GLSettings
 
 from globaleaks.tests import helpers
 from globaleaks.tests.jobs.test_base import get_scheduled_email_count
@@ -53,3 +54,60 @@ class TestNotificationSchedule(helpers.TestGLWithPopulatedDB):
 
         count = yield get_scheduled_email_count()
         self.assertEqual(count, 0)
+
+    @inlineCallbacks
+    def test_notification_schedule_retry_backoff(self):
+        yield DeliverySchedule().run()
+
+        notification_schedule = NotificationSchedule()
+        notification_schedule.skip_sleep = True
+
+        attempts = []
+
+        def sendmail(mail):
+            attempts.append(mail['id'])
+            return fail(Exception('SMTP failure')).addErrback(notification_schedule.mail_failed, mail)
+
+        notification_schedule.sendmail = sendmail
+
+        yield notification_schedule.run()
+        self.assertEqual(len(attempts), 28)
+
+        # the failed mails are not retried before their backoff expires
+        yield notification_schedule.run()
+        self.assertEqual(len(attempts), 28)
+
+        count = yield get_scheduled_email_count()
+        self.assertEqual(count, 28)
+
+        for mail_id in notification_schedule.retry_time:
+            notification_schedule.retry_time[mail_id] = 0
+
+        yield notification_schedule.run()
+        self.assertEqual(len(attempts), 56)
+
+    @inlineCallbacks
+    def test_notification_schedule_digest(self):
+        yield DeliverySchedule().run()
+
+        GLSettings.memory_copy.notif.notification_digest_interval = 60
+
+        notification_schedule = NotificationSchedule()
+        notification_schedule.skip_sleep = True
+        notification_schedule.sendmail = lambda mail: succeed(None)
+
+        # the events are not notified before the end of the digest window
+        yield notification_schedule.run()
+
+        count = yield get_scheduled_email_count()
+        self.assertEqual(count, 0)
+
+        notification_schedule.digest_start -= 3600
+
+        yield notification_schedule.run()
+
+        # a single mail is generated for each receiver
+        count = yield get_scheduled_email_count()
+        self.assertEqual(count, 2)
+
+        self.assertIsNone(notification_schedule.digest_start)
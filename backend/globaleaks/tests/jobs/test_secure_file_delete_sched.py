@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import os
+
+from twisted.internet.defer import inlineCallbacks
+
+from globaleaks import models
+from globaleaks.db import sync_clean_untracked_files
+from globaleaks.jobs import secure_file_delete_sched
+from globaleaks.orm import transact
+from globaleaks.settings import GLSettings
+from globaleaks.tests import helpers
+
+
+class TestSecureFileDeleteSchedule(helpers.TestGL):
+    @transact
+    def mark_files_for_secure_deletion(self, store, filepaths):
+        for filepath in filepaths:
+            secure_file_delete = models.SecureFileDelete()
+            secure_file_delete.filepath = unicode(filepath)
+            store.add(secure_file_delete)
+
+    def create_files(self, n):
+        filepaths = []
+
+        for i in range(n):
+            filepath = os.path.join(GLSettings.submission_path, 'antani-%d' % i)
+            with open(filepath, 'wb') as f:
+                f.write(os.urandom(1024 * i))
+
+            filepaths.append(filepath)
+
+        return filepaths
+
+    @inlineCallbacks
+    def test_secure_file_delete_schedule(self):
+        filepaths = self.create_files(5)
+
+        # files already removed are dropped from the queue
+        filepaths.append(os.path.join(GLSettings.submission_path, 'removed'))
+
+        yield self.mark_files_for_secure_deletion(filepaths)
+
+        job = secure_file_delete_sched.SecureFileDeleteSchedule()
+        job.batch_size = 2
+        yield job.run()
+
+        for filepath in filepaths:
+            self.assertFalse(os.path.exists(filepath))
+
+        yield self.test_model_count(models.SecureFileDelete, 0)
+
+    @inlineCallbacks
+    def test_untracked_files_are_queued(self):
+        filepaths = self.create_files(3)
+
+        yield self.mark_files_for_secure_deletion(filepaths[:1])
+
+        sync_clean_untracked_files()
+
+        # the untracked files are removed in background
+        for filepath in filepaths:
+            self.assertTrue(os.path.exists(filepath))
+
+        yield self.test_model_count(models.SecureFileDelete, 3)
+
+        yield secure_file_delete_sched.SecureFileDeleteSchedule().run()
+
+        self.assertEqual(os.listdir(GLSettings.submission_path), [])
+
+        yield self.test_model_count(models.SecureFileDelete, 0)
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 from twisted.internet.defer import inlineCallbacks
 
-from globaleaks import anomaly
+from globaleaks import anomaly, event
 from globaleaks.jobs import statistics_sched
+from globaleaks.models import Stats
+from globaleaks.orm import transact
 from globaleaks.tests import helpers
 
 # E non è la distanza ad abitare l'assenza.
@@ -56,6 +58,15 @@ class TestAnomaliesSchedule(helpers.TestGL):
 
 
 class TestStaticsSchedule(helpers.TestGL):
+    @transact
+    def get_summary(self, store):
+        return store.find(Stats).one().summary
+
     @inlineCallbacks
     def test_statistics_schedule(self):
+        self.pollute_events(1)
+
         yield statistics_sched.StatisticsSchedule().run()
+
+        summary = yield self.get_summary()
+        self.assertEqual(summary, {event_obj['name']: 2 for event_obj in event.events_monitored})
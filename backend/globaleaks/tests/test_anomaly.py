@@ -1,5 +1,4 @@
 # -*- encoding: utf-8 -*-
-from datetime import timedelta
 from twisted.internet import defer
 
 from globaleaks import event
@@ -16,10 +15,10 @@ class TestAlarm(helpers.TestGL):
 
         # create one event per type.
         for event_obj in event.events_monitored:
-            event.EventTrack(event_obj, timedelta(seconds=1.0))
+            event.EventCounters.add(event_obj['name'], 1.0)
 
-        x = event.EventTrackQueue.take_current_snapshot()
-        self.assertTrue(len(x) > 1)
+        x = event.EventCounters.get_event_matrix(60)
+        self.assertEqual(x, {event_obj['name']: 1 for event_obj in event.events_monitored})
 
     @defer.inlineCallbacks
     def test_compute_activity_level(self):
@@ -27,12 +26,12 @@ class TestAlarm(helpers.TestGL):
         remind: activity level is called every 30 seconds by
         """
         self.pollute_events()
-        previous_len = len(event.EventTrackQueue.take_current_snapshot())
+        previous_count = sum(event.EventCounters.get_event_matrix(60).values())
 
         self.pollute_events()
-        self.assertEqual(len(
-            event.EventTrackQueue.take_current_snapshot()
-        ), previous_len * 2)
+        self.assertEqual(sum(
+            event.EventCounters.get_event_matrix(60).values()
+        ), previous_count * 2)
 
         activity_level = yield Alarm.compute_activity_level()
         self.assertEqual(activity_level, 2)
@@ -1,10 +1,11 @@
 import re
 import urlparse
 
-from twisted.internet.address import IPv4Address
+from twisted.internet.address import IPv4Address, UNIXAddress
 from twisted.internet.defer import inlineCallbacks, Deferred
 from twisted.web.test.requesthelper import DummyRequest
 
+from globaleaks.rest.apicache import GLApiCache
 from globaleaks.settings import GLSettings
 from globaleaks.tests.helpers import TestGL
 
@@ -43,6 +44,12 @@ def forge_request(uri='https://www.globaleaks.org/', headers={}, method=b'GET',
 
     ret.notifyFinish = notifyFinish
 
+    # like twisted.web.server.Request the response code is kept in code
+    def setResponseCode(code, message=None):
+        ret.code = ret.responseCode = code
+
+    ret.setResponseCode = setResponseCode
+
     for k, v in headers.iteritems():
         ret.requestHeaders.setRawHeaders(bytes(k), [bytes(v)])
 
@@ -159,6 +166,17 @@ class TestAPI(TestGL):
 
         GLSettings.appstate.tor_exit_set.clear()
 
+    def test_https_worker_request_over_unix_socket(self):
+        request = forge_request(headers={'GL-Forwarded-For': '1.2.3.4'})
+        request.getHost = lambda: UNIXAddress('/dev/shm/globaleaks/backend.sock')
+
+        self.api.render(request)
+        self.assertFalse(request.client_using_tor)
+        self.assertEqual(request.client_ip, '1.2.3.4')
+        self.assertEqual(request.client_proto, 'https')
+        self.assertEqual(request.responseCode, 200)
+        self.assertIsNone(request.responseHeaders.getRawHeaders(b'connection'))
+
     def test_tor_redirection(self):
         GLSettings.appstate.tor_exit_set.add('1.2.3.4')
         GLSettings.memory_copy.onionservice = '1234567890123456.onion'
@@ -192,3 +210,110 @@ class TestAPI(TestGL):
         self.assertEqual(request.responseCode, 301)
         location = request.responseHeaders.getRawHeaders(b'location')[0]
         self.assertEqual('https://www.globaleaks.org/public', location)
+
+    def render(self, request):
+        """
+        Renders the request returning a deferred fired once it is finished
+        """
+        d = Deferred()
+
+        finish = request.finish
+
+        def _finish():
+            finish()
+            d.callback(request)
+
+        request.finish = _finish
+
+        self.api.render(request)
+
+        return d
+
+    @inlineCallbacks
+    def test_conditional_get(self):
+        GLApiCache.clear()
+
+        for _ in range(2):
+            request = yield self.render(forge_request(uri="https://www.globaleaks.org/public"))
+            self.assertEqual(request.responseCode, 200)
+
+            # the etag of the response is the same for cache misses and hits
+            etag = request.responseHeaders.getRawHeaders(b'etag')[0]
+            self.assertEqual(etag, GLApiCache.get_entry('/public', 'en').etag)
+            self.assertNotEqual(''.join(request.written), '')
+
+        not_modified = GLApiCache.not_modified
+
+        request = yield self.render(forge_request(uri="https://www.globaleaks.org/public",
+                                                  headers={'If-None-Match': 'W/"antani", ' + etag}))
+        self.assertEqual(request.responseCode, 304)
+        self.assertEqual(''.join(request.written), '')
+        self.assertEqual(GLApiCache.not_modified, not_modified + 1)
+
+        request = yield self.render(forge_request(uri="https://www.globaleaks.org/public",
+                                                  headers={'If-None-Match': '"antani"'}))
+        self.assertEqual(request.responseCode, 200)
+        self.assertNotEqual(''.join(request.written), '')
+
+
+class TestRouter(TestGL):
+    paths = [
+        '/',
+        '/index.html',
+        '/js/scripts.min.js',
+        '/data/favicon.ico',
+        '/l10n/en',
+        '/l10n/xx',
+        '/public',
+        '/publicx',
+        '/token',
+        '/token/' + 'a' * 42,
+        '/submission/' + 'a' * 42 + '/file',
+        '/rtip/00000000-0000-0000-0000-000000000000',
+        '/rtip/00000000-0000-0000-0000-000000000000/comments',
+        '/rtip/rfile/00000000-0000-0000-0000-000000000000',
+        '/rtip/operations',
+        '/wbtip',
+        '/wbtip/comments',
+        '/s/antani',
+        '/s/',
+        '/admin/users/00000000-0000-0000-0000-000000000000/img',
+        '/admin/staticfiles',
+        '/admin/staticfiles/antani.txt',
+        '/admin/stats/1',
+        '/admin/antani',
+        '/.well-known/acme-challenge/' + 'a' * 43,
+        '/robots.txt',
+        '/antani$',
+    ]
+
+    def test_router_first_match_semantic(self):
+        from globaleaks.rest import api
+        from globaleaks.rest.router import Router
+
+        registry = []
+        for tup in api.api_spec:
+            pattern = tup[0]
+            if not pattern.startswith("^"):
+                pattern = "^" + pattern
+
+            if not pattern.endswith("$"):
+                pattern += "$"
+
+            registry.append((re.compile(pattern), tup[1]))
+
+        router = Router(api.api_spec)
+
+        for path in self.paths:
+            expected = None
+            for regexp, handler in registry:
+                match = regexp.match(path)
+                if match:
+                    expected = (handler, match.groups())
+                    break
+
+            match = router.match(path)
+            if match is not None:
+                match = (match[0], match[2])
+
+            self.assertEqual(match, expected)
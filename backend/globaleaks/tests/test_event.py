@@ -0,0 +1,39 @@
+# -*- encoding: utf-8 -*-
+from twisted.trial import unittest
+
+from globaleaks.event import EventCounter, EventCountersClass
+
+
+class TestEventCounter(unittest.TestCase):
+    def test_ring_buffer(self):
+        counter = EventCounter(60)
+
+        for second in range(120):
+            counter.add(1.0, 1000 + second)
+
+        # only the latest minute is kept
+        self.assertEqual(counter.count(3600, 1119), 60)
+        self.assertEqual(counter.count(10, 1119), 10)
+
+        # the slots of the past seconds are not counted
+        self.assertEqual(counter.count(60, 1200), 0)
+
+        counter.clear()
+        self.assertEqual(counter.count(60, 1119), 0)
+
+
+class TestEventCounters(unittest.TestCase):
+    def test_event_matrix_and_timing(self):
+        counters = EventCountersClass()
+
+        counters.add('failed_logins', 0.5, now=1000.1)
+        counters.add('failed_logins', 1.5, now=1000.9)
+        counters.add('files', 3.0, now=1030)
+        counters.add('files', 0.1, now=900)
+
+        self.assertEqual(counters.get_event_matrix(60, now=1030), {'failed_logins': 2, 'files': 1})
+        self.assertEqual(counters.get_request_timing(60, now=1030), (3, 0.5, 3.0))
+
+        snapshot = counters.take_snapshot(60, now=1030)
+        self.assertEqual([(e['id'], e['event'], e['count'], e['duration']) for e in snapshot],
+                         [(1, 'failed_logins', 2, 1.0), (2, 'files', 1, 3.0)])
@@ -119,6 +119,13 @@ class TestMigrationRoutines(unittest.TestCase):
         self.assertEqual(saved_key, pk)
         store.close()
 
+    def postconditions_37(self):
+        new_uri = GLSettings.make_db_uri(os.path.join(GLSettings.db_path, GLSettings.db_file_name))
+        store = Store(create_database(new_uri))
+        indexes = store.execute("SELECT name FROM sqlite_master WHERE type = 'index'").get_all()
+        self.assertIn((u'whistleblowertip__receipt_hash_index',), indexes)
+        store.close()
+
 
 def test(path, version):
     return lambda self: self._test(path, version)
@@ -1,7 +1,7 @@
 from twisted.internet.defer import inlineCallbacks
 
 from globaleaks.models import *
-from globaleaks.orm import get_store
+from globaleaks.orm import get_store, store_pool, transact_ro
 from globaleaks.tests import helpers
 from globaleaks.utils.utility import datetime_null
 
@@ -19,6 +19,11 @@ class TestORM(helpers.TestGL):
         self.assertEqual(store.execute("PRAGMA foreign_keys").get_one()[0], 1)  # ON
         self.assertEqual(store.execute("PRAGMA secure_delete").get_one()[0], 1) # ON
         self.assertEqual(store.execute("PRAGMA auto_vacuum").get_one()[0], 1)   # FULL
+        self.assertEqual(store.execute("PRAGMA journal_mode").get_one()[0], u'wal')
+
+    @transact_ro
+    def _transaction_ro_pragmas(self, store):
+        self.assertEqual(store.execute("PRAGMA query_only").get_one()[0], 1) # ON
 
     def db_add_receiver(self, store):
         r = self.localization_set(self.dummyReceiver_1, Receiver, 'en')
@@ -53,9 +58,21 @@ class TestORM(helpers.TestGL):
         self.db_add_receiver(store)
         raise Exception("antani")
 
+    @transact
+    def _transact_get_store(self, store):
+        return store
+
+    @transact_ro
+    def _transact_ro_with_write(self, store):
+        self.db_add_receiver(store)
+        store.flush()
+
     def test_transaction_pragmas(self):
         return self._transaction_pragmas()
 
+    def test_transaction_ro_pragmas(self):
+        return self._transaction_ro_pragmas()
+
     @inlineCallbacks
     def test_transact_with_stuff(self):
         yield self._transact_with_success()
@@ -83,3 +100,36 @@ class TestORM(helpers.TestGL):
             self.assertTrue(getattr(store, 'find'))
 
         yield transaction()
+
+    @inlineCallbacks
+    def test_transact_ro_with_write(self):
+        store = get_store()
+        count1 = store.find(Receiver).count()
+
+        yield self.assertFailure(self._transact_ro_with_write(), Exception)
+
+        store = get_store()
+        count2 = store.find(Receiver).count()
+
+        self.assertEqual(count1, count2)
+
+    @inlineCallbacks
+    def test_transact_reuses_pooled_store(self):
+        store1 = yield self._transact_get_store()
+        store2 = yield self._transact_get_store()
+
+        self.assertIs(store1, store2)
+
+    @inlineCallbacks
+    def test_transaction_with_exception_recycles_store(self):
+        store1 = yield self._transact_get_store()
+        count = store_pool.count()
+
+        yield self.assertFailure(self._transact_with_exception(), Exception)
+
+        self.assertEqual(store_pool.count(), count - 1)
+
+        store2 = yield self._transact_get_store()
+
+        self.assertIsNot(store1, store2)
+        self.assertEqual(store_pool.count(), count)
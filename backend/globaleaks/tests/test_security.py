@@ -1,14 +1,21 @@
+import base64
 import binascii
+import json
 import os
 
 import scrypt
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from datetime import datetime
+from twisted.internet.defer import inlineCallbacks
 from twisted.trial import unittest
 
+from globaleaks import security
 from globaleaks.rest import errors
 from globaleaks.security import generateRandomSalt, hash_password, check_password, change_password, \
     directory_traversal_check, GLSecureTemporaryFile, GLSecureFile, \
-    GLBPGP
+    GLBPGP, PGPKeyringCache, AESChunkedCipher, convert_legacy_secure_files, crypto_backend, \
+    overwrite_and_remove, KDFPool
 from globaleaks.settings import GLSettings
 from globaleaks.tests import helpers
 
@@ -65,6 +72,30 @@ class TestPasswordManagement(unittest.TestCase):
                           dummy_salt_input)
 
 
+class TestKDFPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = KDFPool(1)
+
+    def tearDown(self):
+        self.pool.stop()
+
+    @inlineCallbacks
+    def test_hash_password(self):
+        dummy_salt = generateRandomSalt()
+
+        hashed = yield self.pool.run(hash_password, helpers.VALID_PASSWORD1, dummy_salt)
+        self.assertEqual(hashed, hash_password(helpers.VALID_PASSWORD1, dummy_salt))
+
+        valid = yield self.pool.run(check_password, helpers.VALID_PASSWORD1, dummy_salt, hashed)
+        self.assertTrue(valid)
+
+        valid = yield self.pool.run(check_password, helpers.INVALID_PASSWORD, dummy_salt, hashed)
+        self.assertFalse(valid)
+
+    def test_exception(self):
+        return self.assertFailure(self.pool.run(hash_password, helpers.VALID_PASSWORD1, None), Exception)
+
+
 class TestFilesystemAccess(helpers.TestGL):
     def test_directory_traversal_failure_on_relative_trusted_path_must_fail(self):
         self.assertRaises(Exception, directory_traversal_check, 'invalid/relative/trusted/path', "valid.txt")
@@ -117,6 +148,156 @@ class TestGLSecureFiles(helpers.TestGL):
         self.assertRaises(IOError, GLSecureFile, a.filepath)
         a.close()
 
+    def write_secure_file(self, data):
+        a = GLSecureTemporaryFile(GLSettings.submission_path)
+        a.avoid_delete()
+        a.write(data)
+        a.close()
+        return a.filepath
+
+    def write_legacy_secure_file(self, data):
+        key_id = 'a' * 16
+        key = os.urandom(GLSettings.AES_key_size)
+        key_counter_nonce = os.urandom(GLSettings.AES_counter_nonce)
+
+        with open(os.path.join(GLSettings.ramdisk_path, GLSettings.AES_keyfile_prefix + key_id), 'w') as kf:
+            json.dump({'key': base64.b64encode(key),
+                       'key_counter_nonce': base64.b64encode(key_counter_nonce)}, kf)
+
+        encryptor = Cipher(algorithms.AES(key), modes.CTR(key_counter_nonce), backend=crypto_backend).encryptor()
+
+        filepath = os.path.join(GLSettings.submission_path, '%s.aes' % key_id)
+        with open(filepath, 'wb') as f:
+            f.write(encryptor.update(data) + encryptor.finalize())
+
+        return filepath
+
+    def test_chunked_file_sizes(self):
+        for size in [0, 1, GLSettings.AES_chunk_size - 1, GLSettings.AES_chunk_size,
+                     GLSettings.AES_chunk_size + 1, 3 * GLSettings.AES_chunk_size]:
+            antani = os.urandom(size)
+
+            with GLSecureFile(self.write_secure_file(antani)) as b:
+                self.assertTrue(b.chunked)
+                self.assertEqual(b.plaintext_size(), size)
+                self.assertEqual(b.read(), antani)
+
+    def test_chunked_file_random_access(self):
+        antani = os.urandom(3 * GLSettings.AES_chunk_size + 1000)
+
+        with GLSecureFile(self.write_secure_file(antani)) as b:
+            for offset in [GLSettings.AES_chunk_size + 10, 10, len(antani) - 10, len(antani)]:
+                b.seek(offset)
+                self.assertEqual(b.read(GLSettings.AES_chunk_size), antani[offset:offset + GLSettings.AES_chunk_size])
+
+    def test_chunked_file_tampering(self):
+        antani = os.urandom(3 * GLSettings.AES_chunk_size)
+        filepath = self.write_secure_file(antani)
+
+        with open(filepath, 'r+b') as f:
+            f.seek(AESChunkedCipher.header.size + GLSettings.AES_chunk_size + 100)
+            f.write('\0')
+
+        with GLSecureFile(filepath) as b:
+            self.assertEqual(b.read(GLSettings.AES_chunk_size), antani[:GLSettings.AES_chunk_size])
+            self.assertRaises(InvalidTag, b.read)
+
+        # the truncation of the file at the end of a chunk is detected
+        filepath = self.write_secure_file(antani)
+        with open(filepath, 'r+b') as f:
+            f.truncate(AESChunkedCipher.header.size + 2 * (GLSettings.AES_chunk_size + AESChunkedCipher.tag_size))
+
+        with GLSecureFile(filepath) as b:
+            self.assertRaises(InvalidTag, b.read)
+
+    def test_legacy_file(self):
+        antani = os.urandom(2 * GLSettings.AES_chunk_size + 1000)
+        filepath = self.write_legacy_secure_file(antani)
+
+        with GLSecureFile(filepath) as b:
+            self.assertFalse(b.chunked)
+            self.assertEqual(b.read(), antani)
+
+            b.seek(GLSettings.AES_chunk_size + 5)
+            self.assertEqual(b.read(100), antani[GLSettings.AES_chunk_size + 5:GLSettings.AES_chunk_size + 105])
+
+        convert_legacy_secure_files(GLSettings.submission_path)
+
+        with GLSecureFile(filepath) as b:
+            self.assertTrue(b.chunked)
+            self.assertEqual(b.read(), antani)
+
+    def test_legacy_file_removed_during_conversion(self):
+        filepath = self.write_legacy_secure_file(os.urandom(2 * GLSettings.AES_chunk_size))
+
+        with GLSecureFile(filepath) as b:
+            os.remove(filepath)
+            b.convert()
+
+        self.assertFalse(os.path.exists(filepath))
+        self.assertFalse(os.path.exists(filepath + '.tmp'))
+
+    def test_legacy_file_failed_conversion(self):
+        antani = os.urandom(2 * GLSettings.AES_chunk_size)
+        filepath = self.write_legacy_secure_file(antani)
+
+        def failing_encrypt_chunk(*args, **kwargs):
+            raise IOError('No space left on device')
+
+        self.patch(AESChunkedCipher, 'encrypt_chunk', failing_encrypt_chunk)
+
+        convert_legacy_secure_files(GLSettings.submission_path)
+
+        self.assertFalse(os.path.exists(filepath + '.tmp'))
+
+        with GLSecureFile(filepath) as b:
+            self.assertFalse(b.chunked)
+            self.assertEqual(b.read(), antani)
+
+
+class TestSecureDeletion(helpers.TestGL):
+    def test_overwrite_and_remove(self):
+        filesize = int(2.5 * GLSettings.secure_delete_buffer_size)
+        filepath = os.path.join(GLSettings.submission_path, 'antani')
+        with open(filepath, 'wb') as f:
+            f.write(os.urandom(filesize))
+
+        passes = []
+
+        _overwrite = security._overwrite
+
+        def overwrite(fd, size, pattern):
+            _overwrite(fd, size, pattern)
+
+            with open(filepath, 'rb') as f:
+                passes.append(f.read())
+
+        security._overwrite = overwrite
+
+        try:
+            overwrite_and_remove(filepath)
+        finally:
+            security._overwrite = _overwrite
+
+        self.assertFalse(os.path.exists(filepath))
+        self.assertTrue(len(passes) in [3, 6])
+
+        for i, data in enumerate(passes):
+            self.assertEqual(len(data), filesize)
+
+            if i % 3 == 0:
+                self.assertEqual(data, b'\x00' * filesize)
+            elif i % 3 == 1:
+                self.assertEqual(data, b'\xff' * filesize)
+
+    def test_overwrite_and_remove_empty_file(self):
+        filepath = os.path.join(GLSettings.submission_path, 'antani')
+        open(filepath, 'wb').close()
+
+        overwrite_and_remove(filepath)
+
+        self.assertFalse(os.path.exists(filepath))
+
 
 class TestPGP(helpers.TestGL):
     secret_content = helpers.PGPKEYS['VALID_PGP_KEY1_PRV']
@@ -173,3 +354,44 @@ class TestPGP(helpers.TestGL):
                          datetime.utcfromtimestamp(1391012793))
 
         pgpobj.destroy_environment()
+
+
+class TestPGPKeyringCache(helpers.TestGL):
+    def test_keyring_is_reused(self):
+        keyrings = PGPKeyringCache()
+
+        gpob = keyrings.get(helpers.PGPKEYS['VALID_PGP_KEY1_PUB'])
+        self.assertEqual(gpob.key['fingerprint'], u'BFB3C82D1B5F6A94BDAC55C6E70460ABF9A4C8C1')
+        self.assertIs(keyrings.get(helpers.PGPKEYS['VALID_PGP_KEY1_PUB']), gpob)
+
+        encrypted_body = gpob.encrypt_message(gpob.key['fingerprint'], 'antani')
+        self.assertTrue(encrypted_body.startswith('-----BEGIN PGP MESSAGE-----'))
+
+        keyrings.invalidate(gpob.key['fingerprint'])
+        self.assertFalse(os.path.exists(gpob.gnupg.gnupghome))
+        self.assertIsNot(keyrings.get(helpers.PGPKEYS['VALID_PGP_KEY1_PUB']), gpob)
+
+        keyrings.clear()
+        self.assertEqual(keyrings.keyrings, {})
+
+    def test_keyring_is_rebuilt_on_key_change(self):
+        keyrings = PGPKeyringCache()
+
+        # the private key export has the same fingerprint of the public one
+        gpob1 = keyrings.get(helpers.PGPKEYS['VALID_PGP_KEY1_PUB'])
+        gpob2 = keyrings.get(helpers.PGPKEYS['VALID_PGP_KEY1_PRV'])
+
+        self.assertEqual(gpob1.key['fingerprint'], gpob2.key['fingerprint'])
+        self.assertIsNot(gpob1, gpob2)
+        self.assertFalse(os.path.exists(gpob1.gnupg.gnupghome))
+        self.assertEqual(len(keyrings.keyrings), 1)
+        self.assertEqual(len(keyrings.fingerprints), 1)
+
+        keyrings.clear()
+
+    def test_invalid_key(self):
+        keyrings = PGPKeyringCache()
+        environments = os.listdir(GLSettings.pgproot)
+
+        self.assertRaises(errors.PGPKeyInvalid, keyrings.get, u'antani')
+        self.assertEqual(os.listdir(GLSettings.pgproot), environments)
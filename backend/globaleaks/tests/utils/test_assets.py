@@ -0,0 +1,51 @@
+# -*- encoding: utf-8 -*-
+import gzip
+import os
+import StringIO
+
+from globaleaks.settings import GLSettings
+from globaleaks.tests import helpers
+from globaleaks.utils.assets import AssetCache, AssetManifest, gzip_compress
+
+
+class TestAssetCache(helpers.TestGL):
+    def test_lru(self):
+        cache = AssetCache(10)
+
+        cache.set('a', ('aaaa', None))
+        cache.set('b', ('bb', 'bb'))
+        self.assertEqual(cache.get('a'), ('aaaa', None))
+
+        # 'b' is the least recently used entry
+        cache.set('c', ('cccc', None))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.size, 8)
+
+        # entries bigger than the cache are not stored
+        cache.set('d', ('d' * 11, None))
+        self.assertIsNone(cache.get('d'))
+        self.assertEqual(cache.keys(), ['a', 'c'])
+
+
+class TestAssetManifest(helpers.TestGL):
+    def test_manifest(self):
+        manifest = AssetManifest(GLSettings.client_path, GLSettings.client_assets_cache_size).build()
+
+        asset = manifest.get('js/app.js')
+        self.assertTrue(asset.compressible)
+
+        with open(os.path.join(GLSettings.client_path, 'js/app.js')) as f:
+            data = f.read()
+
+        # the index references the files with the hashes of their content
+        index, _ = manifest.load(manifest.get('index.html'))
+        self.assertIn('src="js/app.js?v=%s"' % asset.hash, index)
+
+        # the files referenced by the index are loaded at startup
+        self.assertIn('js/app.js', manifest.cache)
+        plain, compressed = manifest.load(asset)
+        self.assertEqual(plain, data)
+        self.assertEqual(gzip.GzipFile(fileobj=StringIO.StringIO(compressed)).read(), data)
+
+    def test_gzip_compress(self):
+        self.assertEqual(gzip_compress('antani' * 10), gzip_compress('antani' * 10))
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+import gzip
+import os
+import StringIO
+import tempfile
+
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks
+from twisted.trial import unittest
+from twisted.web.client import Agent, HTTPConnectionPool, readBody
+from twisted.web.http_headers import Headers
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+
+from globaleaks.utils.assets import gzip_compress
+from globaleaks.utils.httpsproxy import HTTPStreamFactory
+
+
+def gunzip(data):
+    return gzip.GzipFile(fileobj=StringIO.StringIO(data)).read()
+
+
+class EchoResource(Resource):
+    isLeaf = True
+
+    def render(self, request):
+        request.setHeader('X-Connection', request.getHeader('Connection') or '')
+        return request.getHeader('GL-Forwarded-For') + request.content.read()
+
+
+class GzipResource(Resource):
+    isLeaf = True
+
+    def render(self, request):
+        request.setHeader('Content-Encoding', 'gzip')
+        return gzip_compress('antani' * 100)
+
+
+class RangeResource(Resource):
+    isLeaf = True
+
+    data = 'antani' * 100
+
+    def render(self, request):
+        request.setHeader('Content-Disposition', 'attachment; filename="antani.txt"')
+
+        if request.getHeader('Range') is None:
+            return self.data
+
+        request.setResponseCode(206)
+        request.setHeader('Content-Range', 'bytes 100-199/%d' % len(self.data))
+        return self.data[100:200]
+
+
+class BackendResource(Resource):
+    def getChild(self, path, request):
+        if path == 'gzip':
+            return GzipResource()
+
+        if path == 'range':
+            return RangeResource()
+
+        return EchoResource()
+
+
+class TestHTTPStreamProxy(unittest.TestCase):
+    def listen_backend(self):
+        self.backend_port = reactor.listenTCP(0, Site(BackendResource()), interface='127.0.0.1')
+
+        proxy_url = 'http://127.0.0.1:%d' % self.backend_port.getHost().port
+        return HTTPStreamFactory(proxy_url)
+
+    def setUp(self):
+        self.proxy_factory = self.listen_backend()
+        self.proxy_port = reactor.listenTCP(0, self.proxy_factory, interface='127.0.0.1')
+
+        self.client_pool = HTTPConnectionPool(reactor, persistent=False)
+        self.client = Agent(reactor, pool=self.client_pool)
+
+    @inlineCallbacks
+    def tearDown(self):
+        yield self.client_pool.closeCachedConnections()
+        yield self.proxy_port.stopListening()
+        yield self.backend_port.stopListening()
+
+    @inlineCallbacks
+    def test_backend_connections_are_reused(self):
+        url = 'http://127.0.0.1:%d/' % self.proxy_port.getHost().port
+
+        for _ in range(3):
+            response = yield self.client.request('GET', url)
+            body = yield readBody(response)
+
+            self.assertEqual(response.code, 200)
+            self.assertEqual(body, '127.0.0.1')
+
+            # the hop-by-hop headers of the client are not forwarded
+            self.assertEqual(response.headers.getRawHeaders('X-Connection'), [''])
+
+        stats = self.proxy_factory.pool.get_stats()
+        self.assertEqual(stats['requests'], 3)
+        self.assertEqual(stats['connections'], 1)
+        self.assertEqual(stats['reused'], 2)
+        self.assertEqual(stats['idle'], 1)
+
+    @inlineCallbacks
+    def test_gzip(self):
+        url = 'http://127.0.0.1:%d/' % self.proxy_port.getHost().port
+        headers = Headers({'Accept-Encoding': ['gzip']})
+
+        response = yield self.client.request('GET', url, headers)
+        body = yield readBody(response)
+        self.assertEqual(response.headers.getRawHeaders('Content-Encoding'), ['gzip'])
+        self.assertEqual(gunzip(body), '127.0.0.1')
+
+        # the body already encoded by the backend is not gzipped twice
+        response = yield self.client.request('GET', url + 'gzip', headers)
+        body = yield readBody(response)
+        self.assertEqual(response.headers.getRawHeaders('Content-Encoding'), ['gzip'])
+        self.assertEqual(gunzip(body), 'antani' * 100)
+
+
+    @inlineCallbacks
+    def test_range(self):
+        url = 'http://127.0.0.1:%d/range' % self.proxy_port.getHost().port
+
+        # the downloads and the partial responses are forwarded byte-exact
+        response = yield self.client.request('GET', url, Headers({'Accept-Encoding': ['gzip']}))
+        body = yield readBody(response)
+        self.assertIsNone(response.headers.getRawHeaders('Content-Encoding'))
+        self.assertEqual(body, RangeResource.data)
+
+        response = yield self.client.request('GET', url, Headers({'Accept-Encoding': ['gzip'],
+                                                                  'Range': ['bytes=100-199']}))
+        body = yield readBody(response)
+        self.assertEqual(response.code, 206)
+        self.assertIsNone(response.headers.getRawHeaders('Content-Encoding'))
+        self.assertEqual(response.headers.getRawHeaders('Content-Range'), ['bytes 100-199/600'])
+        self.assertEqual(body, RangeResource.data[100:200])
+
+
+class TestHTTPStreamProxyUNIX(TestHTTPStreamProxy):
+    def listen_backend(self):
+        path = os.path.join(tempfile.mkdtemp(), 'backend.sock')
+        self.backend_port = reactor.listenUNIX(path, Site(BackendResource()), mode=0600)
+
+        return HTTPStreamFactory('http://127.0.0.1:8082', path)
@@ -0,0 +1,163 @@
+from StringIO import StringIO
+
+from twisted.internet import defer, reactor
+from twisted.internet.endpoints import TCP4ClientEndpoint
+from twisted.mail import smtp
+from twisted.trial import unittest
+from zope.interface import implementer
+
+from globaleaks.settings import GLSettings
+from globaleaks.utils.mailutils import SMTPClientPool, SMTPSession, SMTPSessionFactory
+
+
+@implementer(smtp.IMessage)
+class Message(object):
+    def __init__(self, server, address):
+        self.server = server
+        self.address = address
+        self.lines = []
+
+    def lineReceived(self, line):
+        self.lines.append(line)
+
+    def eomReceived(self):
+        self.server.messages.append((self.address, '\n'.join(self.lines)))
+        return defer.succeed(None)
+
+    def connectionLost(self):
+        pass
+
+
+@implementer(smtp.IMessageDelivery)
+class MessageDelivery(object):
+    def __init__(self, server):
+        self.server = server
+
+    def receivedHeader(self, helo, origin, recipients):
+        return None
+
+    def validateFrom(self, helo, origin):
+        return origin
+
+    def validateTo(self, user):
+        address = str(user.dest)
+        if address in self.server.refused:
+            raise smtp.SMTPBadRcpt(user)
+
+        return lambda: Message(self.server, address)
+
+
+class ESMTPServer(smtp.ESMTP):
+    def connectionMade(self):
+        self.factory.connections += 1
+        self.closed = defer.Deferred()
+        self.factory.closed.append(self.closed)
+        self.delivery = MessageDelivery(self.factory)
+        smtp.ESMTP.connectionMade(self)
+
+    def connectionLost(self, reason):
+        smtp.ESMTP.connectionLost(self, reason)
+        self.closed.callback(None)
+
+
+class SMTPServerFactory(smtp.SMTPFactory):
+    protocol = ESMTPServer
+
+    def __init__(self):
+        smtp.SMTPFactory.__init__(self)
+        self.connections = 0
+        self.messages = []
+        self.refused = set()
+        self.closed = []
+
+
+class LocalSMTPSession(SMTPSession):
+    def connectionMade(self):
+        self.closed = defer.Deferred()
+        self.factory.pool.closed.append(self.closed)
+        SMTPSession.connectionMade(self)
+
+    def connectionLost(self, reason=None):
+        SMTPSession.connectionLost(self, reason)
+        self.closed.callback(None)
+
+
+class LocalSMTPSessionFactory(SMTPSessionFactory):
+    protocol = LocalSMTPSession
+
+
+class LocalSMTPClientPool(SMTPClientPool):
+    def __init__(self, port):
+        SMTPClientPool.__init__(self)
+        self.port = port
+        self.closed = []
+
+    def build_factory(self, deferred):
+        return LocalSMTPSessionFactory(self, deferred, 'username', 'password', 'sender@example.net',
+                                       requireAuthentication=False,
+                                       requireTransportSecurity=False)
+
+    def connect(self, factory):
+        return TCP4ClientEndpoint(reactor, '127.0.0.1', self.port).connect(factory)
+
+
+class TestSMTPClientPool(unittest.TestCase):
+    def setUp(self):
+        self.mail_connections = GLSettings.mail_connections
+
+        self.server = SMTPServerFactory()
+        self.port = reactor.listenTCP(0, self.server, interface='127.0.0.1')
+        self.pool = LocalSMTPClientPool(self.port.getHost().port)
+
+    @defer.inlineCallbacks
+    def tearDown(self):
+        GLSettings.mail_connections = self.mail_connections
+
+        # the sessions are closed after the delivery of the last mail
+        yield defer.gatherResults(self.pool.closed + self.server.closed)
+        yield self.port.stopListening()
+
+        self.assertEqual(self.pool.sessions, 0)
+
+    def sendmails(self, n):
+        return [self.pool.sendmail('receiver%d@example.net' % i, StringIO('Subject: test %d\n\nbody' % i)) for i in range(n)]
+
+    @defer.inlineCallbacks
+    def test_sessions_are_reused(self):
+        GLSettings.mail_connections = 2
+
+        yield defer.gatherResults(self.sendmails(10))
+
+        self.assertEqual(len(self.server.messages), 10)
+        self.assertEqual(self.server.connections, 2)
+
+    @defer.inlineCallbacks
+    def test_mails_per_session(self):
+        GLSettings.mail_connections = 1
+        self.pool.mails_per_session = 3
+
+        yield defer.gatherResults(self.sendmails(7))
+
+        self.assertEqual(len(self.server.messages), 7)
+        self.assertEqual(self.server.connections, 3)
+
+    @defer.inlineCallbacks
+    def test_per_mail_results(self):
+        GLSettings.mail_connections = 1
+        self.server.refused.add('receiver1@example.net')
+
+        results = yield defer.DeferredList(self.sendmails(3), consumeErrors=True)
+
+        self.assertEqual([success for success, _ in results], [True, False, True])
+        self.assertTrue(results[1][1].check(smtp.SMTPDeliveryError))
+        self.assertEqual(len(self.server.messages), 2)
+        self.assertEqual(self.server.connections, 1)
+
+    @defer.inlineCallbacks
+    def test_connection_failure(self):
+        yield self.port.stopListening()
+
+        results = yield defer.DeferredList(self.sendmails(5), consumeErrors=True)
+
+        self.assertFalse(any(success for success, _ in results))
+        self.assertEqual(len(self.pool.queue), 0)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+from twisted.web.http import Request
+from twisted.web.test.test_web import DummyChannel
+
+from globaleaks.mocks import twisted_mocks
+from globaleaks.security import GLSecureTemporaryFile
+from globaleaks.tests import helpers
+from globaleaks.utils.multipart import MultipartError, MultipartUploadParser, \
+    get_multipart_boundary
+
+BOUNDARY = '----WebKitFormBoundaryx8Kz1d0zqQ5NyH2C'
+
+
+def build_body(fields, filename, content):
+    body = ''
+    for name, value in fields:
+        body += '--%s\r\n' % BOUNDARY
+        body += 'Content-Disposition: form-data; name="%s"\r\n\r\n' % name
+        body += '%s\r\n' % value
+
+    body += '--%s\r\n' % BOUNDARY
+    body += 'Content-Disposition: form-data; name="file"; filename="%s"\r\n' % filename
+    body += 'Content-Type: application/octet-stream\r\n\r\n'
+    body += content
+    body += '\r\n--%s--\r\n' % BOUNDARY
+
+    return body
+
+
+class TestMultipartUploadParser(helpers.TestGL):
+    fields = [
+        ('flowChunkNumber', '1'),
+        ('flowTotalChunks', '1'),
+        ('flowIdentifier', '1337-antani'),
+        ('flowFilename', 'antani.txt'),
+    ]
+
+    content = ''.join(chr(i % 256) for i in range(100000)) + '\r\n--' + BOUNDARY[:10]
+
+    def read_file(self, f):
+        data = ''
+        chunk = f.read(1000)
+        while chunk != '':
+            data += chunk
+            chunk = f.read(1000)
+
+        return data
+
+    def test_get_multipart_boundary(self):
+        self.assertEqual(get_multipart_boundary('multipart/form-data; boundary=%s' % BOUNDARY), BOUNDARY)
+        self.assertEqual(get_multipart_boundary('application/json'), None)
+        self.assertEqual(get_multipart_boundary(None), None)
+
+    def test_parse(self):
+        body = build_body(self.fields, 'antani.txt', self.content)
+
+        for chunk_size in [1, 7, 1000, len(body)]:
+            parser = MultipartUploadParser(BOUNDARY)
+
+            for i in range(0, len(body), chunk_size):
+                parser.write(body[i:i + chunk_size])
+
+            parser.finalize()
+
+            for name, value in self.fields:
+                self.assertEqual(parser.args[name], [value])
+
+            f = parser.args['file'][0]
+            self.assertTrue(isinstance(f, GLSecureTemporaryFile))
+            self.assertEqual(f.size, len(self.content))
+            self.assertEqual(self.read_file(f), self.content)
+            f.close()
+
+    def test_parse_truncated_body(self):
+        body = build_body(self.fields, 'antani.txt', self.content)
+
+        parser = MultipartUploadParser(BOUNDARY)
+        parser.write(body[:-100])
+
+        self.assertRaises(MultipartError, parser.finalize)
+        self.assertEqual(parser.args, {})
+
+    def test_parse_field_too_long(self):
+        body = build_body([('description', 'a' * (MultipartUploadParser.max_field_size + 1))], 'antani.txt', '')
+
+        parser = MultipartUploadParser(BOUNDARY)
+        parser.write(body)
+
+        self.assertRaises(MultipartError, parser.finalize)
+
+    def test_parse_file_too_big(self):
+        body = build_body(self.fields, 'antani.txt', self.content)
+
+        parser = MultipartUploadParser(BOUNDARY, 1000)
+        parser.write(body)
+        parser.finalize()
+
+        f = parser.args['file'][0]
+        self.assertEqual(f.size, len(self.content))
+        self.assertEqual(self.read_file(f), '')
+        f.close()
+
+    def test_request_streaming(self):
+        body = build_body(self.fields, 'antani.txt', self.content)
+
+        request = Request(DummyChannel(), False)
+        request.requestHeaders.setRawHeaders(b'content-type',
+                                             [b'multipart/form-data; boundary=%s' % BOUNDARY])
+        request.process = lambda: None
+
+        request.gotLength(len(body))
+        self.assertTrue(isinstance(request.content, MultipartUploadParser))
+
+        for i in range(0, len(body), 4096):
+            request.handleContentChunk(body[i:i + 4096])
+
+        request.requestReceived(b'POST', b'/wbtip/rfile?antani=1', b'HTTP/1.1')
+
+        self.assertEqual(request.path, b'/wbtip/rfile')
+        self.assertEqual(request.args['antani'], ['1'])
+        self.assertEqual(request.args['flowIdentifier'], ['1337-antani'])
+        self.assertEqual(self.read_file(request.args['file'][0]), self.content)
+        request.args['file'][0].close()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import string
+
+from twisted.trial import unittest
+
+from globaleaks.utils import securerandom
+
+
+class TestSecureRandom(unittest.TestCase):
+    def test_randbytes(self):
+        self.assertEqual(len(securerandom.randbytes(0)), 0)
+        self.assertEqual(len(securerandom.randbytes(16)), 16)
+        self.assertEqual(len(securerandom.randbytes(2 * securerandom.SecureRandom.buffer_size)),
+                         2 * securerandom.SecureRandom.buffer_size)
+
+        self.assertNotEqual(securerandom.randbytes(16), securerandom.randbytes(16))
+
+    def test_buffer_refill(self):
+        generator = securerandom.SecureRandom()
+
+        data = [generator.bytes(1000) for _ in range(10)]
+        self.assertEqual(len(set(data)), 10)
+
+        # the buffer is not reused after a fork
+        generator.pid = -1
+        offset = generator.offset
+        generator.bytes(1)
+        self.assertTrue(generator.offset < offset)
+
+    def test_randbelow(self):
+        self.assertEqual(securerandom.randbelow(1), 0)
+        self.assertRaises(ValueError, securerandom.randbelow, 0)
+
+        for n in [2, 3, 100, 257, 2 ** 40 + 1]:
+            for _ in range(100):
+                self.assertTrue(0 <= securerandom.randbelow(n) < n)
+
+    def test_randbelow_covers_the_range(self):
+        self.assertEqual(set(securerandom.randbelow(6) for _ in range(1000)), set(range(6)))
+
+    def test_randint(self):
+        self.assertEqual(securerandom.randint(9, 9), 9)
+        self.assertEqual(set(securerandom.randint(1, 3) for _ in range(1000)), {1, 2, 3})
+
+    def test_shuffle(self):
+        ordered = range(100)
+        shuffled = securerandom.shuffle(list(ordered))
+        self.assertEqual(sorted(shuffled), ordered)
+        self.assertNotEqual(shuffled, ordered)
+
+    def test_randstring(self):
+        self.assertEqual(securerandom.randstring(0, string.digits), '')
+
+        for n in [1, 16, 42, 10000]:
+            s = securerandom.randstring(n, string.ascii_letters + string.digits)
+            self.assertEqual(len(s), n)
+            self.assertTrue(all(c in string.ascii_letters + string.digits for c in s))
+
+        self.assertEqual(set(securerandom.randstring(1000, 'ab')), {'a', 'b'})
+        self.assertRaises(ValueError, securerandom.randstring, 1, '')
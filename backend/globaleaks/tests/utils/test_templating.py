@@ -38,3 +38,31 @@ class notifTemplateTest(helpers.TestGLWithPopulatedDB):
             data['type'] = key
             template = ''.join(supported_template_types[key].keyword_list)
             Templating().format_template(template, data)
+
+    def test_nested_keywords_and_blank_lines(self):
+        data = {
+            'type': 'export_message',
+            'message': {'content': u'a%Content%'}
+        }
+
+        # the keywords in the values are resolved up to three times
+        self.assertEqual(Templating().format_template(u'%Content%', data), u'aaa%Content%')
+
+        data['message']['content'] = u'%Blank%'
+
+        self.assertEqual(Templating().format_template(u'x\n%Content%\n%Unknown%', data), u'x\n%Unknown%')
+
+    def test_compiled_templates_are_cached(self):
+        data = {
+            'type': 'export_message',
+            'message': {'content': u'content'}
+        }
+
+        template = u'begin %Content% end'
+
+        Templating.cache.clear()
+
+        for _ in range(2):
+            self.assertEqual(Templating().format_template(template, data), u'begin content end')
+
+        self.assertEqual(Templating.cache.values(), [[u'begin ', 'Content', u' end']])
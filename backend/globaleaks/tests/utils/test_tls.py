@@ -1,12 +1,13 @@
 import os
 
-from OpenSSL import crypto
+from OpenSSL import crypto, SSL
 from OpenSSL.crypto import load_certificate, FILETYPE_PEM
 from twisted.trial.unittest import TestCase
 
 from globaleaks.models.config import PrivateFactory, NodeFactory
 from globaleaks.orm import transact
 from globaleaks.utils import tls
+from globaleaks.utils.sni import SNIMap
 
 from globaleaks.tests import helpers
 
@@ -241,3 +242,72 @@ class TestObjectValidators(TestCase):
             if chain_path == 'invalid/cert_and_chain.pem':
                 self.assertEqual(self.valid_setup['cert'], chain[0])
                 self.assertEqual(self.valid_setup['chain'], chain[1])
+
+
+class TestTLSServerContextFactory(TestCase):
+    def setUp(self):
+        cfg = get_valid_setup()
+        self.factory = tls.TLSServerContextFactory(cfg['key'], cfg['cert'], cfg['chain'], cfg['dh_params'])
+
+    def handshake(self, session=None):
+        client = SSL.Connection(SSL.Context(SSL.SSLv23_METHOD), None)
+        client.set_connect_state()
+        if session is not None:
+            client.set_session(session)
+
+        server = SSL.Connection(self.factory.getContext(), None)
+        server.set_accept_state()
+
+        # shuffle the data between the two memory BIOs until the handshake
+        # completes and the session tickets are received by the client
+        for _ in range(10):
+            for conn in (client, server):
+                try:
+                    conn.do_handshake()
+                    conn.recv(1024)
+                except SSL.WantReadError:
+                    pass
+
+            for src, dst in ((client, server), (server, client)):
+                try:
+                    dst.bio_write(src.bio_read(65536))
+                except SSL.WantReadError:
+                    pass
+
+        # a session is resumable only if the connection was closed cleanly
+        for conn in (client, server):
+            conn.set_shutdown(SSL.SENT_SHUTDOWN | SSL.RECEIVED_SHUTDOWN)
+
+        return client.get_session()
+
+    def test_session_resumption(self):
+        session = self.handshake()
+        self.handshake(session)
+        self.assertEqual(self.factory.stats, {'handshakes': 2, 'resumptions': 1})
+
+        # the sessions are not resumed after the rotation of the keys
+        self.factory.rotate_session_keys()
+        self.handshake(session)
+        self.assertEqual(self.factory.stats, {'handshakes': 3, 'resumptions': 1})
+
+    def test_update(self):
+        cfg = get_valid_setup()
+        ctx = self.factory.getContext()
+
+        # unchanged material and a new certificate with the same intermediate
+        # are loaded without replacing the context and its session cache
+        self.factory.update(cfg['key'], cfg['cert'], cfg['chain'], cfg['dh_params'])
+        self.assertIs(self.factory.getContext(), ctx)
+
+        self.factory.update(cfg['key'], cfg['cert'], '', cfg['dh_params'])
+        self.assertIsNot(self.factory.getContext(), ctx)
+
+    def test_snimap_update(self):
+        cfg = get_valid_setup()
+        snimap = SNIMap({'DEFAULT': self.factory})
+        self.assertIs(snimap.context, self.factory.getContext())
+
+        factory = tls.TLSServerContextFactory(cfg['key'], cfg['cert'], cfg['chain'], cfg['dh_params'])
+        snimap.update({'DEFAULT': factory, 'www.globaleaks.org': self.factory})
+        self.assertIs(snimap.context, factory.getContext())
+        self.assertIs(snimap.mapping['www.globaleaks.org'], self.factory)
@@ -6,8 +6,10 @@ from zipfile import ZipFile
 
 from twisted.internet.defer import inlineCallbacks
 
+from globaleaks.settings import GLSettings
 from globaleaks.tests import helpers
-from globaleaks.utils.zipstream import ZipStream
+from globaleaks.utils import zipstream
+from globaleaks.utils.zipstream import ZipStream, ZIP_DEFLATED, ZIP_STORED
 
 class TestZipStream(helpers.TestGL):
     @inlineCallbacks
@@ -35,6 +37,59 @@ class TestZipStream(helpers.TestGL):
             self.assertTrue(len(infolist), 2)
             for ff in infolist:
                 if ff.filename == self.unicode_seq:
-                    self.assertTrue(ff.file_size == len(self.unicode_seq))
+                    self.assertTrue(ff.file_size == len(self.unicode_seq.encode('utf-8')))
                 else:
                     self.assertTrue(ff.file_size == os.stat(os.path.abspath(__file__)).st_size)
+
+    def test_zipstream_compression_per_entry(self):
+        random_file = os.path.join(GLSettings.tmp_upload_path, 'random.bin')
+        with open(random_file, 'wb') as f:
+            f.write(os.urandom(100000))
+
+        files = self.files + [
+          {'name': 'random.bin', 'path': random_file},
+          {'name': 'image.jpg', 'path': os.path.abspath(__file__), 'content_type': 'image/jpeg'}
+        ]
+
+        output = StringIO.StringIO()
+
+        for data in ZipStream(files):
+            output.write(data)
+
+        with ZipFile(output, 'r') as f:
+            self.assertIsNone(f.testzip())
+
+            compress_types = dict((ff.filename, ff.compress_type) for ff in f.infolist())
+            self.assertEqual(compress_types[__file__], ZIP_DEFLATED)
+            self.assertEqual(compress_types['random.bin'], ZIP_STORED)
+            self.assertEqual(compress_types['image.jpg'], ZIP_STORED)
+
+    def test_zipstream_size(self):
+        self.assertIsNone(ZipStream(self.files).size())
+
+        for files in [self.files[:1], self.files[1:]]:
+            zs = ZipStream(files, ZIP_STORED)
+            size = zs.size()
+            self.assertEqual(size, len(''.join(zs)))
+
+        files = self.files[:1] + [{'name': 'missing', 'path': '/antani'}]
+        zs = ZipStream(files)
+        size = zs.size()
+        self.assertEqual(size, len(''.join(zs)))
+
+    def test_zipstream_zip64(self):
+        self.patch(zipstream, 'ZIP64_LIMIT', 100)
+
+        output = StringIO.StringIO()
+
+        zs = ZipStream(self.files, ZIP_STORED)
+        size = zs.size()
+
+        for data in zs:
+            output.write(data)
+
+        self.assertEqual(size, len(output.getvalue()))
+
+        with ZipFile(output, 'r') as f:
+            self.assertIsNone(f.testzip())
+            self.assertEqual(f.read(__file__), open(os.path.abspath(__file__), 'rb').read())
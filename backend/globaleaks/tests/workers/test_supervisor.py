@@ -69,6 +69,33 @@ class TestProcessSupervisor(helpers.TestGL):
         self.assertFalse(p_s.is_running())
 
 
+class ControlledProcess(process.Process):
+    def __init__(self):
+        self.control_buf = ''
+        self.commands = []
+
+    def handle_reload_tls(self, msg):
+        self.commands.append(msg)
+
+
+class TestProcessControlChannel(helpers.TestGL):
+    def test_commands_are_dispatched(self):
+        p = ControlledProcess()
+
+        data = json.dumps({'command': 'reload_tls', 'cfg': {'ssl_cert': 'x' * 100000}}) + '\n'
+        data += json.dumps({'command': 'unknown'}) + '\n'
+        data += json.dumps({'command': 'reload_tls', 'cfg': {}}) + '\n'
+
+        # the data is received in arbitrary chunks
+        for i in range(0, len(data), 4096):
+            p.childDataReceived('control', data[i:i + 4096])
+
+        self.assertEqual(len(p.commands), 2)
+        self.assertEqual(len(p.commands[0]['cfg']['ssl_cert']), 100000)
+        self.assertEqual(p.commands[1]['cfg'], {})
+        self.assertEqual(p.control_buf, '')
+
+
 @transact
 def wrap_db_tx(store, f, *args, **kwargs):
     return f(store, *args, **kwargs)
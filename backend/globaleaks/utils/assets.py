@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+#
+# assets
+# ******
+#
+# Manifest of the files of the client.
+#
+# The manifest maps each file to the hash of its content; the references
+# of index.html to the other files are versioned with their hashes so that
+# browsers can cache them forever, while the content of the hot files is
+# kept in memory together with its gzip compressed variant.
+import mimetypes
+import os
+import re
+import zlib
+from collections import OrderedDict
+
+from globaleaks.security import sha256
+
+# the mime types worth a compressed variant
+COMPRESSIBLE_CONTENT_TYPES = [
+    'application/javascript',
+    'application/json',
+    'application/vnd.ms-fontobject',
+    'application/x-font-ttf',
+    'image/svg+xml',
+]
+
+ASSET_REFERENCE_REGEXP = re.compile(r'(\s(?:src|href))="([^":?#{}]+)"')
+
+
+def is_compressible(content_type):
+    return content_type.startswith('text/') or content_type in COMPRESSIBLE_CONTENT_TYPES
+
+
+def gzip_compress(data):
+    # wbits=31 produces the gzip format; the header has no timestamp so
+    # that the output depends only on the content
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def accepts_gzip(request):
+    for coding in request.headers.get('accept-encoding', '').split(','):
+        parts = coding.split(';')
+        if parts[0].strip() != 'gzip':
+            continue
+
+        for param in parts[1:]:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+
+        return True
+
+    return False
+
+
+class Asset(object):
+    __slots__ = ('path', 'abspath', 'hash', 'etag', 'gzip_etag', 'content_type', 'compressible', 'size')
+
+    def __init__(self, path, abspath, data):
+        self.path = path
+        self.abspath = abspath
+        self.hash = sha256(data)[:16]
+        self.etag = '"%s"' % self.hash
+        self.gzip_etag = '"%s-gz"' % self.hash
+        self.size = len(data)
+
+        content_type, _ = mimetypes.guess_type(path)
+        self.content_type = content_type or 'application/octet-stream'
+        self.compressible = is_compressible(self.content_type)
+
+
+class AssetCache(OrderedDict):
+    """
+    LRU cache of the content of the assets bounded by the total size in bytes
+    """
+    def __init__(self, size_limit):
+        OrderedDict.__init__(self)
+        self.size_limit = size_limit
+        self.size = 0
+
+    def get(self, path):
+        if path not in self:
+            return None
+
+        # the entry is moved to the end as the most recently used
+        entry = self.pop(path)
+        OrderedDict.__setitem__(self, path, entry)
+        return entry
+
+    def set(self, path, entry):
+        if path in self:
+            self.size -= sum(len(x) for x in self.pop(path) if x is not None)
+
+        entry_size = sum(len(x) for x in entry if x is not None)
+        if entry_size > self.size_limit:
+            return
+
+        while self.size + entry_size > self.size_limit:
+            _, old_entry = self.popitem(last=False)
+            self.size -= sum(len(x) for x in old_entry if x is not None)
+
+        OrderedDict.__setitem__(self, path, entry)
+        self.size += entry_size
+
+
+class AssetManifest(object):
+    """
+    Manifest of the files of a directory
+    """
+    index = 'index.html'
+
+    def __init__(self, root, cache_size):
+        self.root = os.path.abspath(root)
+        self.assets = {}
+        self.cache = AssetCache(cache_size)
+        self.index_entry = None
+
+    def build(self):
+        """
+        Hash all the files of the directory and rewrite the references of
+        the index to the other files appending the hash as version.
+        """
+        index_data = None
+
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                abspath = os.path.join(dirpath, filename)
+                path = os.path.relpath(abspath, self.root)
+
+                with open(abspath, 'rb') as f:
+                    data = f.read()
+
+                if path == self.index:
+                    index_data = data
+                    continue
+
+                self.assets[path] = Asset(path, abspath, data)
+
+        if index_data is None:
+            return self
+
+        referenced = []
+
+        def versioned_reference(match):
+            asset = self.assets.get(os.path.normpath(match.group(2)))
+            if asset is None:
+                return match.group(0)
+
+            referenced.append(asset)
+            return '%s="%s?v=%s"' % (match.group(1), match.group(2), asset.hash)
+
+        index_data = ASSET_REFERENCE_REGEXP.sub(versioned_reference, index_data)
+
+        # the rewritten index is always kept in memory
+        index = Asset(self.index, os.path.join(self.root, self.index), index_data)
+        self.assets[self.index] = index
+        self.index_entry = self.make_entry(index, index_data)
+
+        # the files referenced by the index are the ones needed by every page load
+        for asset in referenced:
+            self.load(asset)
+
+        return self
+
+    def get(self, path):
+        return self.assets.get(os.path.normpath(path))
+
+    def make_entry(self, asset, data):
+        compressed = None
+        if asset.compressible:
+            compressed = gzip_compress(data)
+            if len(compressed) >= len(data):
+                compressed = None
+
+        return data, compressed
+
+    def load(self, asset):
+        """
+        Return the content of the asset and its compressed variant, if any
+        """
+        if asset.path == self.index:
+            return self.index_entry
+
+        entry = self.cache.get(asset.path)
+        if entry is None:
+            with open(asset.abspath, 'rb') as f:
+                entry = self.make_entry(asset, f.read())
+
+            self.cache.set(asset.path, entry)
+
+        return entry
@@ -5,13 +5,96 @@ import zlib
 from zope.interface import implements
 
 from twisted.web import http
-from twisted.web.client import Agent
+from twisted.web.client import Agent, HTTPConnectionPool
 from twisted.internet import reactor, protocol, defer
+from twisted.internet.endpoints import UNIXClientEndpoint
 from twisted.internet.protocol import connectionDone
-from twisted.web.iweb import IBodyProducer
+from twisted.web.iweb import IAgentEndpointFactory, IBodyProducer
 from twisted.web.server import NOT_DONE_YET
 
 
+# headers meaningful only for a single transport-level connection that must
+# not be forwarded between the client connection and the backend connection
+HOP_BY_HOP_HEADERS = ['Connection', 'Keep-Alive', 'Proxy-Connection', 'TE',
+                      'Trailer', 'Transfer-Encoding', 'Upgrade']
+
+
+def is_response_compressible(response):
+    """
+    Returns True if the body of the response of the backend can be gzipped
+    by the proxy
+    """
+    # the body is already encoded by the backend
+    if response.headers.hasHeader('Content-Encoding'):
+        return False
+
+    # the ranges of the partial responses count the bytes of the identity
+    # encoding and gzipping them would make the resumed downloads corrupt
+    if response.code == http.PARTIAL_CONTENT or response.headers.hasHeader('Content-Range'):
+        return False
+
+    # the downloads (files and zip exports) are mostly already compressed
+    content_disposition = response.headers.getRawHeaders('Content-Disposition', [''])[0]
+    if content_disposition.startswith('attachment'):
+        return False
+
+    return True
+
+
+class HTTPStreamConnectionPool(HTTPConnectionPool):
+    """
+    Pool of the persistent connections to the backend shared by all the
+    clients of an https worker.
+
+    The twisted client never pipelines requests: a connection is handed out
+    for one request at a time and it is put back in the pool only after the
+    response has been completely received; idempotent requests failing on a
+    cached connection closed by the backend are automatically retried once.
+    """
+    maxPersistentPerHost = 16
+
+    # lower than the 60 seconds of inactivity after which the backend closes
+    # the connections in order to avoid picking up connections being closed
+    cachedConnectionTimeout = 30
+
+    def __init__(self, reactor):
+        HTTPConnectionPool.__init__(self, reactor, persistent=True)
+        self.requests = 0
+        self.connections = 0
+
+    def getConnection(self, key, endpoint):
+        self.requests += 1
+        return HTTPConnectionPool.getConnection(self, key, endpoint)
+
+    def _newConnection(self, key, endpoint):
+        self.connections += 1
+        return HTTPConnectionPool._newConnection(self, key, endpoint)
+
+    def get_stats(self):
+        return {
+            'requests': self.requests,
+            'connections': self.connections,
+            'reused': max(self.requests - self.connections, 0),
+            'idle': sum(len(c) for c in self._connections.values())
+        }
+
+
+class UNIXEndpointFactory(object):
+    """
+    Endpoint factory connecting the agent to the unix domain socket of the
+    backend independently of the host of the requested uri
+    """
+    implements(IAgentEndpointFactory)
+
+    def __init__(self, reactor, path, timeout=30):
+        self.reactor = reactor
+        self.path = path
+        self.timeout = timeout
+
+    def endpointForURI(self, uri):
+        return UNIXClientEndpoint(self.reactor, self.path, timeout=self.timeout)
+
+
 class BodyStreamer(protocol.Protocol):
     def __init__(self, streamfunction, finished):
         self._finished = finished
@@ -110,6 +193,9 @@ class HTTPStreamProxyRequest(http.Request):
         proxy_url = bytes(urlparse.urljoin(self.channel.proxy_url, self.uri))
 
         hdrs = self.requestHeaders
+        for h in HOP_BY_HOP_HEADERS:
+            hdrs.removeHeader(h)
+
         hdrs.setRawHeaders('GL-Forwarded-For', [self.getClientIP()])
 
         accept_encoding = self.getHeader('Accept-Encoding')
@@ -137,7 +223,9 @@ class HTTPStreamProxyRequest(http.Request):
 
     def proxySuccess(self, response):
         self.responseHeaders = response.headers
-        if self.gzip:
+
+        gzip = self.gzip and is_response_compressible(response)
+        if gzip:
             self.responseHeaders.setRawHeaders(b'content-encoding', [b'gzip'])
 
         self.responseHeaders.setRawHeaders('Strict-Transport-Security', ['max-age=31536000'])
@@ -146,7 +234,7 @@ class HTTPStreamProxyRequest(http.Request):
 
         d_forward = defer.Deferred()
 
-        if self.gzip:
+        if gzip:
             response.deliverBody(BodyGzipStreamer(self.write, d_forward))
         else:
             response.deliverBody(BodyStreamer(self.write, d_forward))
@@ -171,18 +259,30 @@ class HTTPStreamProxyRequest(http.Request):
 class HTTPStreamChannel(http.HTTPChannel):
     requestFactory = HTTPStreamProxyRequest
 
-    def __init__(self, proxy_url, *args, **kwargs):
+    def __init__(self, proxy_url, http_agent, *args, **kwargs):
         http.HTTPChannel.__init__(self, *args, **kwargs)
 
         self.proxy_url = proxy_url
-        self.http_agent = Agent(reactor, connectTimeout=30)
+        self.http_agent = http_agent
 
 
 class HTTPStreamFactory(http.HTTPFactory):
-    def __init__(self, proxy_url, *args, **kwargs):
+    def __init__(self, proxy_url, proxy_socket=None, *args, **kwargs):
         http.HTTPFactory.__init__(self, *args, **kwargs)
         self.proxy_url = proxy_url
+        self.pool = HTTPStreamConnectionPool(reactor)
+
+        if proxy_socket is None:
+            self.http_agent = Agent(reactor, connectTimeout=30, pool=self.pool)
+        else:
+            self.http_agent = Agent.usingEndpointFactory(reactor,
+                                                         UNIXEndpointFactory(reactor, proxy_socket),
+                                                         pool=self.pool)
 
     def buildProtocol(self, addr):
-        proto = HTTPStreamChannel(self.proxy_url)
+        proto = HTTPStreamChannel(self.proxy_url, self.http_agent)
         return proto
+
+    def stopFactory(self):
+        http.HTTPFactory.stopFactory(self)
+        self.pool.closeCachedConnections()
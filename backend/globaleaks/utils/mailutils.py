@@ -10,6 +10,7 @@ import re
 import sys
 import traceback
 from calendar import timegm
+from collections import deque
 from email import Charset # pylint: disable=no-name-in-module
 from email import utils as mailutils
 from email.header import Header
@@ -21,13 +22,13 @@ from datetime import datetime
 from twisted.internet import reactor, defer
 from twisted.internet.endpoints import TCP4ClientEndpoint
 from twisted.internet.ssl import ClientContextFactory
-from twisted.mail.smtp import ESMTPSenderFactory, SMTPError
+from twisted.mail.smtp import ESMTPSender, ESMTPSenderFactory, SMTPClient, SMTPDeliveryError, SMTPError, SUCCESS
 from twisted.protocols import tls
 from twisted.python.failure import Failure
 from txsocksx.client import SOCKS5ClientEndpoint
 
 from globaleaks import __version__
-from globaleaks.security import GLBPGP, sha256
+from globaleaks.security import GLPGPKeyrings, sha256
 from globaleaks.settings import GLSettings
 from globaleaks.utils.utility import log
 
@@ -65,37 +66,204 @@ class GLClientContextFactory(ClientContextFactory):
         return ctx
 
 
-def sendmail(to_address, subject, body):
+class OutgoingMail(object):
+    __slots__ = ('to_address', 'message', 'deferred')
+
+    def __init__(self, to_address, message):
+        self.to_address = to_address
+        self.message = message
+        self.deferred = defer.Deferred()
+
+
+class SMTPSession(ESMTPSender):
     """
-    Sends an email using SMTPS/SMTP+TLS and torify the connection
+    ESMTP client delivering the mails queued on a SMTPClientPool over a
+    single authenticated session
 
-    @param to_address: the to address field of the email
-    @param subject: the mail subject
-    @param body: the mail body
-    @param event: the event description, needed to keep track of failure/success
+    The session is closed once the queue is empty or the limit of mails
+    per session is reached.
     """
-    try:
-        if to_address == "":
-            return
+    current = None
+    sent = 0
+
+    def getMailFrom(self):
+        pool = self.factory.pool
+
+        if not pool.queue or self.sent >= pool.mails_per_session:
+            self.factory.sendFinished = True
+            self.factory.result.callback(self.sent)
+            return None
+
+        self.current = pool.queue.popleft()
+        self.current.message.seek(0, 0)
+        self.sent += 1
+
+        return str(self.factory.fromEmail)
+
+    def getMailTo(self):
+        return [self.current.to_address]
+
+    def getMailData(self):
+        return self.current.message
+
+    def sentMail(self, code, resp, numOk, addresses, log):
+        if code in SUCCESS:
+            mail, self.current = self.current, None
+            mail.deferred.callback(None)
+        else:
+            self.fail_current(SMTPDeliveryError(code, resp, log.str(), addresses))
+
+    def fail_current(self, reason):
+        mail, self.current = self.current, None
+        if mail is not None:
+            mail.deferred.errback(reason)
+
+    def sendError(self, exc):
+        self.fail_current(exc)
+
+        SMTPClient.sendError(self, exc)
+
+        if not self.factory.sendFinished:
+            self.factory.sendFinished = True
+            self.factory.result.errback(exc)
+
+    def connectionLost(self, reason=None):
+        self.fail_current(reason)
+
+        ESMTPSender.connectionLost(self, reason)
+
+        # the endpoints do not notify the factory of the lost connection
+        if not self.factory.sendFinished:
+            self.factory.sendFinished = True
+            self.factory.result.errback(reason)
+
+
+class SMTPSessionFactory(ESMTPSenderFactory):
+    protocol = SMTPSession
+
+    def __init__(self, pool, deferred, username, password, from_address, **kwargs):
+        ESMTPSenderFactory.__init__(self, username, password, from_address, [], None, deferred,
+                                    retries=0, timeout=GLSettings.mail_timeout, **kwargs)
+        self.pool = pool
+
+
+class SMTPClientPool(object):
+    """
+    Pool of SMTP sessions delivering a queue of mails
+
+    The mails are delivered by up to GLSettings.mail_connections sessions
+    in parallel each one reusing the same connection and authentication
+    for many mails; the result of each mail is reported by its deferred.
+    """
+    mails_per_session = 100
+
+    def __init__(self):
+        self.queue = deque()
+        self.sessions = 0
+
+    def sendmail(self, to_address, message):
+        """
+        Queue a mail
+
+        @param to_address: the address of the recipient
+        @param message: a file-like object with the MIME message
+        @return: a deferred fired once the mail is delivered
+        """
+        mail = OutgoingMail(to_address, message)
+        self.queue.append(mail)
+
+        if self.sessions < GLSettings.mail_connections and self.sessions < len(self.queue):
+            self.open_session()
+
+        return mail.deferred
+
+    def build_factory(self, deferred):
+        notif = GLSettings.memory_copy.notif
+
+        context_factory = GLClientContextFactory()
+
+        factory = SMTPSessionFactory(self,
+                                     deferred,
+                                     notif.username.encode('utf-8'),
+                                     GLSettings.memory_copy.private.smtp_password.encode('utf-8'),
+                                     notif.source_email,
+                                     contextFactory=context_factory,
+                                     requireAuthentication=True,
+                                     requireTransportSecurity=(notif.security != 'SSL'))
 
-        result_deferred = defer.Deferred()
+        if notif.security == 'SSL':
+            factory = tls.TLSMemoryBIOFactory(context_factory, True, factory)
+
+        return factory
+
+    def connect(self, factory):
+        smtp_host = GLSettings.memory_copy.notif.server
+        smtp_port = GLSettings.memory_copy.notif.port
+
+        log.debug('Opening SMTP session with server [%s:%d] [%s]' %
+                  (smtp_host, smtp_port, GLSettings.memory_copy.notif.security))
+
+        if GLSettings.memory_copy.anonymize_outgoing_connections:
+            socksProxy = TCP4ClientEndpoint(reactor, GLSettings.socks_host, GLSettings.socks_port, timeout=GLSettings.mail_timeout)
+            endpoint = SOCKS5ClientEndpoint(smtp_host.encode('utf-8'), smtp_port, socksProxy)
+        else:
+            endpoint = TCP4ClientEndpoint(reactor, smtp_host.encode('utf-8'), smtp_port, timeout=GLSettings.mail_timeout)
+
+        return endpoint.connect(factory)
 
-        def errback(reason, *args, **kwargs):
+    def open_session(self):
+        self.sessions += 1
+
+        session_deferred = defer.Deferred()
+        session_deferred.addBoth(self.session_closed)
+
+        def errback(reason):
+            if not session_deferred.called:
+                session_deferred.errback(reason)
+
+        try:
+            self.connect(self.build_factory(session_deferred)).addErrback(errback)
+        except Exception:
+            errback(Failure())
+
+    def session_closed(self, result):
+        self.sessions -= 1
+
+        if isinstance(result, Failure):
             # TODO: here it should be written a complete debugging of the possible
             #       errors by writing clear log lines in relation to all the stack:
             #       e.g. it should debugged all errors related to: TCP/SOCKS/TLS/SSL/SMTP/SFIGA
-            if isinstance(reason, Failure):
-                log.err("SMTP connection failed (Exception: %s)" % reason.value)
-                log.debug(reason)
+            log.err("SMTP connection failed (Exception: %s)" % result.value)
+            log.debug(result)
+
+            # the queued mails are failed if no other session can deliver them
+            if not self.sessions:
+                self.fail_queue(result)
 
-            return result_deferred.errback(reason)
+        elif self.queue and self.sessions < GLSettings.mail_connections:
+            self.open_session()
 
-        authentication_username=GLSettings.memory_copy.notif.username
-        authentication_password=GLSettings.memory_copy.private.smtp_password
-        from_address=GLSettings.memory_copy.notif.source_email
-        smtp_host=GLSettings.memory_copy.notif.server
-        smtp_port=GLSettings.memory_copy.notif.port
-        security=GLSettings.memory_copy.notif.security
+    def fail_queue(self, reason):
+        queue, self.queue = self.queue, deque()
+        for mail in queue:
+            mail.deferred.errback(reason)
+
+
+smtp_pool = SMTPClientPool()
+
+
+def sendmail(to_address, subject, body):
+    """
+    Sends an email using SMTPS/SMTP+TLS and torify the connection
+
+    @param to_address: the to address field of the email
+    @param subject: the mail subject
+    @param body: the mail body
+    @return: a deferred fired once the mail is delivered
+    """
+    try:
+        if to_address == "":
+            return defer.succeed(None)
 
         message = MIME_mail_build(GLSettings.memory_copy.notif.source_name,
                                   GLSettings.memory_copy.notif.source_email,
@@ -104,44 +272,13 @@ def sendmail(to_address, subject, body):
                                   subject,
                                   body)
 
-        log.debug('Sending email to %s using SMTP server [%s:%d] [%s]' %
-                  (to_address, smtp_host, smtp_port, security))
-
-        context_factory = GLClientContextFactory()
-
-        esmtp_deferred = defer.Deferred()
-        esmtp_deferred.addCallbacks(result_deferred.callback, errback)
-
-        factory = ESMTPSenderFactory(
-            authentication_username.encode('utf-8'),
-            authentication_password.encode('utf-8'),
-            from_address,
-            to_address,
-            message,
-            esmtp_deferred,
-            contextFactory=context_factory,
-            requireAuthentication=True,
-            requireTransportSecurity=(security != 'SSL'),
-            retries=0,
-            timeout=GLSettings.mail_timeout)
-
-        if security == "SSL":
-            factory = tls.TLSMemoryBIOFactory(context_factory, True, factory)
+        log.debug('Sending email to %s' % to_address)
 
         if GLSettings.testing:
             #  Hooking the test down to here is a trick to be able to test all the above code :)
             return defer.succeed(None)
 
-        if GLSettings.memory_copy.anonymize_outgoing_connections:
-            socksProxy = TCP4ClientEndpoint(reactor, GLSettings.socks_host, GLSettings.socks_port, timeout=GLSettings.mail_timeout)
-            endpoint = SOCKS5ClientEndpoint(smtp_host.encode('utf-8'), smtp_port, socksProxy)
-        else:
-            endpoint = TCP4ClientEndpoint(reactor, smtp_host.encode('utf-8'), smtp_port, timeout=GLSettings.mail_timeout)
-
-        d = endpoint.connect(factory)
-        d.addErrback(errback)
-
-        return result_deferred
+        return smtp_pool.sendmail(to_address, message)
 
     except Exception as excep:
         # we strongly need to avoid raising exception inside email logic to avoid chained errors
@@ -267,16 +404,13 @@ def schedule_exception_email(exception_text):
             # Opportunisticly encrypt the mail body. NOTE that mails will go out
             # unencrypted if one address in the list does not have a public key set.
             if len(pub_key):
-                gpob = GLBPGP()
                 try:
-                    r = gpob.load_key(pub_key)
-                    mail_body = gpob.encrypt_message(r['fingerprint'], mail_body)
-                    gpob.destroy_environment()
+                    gpob = GLPGPKeyrings.get(pub_key)
+                    mail_body = gpob.encrypt_message(gpob.key['fingerprint'], mail_body)
                 except Exception as excep:
                     # If this exception email is configured to be subject to encryption
                     # and the encryption step throws, log the error and move on.
                     log.err("Error while encrypting exception email: %s" % str(excep))
-                    gpob.destroy_environment()
                     continue
 
             # avoid waiting for the notification to send and instead rely on threads to handle it
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+#
+# multipart
+# *********
+#
+# Incremental parser of multipart/form-data request bodies.
+#
+# The parser is installed as the content of the twisted Request so that the
+# body is consumed as it is received: the file parts (i.e. the flow.js chunks)
+# are encrypted straight into a GLSecureTemporaryFile and the memory usage
+# stays constant independently of the size of the upload.
+import cgi
+
+from globaleaks.security import GLSecureTemporaryFile
+from globaleaks.settings import GLSettings
+
+
+class MultipartError(Exception):
+    pass
+
+
+class MultipartUploadParser(object):
+    """
+    File-like sink parsing a multipart/form-data body chunk by chunk.
+
+    After all the data has been written the parsed fields are available in
+    self.args, formatted like twisted Request.args; the values of the file
+    parts are GLSecureTemporaryFile instances with a 'size' attribute.
+    """
+    max_headers_size = 16 * 1024
+    max_field_size = 64 * 1024
+
+    def __init__(self, boundary, max_file_size=None):
+        self.delimiter = b'--' + boundary
+        self.separator = b'\r\n' + self.delimiter
+        self.max_file_size = max_file_size
+
+        self.args = {}
+        self.error = None
+
+        self.buf = b''
+        self.state = 'preamble'
+        self.part = None
+
+    def write(self, data):
+        if self.error is not None or self.state == 'end':
+            return
+
+        self.buf += data
+
+        try:
+            while self.state != 'end' and getattr(self, '_parse_' + self.state)():
+                pass
+        except MultipartError as e:
+            self.abort(e)
+
+    def abort(self, error):
+        self.error = error
+        self.buf = b''
+
+        values = sum(self.args.values(), [])
+        if self.part is not None:
+            values.append(self.part[1])
+
+        for value in values:
+            if isinstance(value, GLSecureTemporaryFile):
+                value.close()
+
+        self.args = {}
+        self.part = None
+
+    def finalize(self):
+        """
+        Verify that the whole body has been received
+        """
+        if self.error is None and self.state != 'end':
+            self.abort(MultipartError("Truncated multipart body"))
+
+        if self.error is not None:
+            raise self.error
+
+    def _parse_preamble(self):
+        idx = self.buf.find(self.delimiter)
+        if idx == -1:
+            self.buf = self.buf[-len(self.delimiter):]
+            return False
+
+        self.buf = self.buf[idx + len(self.delimiter):]
+        self.state = 'delimiter'
+        return True
+
+    def _parse_delimiter(self):
+        if len(self.buf) < 2:
+            return False
+
+        if self.buf.startswith(b'--'):
+            self.buf = b''
+            self.state = 'end'
+        elif self.buf.startswith(b'\r\n'):
+            self.buf = self.buf[2:]
+            self.state = 'headers'
+        else:
+            raise MultipartError("Invalid multipart delimiter")
+
+        return True
+
+    def _parse_headers(self):
+        idx = self.buf.find(b'\r\n\r\n')
+        if idx == -1:
+            if len(self.buf) > self.max_headers_size:
+                raise MultipartError("Multipart headers too long")
+
+            return False
+
+        headers = {}
+        for line in self.buf[:idx].split(b'\r\n'):
+            if b':' in line:
+                key, value = line.split(b':', 1)
+                headers[key.strip().lower()] = value.strip()
+
+        self.buf = self.buf[idx + 4:]
+
+        _, params = cgi.parse_header(headers.get(b'content-disposition', b''))
+        if 'name' not in params:
+            raise MultipartError("Missing multipart field name")
+
+        if 'filename' in params:
+            value = GLSecureTemporaryFile(GLSettings.tmp_upload_path)
+            value.size = 0
+        else:
+            value = b''
+
+        self.part = [params['name'], value]
+        self.state = 'body'
+        return True
+
+    def _consume(self, data):
+        name, value = self.part
+
+        if isinstance(value, GLSecureTemporaryFile):
+            # the size is always tracked in order to let the handlers report
+            # the error; the exceeding data is not written to the disk.
+            if self.max_file_size is None or value.size + len(data) <= self.max_file_size:
+                value.write(data)
+
+            value.size += len(data)
+        else:
+            if len(value) + len(data) > self.max_field_size:
+                raise MultipartError("Multipart field too long")
+
+            self.part[1] += data
+
+    def _parse_body(self):
+        idx = self.buf.find(self.separator)
+        if idx == -1:
+            # keep the tail that could contain a partial separator
+            keep = len(self.separator) - 1
+            if len(self.buf) > keep:
+                self._consume(self.buf[:-keep])
+                self.buf = self.buf[-keep:]
+
+            return False
+
+        self._consume(self.buf[:idx])
+        self.buf = self.buf[idx + len(self.separator):]
+
+        name, value = self.part
+        self.args.setdefault(name, []).append(value)
+        self.part = None
+
+        self.state = 'delimiter'
+        return True
+
+    def seek(self, offset, whence=0):
+        pass
+
+    def read(self, size=-1):
+        return b''
+
+    def close(self):
+        pass
+
+
+def get_multipart_boundary(content_type):
+    """
+    Return the boundary of a multipart/form-data content type or None
+    """
+    if content_type is None:
+        return None
+
+    key, params = cgi.parse_header(content_type)
+    if key.lower() != 'multipart/form-data':
+        return None
+
+    return params.get('boundary')
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# securerandom
+# ************
+#
+# Cryptographically secure random numbers and strings.
+#
+# The randomness is read from os.urandom in buffers so that the generation
+# of keys, receipts and numbers does not require a syscall for each value,
+# and the values in a range are generated by rejection sampling so that
+# they are not biased.
+import binascii
+import os
+import threading
+
+
+class SecureRandom(object):
+    buffer_size = 4096
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.buffer = b''
+        self.offset = 0
+
+    def bytes(self, n):
+        """
+        Return n random bytes
+        """
+        if n > self.buffer_size:
+            return os.urandom(n)
+
+        with self.lock:
+            # the buffer is never shared with a forked process
+            if self.offset + n > len(self.buffer) or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.buffer = os.urandom(self.buffer_size)
+                self.offset = 0
+
+            data = self.buffer[self.offset:self.offset + n]
+            self.offset += n
+
+        return data
+
+    def randbelow(self, n):
+        """
+        Return a random integer in [0, n)
+        """
+        if n <= 0:
+            raise ValueError("randbelow() requires a positive argument")
+
+        bits = (n - 1).bit_length()
+        if not bits:
+            return 0
+
+        nbytes = (bits + 7) // 8
+        mask = (1 << bits) - 1
+
+        while True:
+            r = int(binascii.hexlify(self.bytes(nbytes)), 16) & mask
+            if r < n:
+                return r
+
+    def randint(self, start, end):
+        """
+        Return a random integer in [start, end]
+        """
+        return start + self.randbelow(end - start + 1)
+
+    def choice(self, population):
+        return population[self.randbelow(len(population))]
+
+    def shuffle(self, x):
+        """
+        Shuffle the list in place with the Fisher-Yates algorithm
+        """
+        for i in reversed(xrange(1, len(x))):
+            j = self.randbelow(i + 1)
+            x[i], x[j] = x[j], x[i]
+
+        return x
+
+    def string(self, n, alphabet):
+        """
+        Return a random string of n characters of the alphabet
+
+        Each random byte maps to a character; the bytes exceeding the
+        largest multiple of the size of the alphabet are discarded.
+        """
+        size = len(alphabet)
+        if not 0 < size <= 256:
+            raise ValueError("the alphabet must contain from 1 to 256 characters")
+
+        limit = 256 - (256 % size)
+
+        ret = []
+        while len(ret) < n:
+            for c in bytearray(self.bytes(n - len(ret) + (n >> 3) + 1)):
+                if c < limit:
+                    ret.append(alphabet[c % size])
+                    if len(ret) == n:
+                        break
+
+        return ''.join(ret)
+
+
+_instance = SecureRandom()
+
+randbytes = _instance.bytes
+randbelow = _instance.randbelow
+randint = _instance.randint
+choice = _instance.choice
+shuffle = _instance.shuffle
+randstring = _instance.string
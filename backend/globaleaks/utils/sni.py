@@ -122,11 +122,26 @@ class SNIMap(object):
             _NegotiationData
         )
 
-        self.context = self.mapping['DEFAULT'].getContext()
+        self.context = None
+        self._updateDefaultContext()
 
-        self.context.set_tlsext_servername_callback(
-            self.selectContext
-        )
+    def update(self, mapping):
+        """
+        Replace the mapping of the contexts; the established connections keep
+        using the context they have been created with.
+        """
+        self.mapping = mapping
+        self._updateDefaultContext()
+
+    def _updateDefaultContext(self):
+        # the context of the default factory is replaced on the rotation
+        # of the session keys and on the reload of the mapping
+        context = self.mapping['DEFAULT'].getContext()
+        if context is not self.context:
+            self.context = context
+            self.context.set_tlsext_servername_callback(
+                self.selectContext
+            )
 
     def selectContext(self, connection):
         common_name = connection.get_servername()
@@ -140,6 +155,7 @@ class SNIMap(object):
             connection.set_context(newContext)
 
     def serverConnectionForTLS(self, protocol):
+        self._updateDefaultContext()
         return _ConnectionProxy(Connection(self.context, None), self)
 
     def _npnAdvertiseCallbackForContext(self, context, callback):
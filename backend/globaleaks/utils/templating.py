@@ -10,6 +10,7 @@
 
 import collections
 import copy
+import re
 
 from globaleaks.rest import errors
 from globaleaks.settings import GLSettings
@@ -498,32 +499,81 @@ supported_template_types = {
 
 
 class Templating(object):
-    def format_template(self, raw_template, data):
-        keyword_converter = supported_template_types[data['type']](data)
-        iterations = 3
-        while iterations > 0:
-            iterations -= 1
-            count = 0
+    # maximum number of times the keywords contained in the values of other
+    # keywords are resolved (e.g. the %FreeMemory% in %AnomalyDetailDisk%)
+    iterations = 3
+
+    # maximum number of compiled templates kept in the cache
+    cache_size = 1024
+
+    cache = {}
+    keyword_regexps = {}
+
+    @classmethod
+    def tokenize(cls, raw_template, keyword_class):
+        """
+        Split a template in a list of literal strings and keyword names
+
+        The keyword names are the odd items of the list.
+        """
+        regexp = cls.keyword_regexps.get(keyword_class)
+        if regexp is None:
+            regexp = cls.keyword_regexps[keyword_class] = \
+                re.compile('%(' + '|'.join(re.escape(kw[1:-1]) for kw in keyword_class.keyword_list) + ')%') \
+                if keyword_class.keyword_list else None
+
+        tokens = regexp.split(raw_template) if regexp is not None else []
+
+        return tokens if len(tokens) > 1 else [raw_template]
+
+    @classmethod
+    def compile(cls, raw_template, keyword_class):
+        # the text of a template identifies also its language; the type is
+        # part of the key because equal str and unicode templates compare equal
+        key = (raw_template, type(raw_template), keyword_class)
+
+        tokens = cls.cache.get(key)
+        if tokens is None:
+            if len(cls.cache) >= cls.cache_size:
+                cls.cache.clear()
 
-            for kw in keyword_converter.keyword_list:
-                if raw_template.count(kw):
-                    # if %SomeKeyword% matches, call keyword_converter.SomeKeyword function
-                    variable_content = getattr(keyword_converter, kw[1:-1])()
-                    raw_template = raw_template.replace(kw, variable_content)
+            tokens = cls.cache[key] = cls.tokenize(raw_template, keyword_class)
 
-                    count += 1
+        return tokens
 
-            # remobe lines with only %Blank%
-            raw_template = raw_template.replace('\n%Blank%\n', '\n')
+    def render(self, tokens, keyword_converter, values, iterations):
+        output = []
+
+        for i, token in enumerate(tokens):
+            if not i % 2:
+                output.append(token)
+                continue
+
+            # if %SomeKeyword% matches, call keyword_converter.SomeKeyword function
+            if token not in values:
+                values[token] = getattr(keyword_converter, token)()
+
+            variable_content = values[token]
+            if iterations > 1 and '%' in variable_content:
+                value_tokens = self.tokenize(variable_content, type(keyword_converter))
+                if len(value_tokens) > 1:
+                    variable_content = self.render(value_tokens, keyword_converter, values, iterations - 1)
+
+            output.append(variable_content)
+
+        return ''.join(output)
+
+    def format_template(self, raw_template, data):
+        keyword_class = supported_template_types[data['type']]
+        keyword_converter = keyword_class(data)
 
-            # remove remaining $Blank% tokens
-            raw_template = raw_template.replace('\n%Blank%\n', '')
+        output = self.render(self.compile(raw_template, keyword_class), keyword_converter, {}, self.iterations)
 
-            if count == 0:
-                # finally!
-                break
+        # remove lines with only %Blank%
+        output = output.replace('\n%Blank%\n', '\n')
 
-        return raw_template
+        # remove remaining $Blank% tokens
+        return output.replace('\n%Blank%\n', '')
 
     def get_mail_subject_and_body(self, data):
         subject_template = ''
@@ -129,7 +129,6 @@ def new_tls_context():
     ctx.set_options(SSL.OP_NO_SSLv2 |
                     SSL.OP_NO_SSLv3 |
                     SSL.OP_NO_COMPRESSION |
-                    SSL.OP_NO_TICKET |
                     SSL.OP_CIPHER_SERVER_PREFERENCE)
 
     ctx.set_mode(SSL.MODE_RELEASE_BUFFERS)
@@ -141,6 +140,11 @@ def new_tls_context():
 
 
 class TLSServerContextFactory(ssl.ContextFactory):
+    # lifetime in seconds of the cached sessions and of the session tickets;
+    # the context is periodically renewed with rotate_session_keys() so that
+    # the keys protecting the sessions are not retained for a longer time.
+    session_lifetime = 3600
+
     def __init__(self, priv_key, certificate, intermediate, dh):
         """
         @param priv_key: String representation of the private key
@@ -148,23 +152,81 @@ class TLSServerContextFactory(ssl.ContextFactory):
         @param intermediate: String representation of the intermediate file
         @param dh: String representation of the DH parameters
         """
-        self.ctx = new_tls_context()
+        self.stats = {
+            'handshakes': 0,
+            'resumptions': 0
+        }
 
-        x509 = load_certificate(FILETYPE_PEM, certificate)
-        self.ctx.use_certificate(x509)
+        self.ctx = None
+        self.materials = None
+        self.update(priv_key, certificate, intermediate, dh)
+
+    def load(self, priv_key, certificate, intermediate, dh):
+        self.priv_key = load_privatekey(FILETYPE_PEM, priv_key)
+        self.certificate = load_certificate(FILETYPE_PEM, certificate)
+        self.intermediate = load_certificate(FILETYPE_PEM, intermediate) if intermediate != '' else None
+        self.dh = dh
+
+        self.materials = (priv_key, certificate, intermediate, dh)
+
+    def update(self, priv_key, certificate, intermediate, dh):
+        """
+        Load new TLS material; the certificate, the key and the DH parameters
+        are replaced in the current context so that its session cache and its
+        ticket keys are retained, while a new context is needed in order to
+        replace the intermediate certificate.
+        """
+        if (priv_key, certificate, intermediate, dh) == self.materials:
+            return
+
+        renew = self.materials is None or intermediate != self.materials[2]
+
+        self.load(priv_key, certificate, intermediate, dh)
+
+        if renew:
+            self.ctx = self.create_context()
+        else:
+            self.ctx.use_certificate(self.certificate)
+            self.ctx.use_privatekey(self.priv_key)
+            load_dh_params_from_string(self.ctx, self.dh)
 
-        if intermediate != '':
-            x509 = load_certificate(FILETYPE_PEM, intermediate)
-            self.ctx.add_extra_chain_cert(x509)
+    def create_context(self):
+        ctx = new_tls_context()
+
+        ctx.use_certificate(self.certificate)
+
+        if self.intermediate is not None:
+            ctx.add_extra_chain_cert(self.intermediate)
 
-        priv_key = load_privatekey(FILETYPE_PEM, priv_key)
-        self.ctx.use_privatekey(priv_key)
+        ctx.use_privatekey(self.priv_key)
 
-        load_dh_params_from_string(self.ctx, dh)
+        load_dh_params_from_string(ctx, self.dh)
 
         ecdh = _lib.EC_KEY_new_by_curve_name(_lib.NID_X9_62_prime256v1)
         ecdh = _ffi.gc(ecdh, _lib.EC_KEY_free)
-        _lib.SSL_CTX_set_tmp_ecdh(self.ctx._context, ecdh)
+        _lib.SSL_CTX_set_tmp_ecdh(ctx._context, ecdh)
+
+        # each new context gets a fresh session cache and fresh ticket keys
+        ctx.set_session_id(b'globaleaks')
+        ctx.set_session_cache_mode(SSL.SESS_CACHE_SERVER)
+        ctx.set_timeout(self.session_lifetime)
+
+        ctx.set_info_callback(self.info_callback)
+
+        return ctx
+
+    def info_callback(self, connection, where, ret):
+        if where & SSL.SSL_CB_HANDSHAKE_DONE:
+            self.stats['handshakes'] += 1
+            if _lib.SSL_session_reused(connection._ssl):
+                self.stats['resumptions'] += 1
+
+    def rotate_session_keys(self):
+        """
+        Replace the context discarding the cached sessions and the ticket keys;
+        the established connections keep using the previous context.
+        """
+        self.ctx = self.create_context()
 
     def getContext(self):
         return self.ctx
@@ -7,7 +7,6 @@
 #   operation by anonymous user.
 
 import os
-from random import randint
 
 from datetime import datetime, timedelta
 
@@ -16,7 +15,7 @@ from globaleaks.rest import errors
 from globaleaks.security import sha256, generateRandomKey
 from globaleaks.settings import GLSettings
 from globaleaks.utils.tempdict import TempDict
-from globaleaks.utils.utility import log, datetime_now, datetime_to_ISO8601
+from globaleaks.utils.utility import log, datetime_now, datetime_to_ISO8601, randint
 
 
 class TokenListClass(TempDict):
@@ -23,6 +23,7 @@ from twisted.python import log as twlog
 from twisted.python import util, failure
 
 from globaleaks import LANGUAGES_SUPPORTED_CODES
+from globaleaks.utils import securerandom
 
 
 def uuid4():
@@ -57,23 +58,20 @@ def randint(start, end=None):
     if end is None:
         end = start
         start = 0
-    w = end - start + 1
-    return start + int(''.join("%x" % ord(x) for x in os.urandom(w)), 16) % w
+
+    return securerandom.randint(start, end)
 
 
 def randbits(bits):
-    return os.urandom(int(bits/8))
+    return securerandom.randbytes(int(bits/8))
 
 
 def choice(population):
-    return population[randint(len(population) - 1)]
+    return securerandom.choice(population)
 
 
 def shuffle(x):
-    for i in reversed(xrange(1, len(x))):
-        j = randint(0, i)
-        x[i], x[j] = x[j], x[i]
-    return x
+    return securerandom.shuffle(x)
 
 
 def deferred_sleep(timeout):
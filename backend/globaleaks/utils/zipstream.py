@@ -8,6 +8,8 @@
 # our purpose (that's the reason why is not in third party)
 
 import binascii
+import collections
+import math
 import os
 import struct
 import time
@@ -19,7 +21,8 @@ except ImportError:
 
 __all__ = ["ZIP_STORED", "ZIP_DEFLATED", "ZipStream"]
 
-ZIP64_LIMIT= (1 << 31) - 1
+ZIP64_LIMIT = (1 << 31) - 1
+ZIP_FILECOUNT_LIMIT = (1 << 16) - 1
 
 # constants for Zip file compression methods
 ZIP_STORED = 0
@@ -27,18 +30,76 @@ ZIP_DEFLATED = 8
 # Other ZIP compression methods not supported
 
 # Here are some struct module formats for reading headers
-structEndArchive = "<4s4H2lH"     # 9 items, end of archive, 22 bytes
+structEndArchive = "<4s4H2LH"     # 9 items, end of archive, 22 bytes
 stringEndArchive = "PK\005\006"   # magic number for end of archive record
-structCentralDir = "<4s4B4HlLL5HLl"# 19 items, central directory, 46 bytes
+structCentralDir = "<4s4B4HLLL5HLL"# 19 items, central directory, 46 bytes
 stringCentralDir = "PK\001\002"   # magic number for central directory
-structFileHeader = "<4s2B4HlLL2H"  # 12 items, file header record, 30 bytes
+structFileHeader = "<4s2B4HLLL2H"  # 12 items, file header record, 30 bytes
 stringFileHeader = "PK\003\004"   # magic number for file header
-structEndArchive64Locator = "<4slql" # 4 items, locate Zip64 header, 20 bytes
+structEndArchive64Locator = "<4sLQL" # 4 items, locate Zip64 header, 20 bytes
 stringEndArchive64Locator = "PK\x06\x07" # magic token for locator header
-structEndArchive64 = "<4sqhhllqqqq" # 10 items, end of archive (Zip64), 56 bytes
+structEndArchive64 = "<4sQ2H2L4Q" # 10 items, end of archive (Zip64), 56 bytes
 stringEndArchive64 = "PK\x06\x06" # magic token for Zip64 header
 stringDataDescriptor = "PK\x07\x08" # magic number for data descriptor
 
+# content types of formats that are already compressed
+COMPRESSED_CONTENT_TYPES = frozenset([
+    'application/epub+zip',
+    'application/gzip',
+    'application/java-archive',
+    'application/pgp-encrypted',
+    'application/vnd.rar',
+    'application/x-7z-compressed',
+    'application/x-bzip2',
+    'application/x-gzip',
+    'application/x-rar-compressed',
+    'application/x-xz',
+    'application/zip',
+])
+
+COMPRESSED_CONTENT_TYPE_PREFIXES = (
+    'application/vnd.oasis.opendocument.',
+    'application/vnd.openxmlformats-officedocument.',
+    'audio/',
+    'image/gif',
+    'image/jpeg',
+    'image/png',
+    'image/webp',
+    'video/',
+)
+
+# entries whose sample has an entropy higher than this (bits per byte)
+# are considered not compressible
+ENTROPY_THRESHOLD = 7.5
+ENTROPY_SAMPLE_SIZE = 64 * 1024
+
+
+def entropy(data):
+    """
+    Return the Shannon entropy of data in bits per byte
+    """
+    if not data:
+        return 0.0
+
+    length = float(len(data))
+
+    return -sum(c / length * math.log(c / length, 2) for c in collections.Counter(data).itervalues())
+
+
+def is_compressible(content_type, sample):
+    """
+    Tell if an entry is worth to be compressed given its content type and
+    a sample of its content
+    """
+    if content_type:
+        content_type = content_type.split(';')[0].strip().lower()
+        if content_type in COMPRESSED_CONTENT_TYPES or \
+           content_type.startswith(COMPRESSED_CONTENT_TYPE_PREFIXES):
+            return False
+
+    return entropy(sample) < ENTROPY_THRESHOLD
+
+
 # indexes of entries in the central directory structure
 _CD_SIGNATURE = 0
 _CD_CREATE_VERSION = 1
@@ -97,6 +158,7 @@ class ZipInfo(object):
             'CRC',
             'compress_size',
             'file_size',
+            'zip64',
         )
 
     def __init__(self, filename="NoName", date_time=(1980,1,1,0,0,0), compression=ZIP_DEFLATED):
@@ -147,6 +209,9 @@ class ZipInfo(object):
         self.compress_size = 0
         self.file_size = 0
 
+        # Set when the sizes of the entry could exceed the ZIP64_LIMIT
+        self.zip64 = False
+
     def _encodeFilenameFlags(self):
         if isinstance(self.filename, unicode):
             try:
@@ -157,11 +222,11 @@ class ZipInfo(object):
             return self.filename, self.flag_bits
 
     def DataDescriptor(self):
-        if self.compress_size > ZIP64_LIMIT or self.file_size > ZIP64_LIMIT:
-            fmt = "<4slQQ"
+        if self.zip64:
+            fmt = "<4sLQQ"
         else:
-            fmt = "<4slLL"
-        return struct.pack(fmt, stringDataDescriptor, self.CRC, self.compress_size, self.file_size)
+            fmt = "<4sLLL"
+        return struct.pack(fmt, stringDataDescriptor, self.CRC & 0xffffffff, self.compress_size, self.file_size)
 
     def FileHeader(self):
         """Return the per-file header as a string."""
@@ -172,16 +237,16 @@ class ZipInfo(object):
             # Set these to zero because we write them after the file data
             CRC = compress_size = file_size = 0
         else:
-            CRC = self.CRC
+            CRC = self.CRC & 0xffffffff
             compress_size = self.compress_size
             file_size = self.file_size
 
         extra = self.extra
 
-        if file_size > ZIP64_LIMIT or compress_size > ZIP64_LIMIT:
-            # File is larger than what fits into a 4 byte integer,
+        if self.zip64:
+            # File could be larger than what fits into a 4 byte integer,
             # fall back to the ZIP64 extension
-            fmt = '<hhqq'
+            fmt = '<HHQQ'
             extra = extra + struct.pack(fmt,
                     1, struct.calcsize(fmt)-4, file_size, compress_size)
             file_size = 0xffffffff # -1
@@ -199,7 +264,65 @@ class ZipInfo(object):
 
         return header + filename + extra
 
+    def CentralDirectory(self):
+        """Return the central directory record of the file as a string."""
+        dt = self.date_time
+        dosdate = (dt[0] - 1980) << 9 | dt[1] << 5 | dt[2]
+        dostime = dt[3] << 11 | dt[4] << 5 | (dt[5] // 2)
+        extra = []
+        if self.zip64 or self.file_size > ZIP64_LIMIT or self.compress_size > ZIP64_LIMIT:
+            extra.append(self.file_size)
+            extra.append(self.compress_size)
+            file_size = 0xffffffff     #-1
+            compress_size = 0xffffffff #-1
+        else:
+            file_size = self.file_size
+            compress_size = self.compress_size
+
+        if self.header_offset > ZIP64_LIMIT:
+            extra.append(self.header_offset)
+            header_offset = 0xffffffff  # -1
+        else:
+            header_offset = self.header_offset
+
+        extra_data = self.extra
+        if extra:
+            # Append a ZIP64 field to the extra's
+            extra_data = struct.pack('<HH' + 'Q'*len(extra), 1, 8*len(extra), *extra) + extra_data
+            extract_version = max(45, self.extract_version)
+            create_version = max(45, self.create_version)
+        else:
+            extract_version = self.extract_version
+            create_version = self.create_version
+
+        filename, flag_bits = self._encodeFilenameFlags()
+
+        centdir = struct.pack(structCentralDir,
+                              stringCentralDir, create_version,
+                              self.create_system, extract_version, self.reserved,
+                              flag_bits, self.compress_type, dostime, dosdate,
+                              self.CRC & 0xffffffff, compress_size, file_size,
+                              len(filename), len(extra_data), len(self.comment),
+                              0, self.internal_attr, self.external_attr,
+                              header_offset)
+
+        return centdir + filename + extra_data + self.comment
+
+
 class ZipStream(object):
+    """
+    Generate a zip archive of the given files as a stream of strings.
+
+    Each file is described by a dict with the 'name' of the entry and
+    either the 'path' of the file or its content in 'buf'; the optional
+    'content_type' is used to decide the compression of the entry. When
+    the archive is created with ZIP_DEFLATED the entries that would not
+    shrink, judged by content type or by the entropy of a sample of
+    their content, are STORED.
+    """
+    stored_chunk_size = 1024 * 1024
+    deflated_chunk_size = 64 * 1024
+
     def __init__(self, files, compression=ZIP_DEFLATED):
         if compression == ZIP_STORED:
             pass
@@ -209,7 +332,6 @@ class ZipStream(object):
         else:
             raise RuntimeError("That compression method is not supported")
 
-        self.files = files
         self.compression = compression
 
         self.filelist = []              # List of ZipInfo instances for archive
@@ -217,18 +339,94 @@ class ZipStream(object):
 
         self.time = time.gmtime()[0:6]  # Security: Forced Time
 
+        self.entries = []
+        for f in files:
+            if 'path' in f:
+                entry = self.prepare_file(f)
+            elif 'buf' in f:
+                entry = self.prepare_buf(f)
+            else:
+                continue
+
+            if entry is not None:
+                self.entries.append(entry)
+
+    def prepare_file(self, f):
+        try:
+            file_size = os.path.getsize(f['path'])
+
+            compression = self.compression
+            if compression == ZIP_DEFLATED:
+                with open(f['path'], "rb") as fp:
+                    if not is_compressible(f.get('content_type'), fp.read(ENTROPY_SAMPLE_SIZE)):
+                        compression = ZIP_STORED
+        except (OSError, IOError):
+            return None
+
+        zinfo = ZipInfo(f['name'], self.time, compression)
+        zinfo.file_size = file_size
+
+        # deflate could slightly expand the data
+        zinfo.zip64 = file_size * 1.05 > ZIP64_LIMIT
+
+        return zinfo, f['path'], None
+
+    def prepare_buf(self, f):
+        buf = f['buf']
+        if isinstance(buf, unicode):
+            buf = buf.encode('utf-8')
+
+        compression = self.compression
+        if compression == ZIP_DEFLATED and not is_compressible(f.get('content_type'), buf[:ENTROPY_SAMPLE_SIZE]):
+            compression = ZIP_STORED
+
+        zinfo = ZipInfo(f['name'], self.time, compression)
+        zinfo.file_size = len(buf)
+        zinfo.CRC = binascii.crc32(buf)
+
+        # buffers are compressed in advance so that their size is known
+        if compression == ZIP_DEFLATED:
+            cmpr = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+            buf = cmpr.compress(buf) + cmpr.flush()
+
+        zinfo.compress_size = len(buf)
+        zinfo.zip64 = max(zinfo.file_size, zinfo.compress_size) > ZIP64_LIMIT
+
+        return zinfo, None, buf
+
+    def size(self):
+        """
+        Return the size of the archive if it is known in advance, i.e. if
+        all the files are STORED, or None otherwise.
+        """
+        filelist = []
+        offset = 0
+
+        for zinfo, path, _ in self.entries:
+            if path is not None and zinfo.compress_type != ZIP_STORED:
+                return None
+
+            z = ZipInfo(zinfo.orig_filename, zinfo.date_time, zinfo.compress_type)
+            z.header_offset = offset
+            z.file_size = zinfo.file_size
+            z.compress_size = zinfo.file_size if path is not None else zinfo.compress_size
+            z.zip64 = zinfo.zip64
+
+            offset += len(z.FileHeader()) + z.compress_size + len(z.DataDescriptor())
+            filelist.append(z)
+
+        return offset + len(self.footer(filelist, offset))
 
     def __iter__(self):
-        for f in self.files:
-            if 'path' in f:
+        for zinfo, path, buf in self.entries:
+            if path is not None:
                 try:
-                    for data in self.zip_file(f['path'], f['name']):
+                    for data in self.zip_file(zinfo, path):
                         yield data
                 except (OSError, IOError):
                     pass
-
-            elif 'buf' in f:
-                for data in self.zip_buf(f['buf'], f['name']):
+            else:
+                for data in self.zip_buf(zinfo, buf):
                     yield data
 
         yield self.archive_footer()
@@ -247,9 +445,9 @@ class ZipStream(object):
         return data
 
 
-    def zip_file(self, filename, arcname):
+    def zip_file(self, zinfo, filename):
         """
-        Generates data to add the file 'filename' with name 'archname'
+        Generates data to add the file 'filename' described by 'zinfo'
 
         This function generates the data corresponding to the fields:
 
@@ -260,18 +458,20 @@ class ZipStream(object):
         as described in section V. of the PKZIP Application Note:
         http://www.pkware.com/business_and_developers/developer/appnote/
         """
-        zinfo = ZipInfo(arcname, self.time, self.compression)
-        zinfo.header_offset = self.data_ptr
-        yield self.update_data_ptr(zinfo.FileHeader())
+        with open(filename, "rb") as fp:
+            zinfo.header_offset = self.data_ptr
+            zinfo.file_size = 0
+            yield self.update_data_ptr(zinfo.FileHeader())
 
-        if zinfo.compress_type == ZIP_DEFLATED:
-            cmpr = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
-        else:
-            cmpr = None
+            if zinfo.compress_type == ZIP_DEFLATED:
+                cmpr = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+                chunk_size = self.deflated_chunk_size
+            else:
+                cmpr = None
+                chunk_size = self.stored_chunk_size
 
-        with open(filename, "rb") as fp:
             while 1:
-                buf = fp.read(1024 * 8)
+                buf = fp.read(chunk_size)
                 if not buf:
                     break
                 zinfo.file_size += len(buf)
@@ -293,9 +493,9 @@ class ZipStream(object):
         self.filelist.append(zinfo)
 
 
-    def zip_buf(self, filebuf, arcname):
+    def zip_buf(self, zinfo, buf):
         """
-        Generates data to add the filebuf 'filebuf' as file with name 'arcname'
+        Generates data to add the buffer 'buf' described by 'zinfo'
 
         This function generates the data corresponding to the fields:
 
@@ -306,40 +506,48 @@ class ZipStream(object):
         as described in section V. of the PKZIP Application Note:
         http://www.pkware.com/business_and_developers/developer/appnote/
         """
-        zinfo = ZipInfo(arcname, self.time, self.compression)
         zinfo.header_offset = self.data_ptr
 
         yield self.update_data_ptr(zinfo.FileHeader())
 
-        if zinfo.compress_type == ZIP_DEFLATED:
-            cmpr = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
-        else:
-            cmpr = None
+        yield self.update_data_ptr(buf)
 
-        zinfo.file_size = len(filebuf)
-        zinfo.CRC = binascii.crc32(filebuf, zinfo.CRC)
+        yield self.update_data_ptr(zinfo.DataDescriptor())
 
-        if isinstance(filebuf, unicode):
-            buf = filebuf.encode('utf-8')
-        else:
-            buf = filebuf
+        self.filelist.append(zinfo)
 
-        if cmpr:
-            buf = cmpr.compress(buf)
-            zinfo.compress_size += len(buf)
+    def footer(self, filelist, offset):
+        """
+        Returns the central directory and the end of central directory
+        records of the files in filelist, starting at offset.
+        """
+        data = [zinfo.CentralDirectory() for zinfo in filelist]
 
-        yield self.update_data_ptr(buf)
+        count = len(filelist)
+        size = sum(len(x) for x in data)
 
-        if cmpr:
-            buf = cmpr.flush()
-            zinfo.compress_size += len(buf)
-            yield self.update_data_ptr(buf)
-        else:
-            zinfo.compress_size = zinfo.file_size
+        # Write end-of-zip-archive record
+        if count > ZIP_FILECOUNT_LIMIT or size > ZIP64_LIMIT or offset > ZIP64_LIMIT:
+            # Need to write the ZIP64 end-of-archive records
+            zip64endrec = struct.pack(structEndArchive64, stringEndArchive64,
+                                      44, 45, 45, 0, 0, count, count, size, offset)
+            data.append(zip64endrec)
 
-        yield self.update_data_ptr(zinfo.DataDescriptor())
+            zip64locrec = struct.pack(structEndArchive64Locator,
+                                      stringEndArchive64Locator, 0, offset + size, 1)
+            data.append(zip64locrec)
 
-        self.filelist.append(zinfo)
+            endrec = struct.pack(structEndArchive, stringEndArchive,
+                                 0, 0, min(count, 0xffff), min(count, 0xffff),
+                                 min(size, 0xffffffff), 0xffffffff, 0)
+            data.append(endrec)
+
+        else:
+            endrec = struct.pack(structEndArchive, stringEndArchive,
+                                 0, 0, count, count, size, offset, 0)
+            data.append(endrec)
+
+        return ''.join(data)
 
     def archive_footer(self):
         """
@@ -356,75 +564,4 @@ class ZipStream(object):
         as described in section V. of the PKZIP Application Note:
         http://www.pkware.com/business_and_developers/developer/appnote/
         """
-        data = []
-        count = 0
-        pos1 = self.data_ptr
-        for zinfo in self.filelist:         # write central directory
-            count += 1
-            dt = zinfo.date_time
-            dosdate = (dt[0] - 1980) << 9 | dt[1] << 5 | dt[2]
-            dostime = dt[3] << 11 | dt[4] << 5 | (dt[5] // 2)
-            extra = []
-            if zinfo.file_size > ZIP64_LIMIT or zinfo.compress_size > ZIP64_LIMIT:
-                extra.append(zinfo.file_size)
-                extra.append(zinfo.compress_size)
-                file_size = 0xffffffff     #-1
-                compress_size = 0xffffffff #-1
-            else:
-                file_size = zinfo.file_size
-                compress_size = zinfo.compress_size
-
-            if zinfo.header_offset > ZIP64_LIMIT:
-                extra.append(zinfo.header_offset)
-                header_offset = -1  # struct "l" format:  32 one bits
-            else:
-                header_offset = zinfo.header_offset
-
-            extra_data = zinfo.extra
-            if extra:
-                # Append a ZIP64 field to the extra's
-                extra_data = struct.pack('<hh' + 'q'*len(extra),1, 8*len(extra), *extra) + extra_data
-                extract_version = max(45, zinfo.extract_version)
-                create_version = max(45, zinfo.create_version)
-            else:
-                extract_version = zinfo.extract_version
-                create_version = zinfo.create_version
-
-            filename, flag_bits = zinfo._encodeFilenameFlags()
-
-            centdir = struct.pack(structCentralDir,
-                                  stringCentralDir, create_version,
-                                  zinfo.create_system, extract_version, zinfo.reserved,
-                                  flag_bits, zinfo.compress_type, dostime, dosdate,
-                                  zinfo.CRC, compress_size, file_size,
-                                  len(filename), len(extra_data), len(zinfo.comment),
-                                  0, zinfo.internal_attr, zinfo.external_attr,
-                                  header_offset)
-
-            data.append(self.update_data_ptr(centdir))
-            data.append(self.update_data_ptr(filename))
-            data.append(self.update_data_ptr(extra_data))
-            data.append(self.update_data_ptr(zinfo.comment))
-
-        pos2 = self.data_ptr
-        # Write end-of-zip-archive record
-        if pos1 > ZIP64_LIMIT:
-            # Need to write the ZIP64 end-of-archive records
-            zip64endrec = struct.pack(structEndArchive64, stringEndArchive64,
-                                      44, 45, 45, 0, 0, count, count, pos2 - pos1, pos1)
-            data.append( self.update_data_ptr(zip64endrec))
-
-            zip64locrec = struct.pack(structEndArchive64Locator,
-                                      stringEndArchive64Locator, 0, pos2, 1)
-            data.append( self.update_data_ptr(zip64locrec))
-
-            endrec = struct.pack(structEndArchive, stringEndArchive,
-                                 0, 0, count, count, pos2 - pos1, -1, 0)
-            data.append( self.update_data_ptr(endrec))
-
-        else:
-            endrec = struct.pack(structEndArchive, stringEndArchive,
-                                 0, 0, count, count, pos2 - pos1, pos1, 0)
-            data.append( self.update_data_ptr(endrec))
-
-        return ''.join(data)
+        return self.update_data_ptr(self.footer(self.filelist, self.data_ptr))
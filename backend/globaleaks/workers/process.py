@@ -7,6 +7,7 @@ import sys
 import traceback
 
 from twisted.internet import defer, reactor
+from twisted.internet.process import ProcessReader
 from twisted.internet.protocol import ProcessProtocol
 
 from globaleaks.utils.utility import log
@@ -69,6 +70,27 @@ class Process(object):
 
         self.cfg = json.loads(s)
 
+        # the control channel is used by the supervisor to send commands
+        # formatted as newline separated json messages
+        self.control_buf = ''
+        if 'control_fd' in self.cfg:
+            self.control = ProcessReader(reactor, self, 'control', self.cfg['control_fd'])
+
+    def childDataReceived(self, name, data):
+        self.control_buf += data
+
+        while '\n' in self.control_buf:
+            line, self.control_buf = self.control_buf.split('\n', 1)
+
+            try:
+                msg = json.loads(line)
+                getattr(self, 'handle_' + msg['command'])(msg)
+            except Exception as excep:
+                self.log("Failed to handle control command: %s" % excep)
+
+    def childConnectionLost(self, name, reason):
+        pass
+
     def start(self):
         reactor.run()
 
@@ -78,12 +100,13 @@ class Process(object):
 
 
 class CfgFDProcProtocol(ProcessProtocol):
-    def __init__(self, supervisor, cfg, cfg_fd=42):
+    def __init__(self, supervisor, cfg, cfg_fd=42, control_fd=43):
         self.supervisor = supervisor
-        self.cfg = json.dumps(cfg)
+        self.cfg = json.dumps(dict(cfg, control_fd=control_fd))
         self.cfg_fd = cfg_fd
+        self.control_fd = control_fd
 
-        self.fd_map = {0:'r', cfg_fd:'w'}
+        self.fd_map = {0:'r', cfg_fd:'w', control_fd:'w'}
 
         self.startup_promise = defer.Deferred()
 
@@ -93,6 +116,10 @@ class CfgFDProcProtocol(ProcessProtocol):
 
         self.startup_promise.callback(None)
 
+    def send_command(self, command, **kwargs):
+        kwargs['command'] = command
+        self.transport.writeToChild(self.control_fd, json.dumps(kwargs) + '\n')
+
     def childDataReceived(self, childFD, data):
         for line in data.split('\n'):
             if line != '':
@@ -106,8 +133,8 @@ class CfgFDProcProtocol(ProcessProtocol):
 
 
 class HTTPSProcProtocol(CfgFDProcProtocol):
-    def __init__(self, supervisor, cfg, cfg_fd=42):
-        CfgFDProcProtocol.__init__(self, supervisor, cfg, cfg_fd)
+    def __init__(self, supervisor, cfg, cfg_fd=42, control_fd=43):
+        CfgFDProcProtocol.__init__(self, supervisor, cfg, cfg_fd, control_fd)
 
         for tls_socket_fd in cfg['tls_socket_fds']:
             self.fd_map[tls_socket_fd] = tls_socket_fd
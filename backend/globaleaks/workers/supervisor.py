@@ -23,7 +23,7 @@ class ProcessSupervisor(object):
     # is excessive.
     MAX_MORTALITY_RATE = 4 # 0.2
 
-    def __init__(self, net_sockets, proxy_ip, proxy_port):
+    def __init__(self, net_sockets, proxy_ip, proxy_port, proxy_socket=None):
         log.info("Starting process monitor")
 
         self.shutting_down = False
@@ -41,6 +41,7 @@ class ProcessSupervisor(object):
         self.tls_cfg = {
           'proxy_ip': proxy_ip,
           'proxy_port': proxy_port,
+          'proxy_socket': proxy_socket,
           'debug': log.loglevel <= logging.DEBUG,
         }
 
@@ -77,6 +78,19 @@ class ProcessSupervisor(object):
             log.info("Not launching https workers due to %s" % err)
             yield defer.fail(err)
 
+    def db_reload_tls_contexts(self, store):
+        """
+        Send the current TLS configuration to the running workers that reload
+        their contexts without dropping the established connections
+        """
+        self.tls_cfg.update(load_tls_dict(store))
+
+        reactor.callFromThread(self.send_tls_contexts)
+
+    def send_tls_contexts(self):
+        for pp in self.tls_process_pool:
+            pp.send_command('reload_tls', cfg=self.tls_cfg)
+
     def launch_https_workers(self):
         self.tls_process_state['deaths'] = 0
         self.tls_process_state['last_death'] = datetime_now()
@@ -6,6 +6,7 @@ if os.path.dirname(__file__) != '/usr/lib/python2.7/dist-packages/globaleaks/wor
     sys.path.insert(1, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
 from twisted.internet import reactor
+from twisted.internet.task import LoopingCall
 
 from globaleaks.workers.process import Process
 from globaleaks.utils.sock import listen_tls_on_sock
@@ -23,20 +24,16 @@ class HTTPSProcess(Process):
 
         proxy_url = 'http://' + self.cfg['proxy_ip'] + ':' + str(self.cfg['proxy_port'])
 
-        http_proxy_factory = HTTPStreamFactory(proxy_url)
+        self.http_proxy_factory = HTTPStreamFactory(proxy_url, self.cfg.get('proxy_socket'))
 
-        cv = ChainValidator()
-        ok, err = cv.validate(self.cfg, must_be_disabled=False, check_expiration=False)
-        if not ok or not err is None:
-            raise err
-
-        snimap = SNIMap({
-            'DEFAULT': TLSServerContextFactory(self.cfg['ssl_key'],
-                                               self.cfg['ssl_cert'],
-                                               self.cfg['ssl_intermediate'],
-                                               self.cfg['ssl_dh'])
+        self.tls_factory = None
+        self.snimap = SNIMap({
+            'DEFAULT': self.load_tls_context(self.cfg)
         })
 
+        self.tls_rotation = LoopingCall(self.rotate_session_keys)
+        self.tls_rotation.start(TLSServerContextFactory.session_lifetime, now=False)
+
         socket_fds = self.cfg['tls_socket_fds']
 
         for socket_fd in socket_fds:
@@ -44,13 +41,50 @@ class HTTPSProcess(Process):
 
             port = listen_tls_on_sock(reactor,
                                       fd=socket_fd,
-                                      contextFactory=snimap,
-                                      factory=http_proxy_factory)
+                                      contextFactory=self.snimap,
+                                      factory=self.http_proxy_factory)
 
             self.ports.append(port)
             self.log("HTTPS proxy listening on %s" % port)
 
+    def load_tls_context(self, cfg):
+        """
+        Return the context factory of the given configuration; the factory
+        already loaded is updated in place.
+        """
+        cv = ChainValidator()
+        ok, err = cv.validate(cfg, must_be_disabled=False, check_expiration=False)
+        if not ok or not err is None:
+            raise err
+
+        args = (cfg['ssl_key'], cfg['ssl_cert'], cfg['ssl_intermediate'], cfg['ssl_dh'])
+
+        if self.tls_factory is not None:
+            self.tls_factory.update(*args)
+        else:
+            self.tls_factory = TLSServerContextFactory(*args)
+
+        return self.tls_factory
+
+    def handle_reload_tls(self, msg):
+        self.snimap.update({
+            'DEFAULT': self.load_tls_context(msg['cfg'])
+        })
+
+        self.log("Reloaded TLS context")
+
+    def rotate_session_keys(self):
+        self.log("TLS session stats: %s" % self.tls_factory.stats)
+
+        self.tls_factory.rotate_session_keys()
+
     def shutdown(self):
+        self.log("Backend connection pool stats: %s" % self.http_proxy_factory.pool.get_stats())
+        self.log("TLS session stats: %s" % self.tls_factory.stats)
+
+        if self.tls_rotation.running:
+            self.tls_rotation.stop()
+
         for port in self.ports:
             port.loseConnection()
 
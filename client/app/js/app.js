@@ -88,6 +88,7 @@ var GLClient = angular.module('GLClient', [
     $qProvider.errorOnUnhandledRejections(false);
 
     $httpProvider.interceptors.push('globaleaksRequestInterceptor');
+    $httpProvider.interceptors.push('globaleaksConditionalRequestInterceptor');
 
     $locationProvider.hashPrefix("");
 
@@ -794,5 +795,58 @@ var GLClient = angular.module('GLClient', [
        return $q.reject(response);
      }
    };
+}]).
+  factory('globaleaksConditionalRequestInterceptor', ['$q', function($q) {
+    /*
+       The API responses are kept in memory together with their ETag in order
+       to revalidate them with If-None-Match and avoid transferring them again
+       when not modified.
+    */
+    var cache = {};
+
+    var cacheKey = function(config) {
+      return config.url + angular.toJson(config.params || {});
+    };
+
+    return {
+     'request': function(config) {
+       if (config.method === 'GET') {
+         var entry = cache[cacheKey(config)];
+         if (entry !== undefined) {
+           config.headers['If-None-Match'] = entry.etag;
+         }
+       }
+
+       return config;
+     },
+     'response': function(response) {
+       var etag = response.headers('ETag');
+       var contentType = response.headers('Content-Type') || '';
+
+       if (response.config.method === 'GET' && etag && contentType.indexOf('application/json') === 0) {
+         cache[cacheKey(response.config)] = {
+           'etag': etag,
+           'data': angular.copy(response.data)
+         };
+       }
+
+       return response;
+     },
+     'responseError': function(response) {
+       if (response.status === 304) {
+         var entry = cache[cacheKey(response.config)];
+         if (entry !== undefined) {
+           response.status = 200;
+           response.data = angular.copy(entry.data);
+           return response;
+         }
+       }
+
+       return $q.reject(response);
+     },
+     'clear': function() {
+       cache = {};
+     }
+   };
 }]).
   config(exceptionConfig);
@@ -16,8 +16,8 @@ angular.module('GLServices', ['ngResource']).
     };
   }]).
   factory('Authentication',
-    ['$http', '$location', '$routeParams', '$rootScope', '$timeout', 'GLTranslate', 'locationForce', 'UserPreferences', 'ReceiverPreferences',
-    function($http, $location, $routeParams, $rootScope, $timeout, GLTranslate, locationForce, UserPreferences, ReceiverPreferences) {
+    ['$http', '$location', '$routeParams', '$rootScope', '$timeout', 'GLTranslate', 'locationForce', 'UserPreferences', 'ReceiverPreferences', 'globaleaksConditionalRequestInterceptor',
+    function($http, $location, $routeParams, $rootScope, $timeout, GLTranslate, locationForce, UserPreferences, ReceiverPreferences, globaleaksConditionalRequestInterceptor) {
       function Session(){
         var self = this;
 
@@ -141,6 +141,9 @@ angular.module('GLServices', ['ngResource']).
 
           self.session = undefined;
 
+          // the responses of the session are not kept after its end
+          globaleaksConditionalRequestInterceptor.clear();
+
           var source_path = $location.path();
 
           var redirect_path = self.getLoginUri(role, source_path);